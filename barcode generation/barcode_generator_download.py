@@ -1,37 +1,66 @@
 """Downloads movie trailers and extracts color barcodes from video frames."""
+import argparse
 import subprocess
-import cv2  # pip install opencv-python
 import numpy as np
 import os
-from url_finder import find_trailer
+import shutil
+import tempfile
+import threading
+from url_finder import StaticSearch, TrailerCache, YoutubeSearch, find_trailer
 import time
 import re
-from encoder import pick_most_different_colors, get_barcode_png
-import json
+from encoder import (build_barcode_atlas, build_color_index, build_compact_colors, get_barcode_png, load_title_ids,
+                     pick_most_different_colors)
+from frame_sampler import FRAME_SIZE, SAMPLERS, sample_rawvideo  # pip install opencv-python
+from pipeline import Stage, run_pipeline
+from metrics import MetricsLog
+from results_store import ResultsStore
+from retry import PERMANENT, DownloadError, JobStore, RateLimiter, RetryPolicy, classify_error
 import pandas as pd
 
 
-def download_video(url, out_path="video.mp4", retries=5, delay=3):
+YTDLP_FORMAT = "bestvideo[ext=mp4][vcodec^=avc1][height<=144]"
+
+
+def _ytdlp_error(returncode, stderr):
+    """DownloadError for a failed yt-dlp run, keeping the last lines of its stderr."""
+    tail = "\n".join(stderr.strip().splitlines()[-5:])
+    return DownloadError(f"yt-dlp exited with status {returncode}", tail)
+
+
+def fetch_video(url, out_path="video.mp4", ytdlp="yt-dlp"):
     """
-    Downloads a YouTube video using yt-dlp with retries.
-    Retries the exact same format if it fails.
+    Download a YouTube video with one yt-dlp run.
+
+    Raises DownloadError with yt-dlp's stderr on failure; retries are left to
+    the caller (the pipeline parks the job with a backoff instead of sleeping).
     """
     cmd = [
-        "yt-dlp",
-        "-f", "bestvideo[ext=mp4][vcodec^=avc1][height<=144]",
+        ytdlp,
+        "-f", YTDLP_FORMAT,
         "--no-audio",
         "--merge-output-format", "mp4",
         "-o", out_path,
         url
     ]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    if proc.returncode != 0:
+        raise _ytdlp_error(proc.returncode, proc.stderr)
+    return out_path
 
+
+def download_video(url, out_path="video.mp4", retries=5, delay=3, ytdlp="yt-dlp", stats=None):
+    """
+    Downloads a YouTube video using yt-dlp with retries.
+    Retries the exact same format if it fails.
+    If a stats dict is given, the number of retries used is stored in it.
+    """
     for attempt in range(1, retries + 1):
+        if stats is not None:
+            stats["retries"] = attempt - 1
         try:
-            subprocess.run(cmd, check=True,
-                           stdout=subprocess.DEVNULL,
-                           stderr=subprocess.DEVNULL)
-            return out_path  # success
-        except subprocess.CalledProcessError:
+            return fetch_video(url, out_path, ytdlp)  # success
+        except DownloadError:
             print(f"Attempt {attempt} failed. Retrying..." if attempt < retries else
                   f"Attempt {attempt} failed. No more retries.")
             if attempt < retries:
@@ -41,20 +70,57 @@ def download_video(url, out_path="video.mp4", retries=5, delay=3):
     return None
 
 
-def is_title_screen(frame):
+def stream_video_frames(url, count, size=FRAME_SIZE, ytdlp="yt-dlp", ffmpeg="ffmpeg", stats=None):
+    """
+    Sample frames while the trailer is still downloading, without a temp file.
+
+    yt-dlp writes the video to stdout, ffmpeg decodes it from stdin into small
+    rawvideo frames and the frames are decimated as they arrive. The DASH mp4
+    streams YouTube serves are fragmented, so ffmpeg can decode them from a pipe.
+    """
+    errors = tempfile.TemporaryFile()  # a file, not a pipe, so a chatty yt-dlp can never block on it
+    download = subprocess.Popen([ytdlp, "-f", YTDLP_FORMAT, "--no-audio", "--quiet", "-o", "-", url],
+                                stdout=subprocess.PIPE, stderr=errors)
+    decode = subprocess.Popen([ffmpeg, "-v", "error", "-i", "pipe:0",
+                               "-vf", f"scale={size[0]}:{size[1]}:flags=area",
+                               "-f", "rawvideo", "-pix_fmt", "bgr24", "-"],
+                              stdin=download.stdout, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    download.stdout.close()  # ffmpeg owns the read end now
+    try:
+        frames = sample_rawvideo(decode.stdout, count, size, stats)
+    finally:
+        decode.stdout.close()
+        decode.wait()
+        download.wait()
+        errors.seek(0)
+        stderr = errors.read().decode("utf-8", "replace")
+        errors.close()
+    if download.returncode != 0:
+        raise _ytdlp_error(download.returncode, stderr)
+    return frames
+
+
+def is_title_screen(frame, sw=30, vm=20, std_threshold=0.25):
     """Detect if frame is a title screen by checking side strip variance."""
-    h, w = frame.shape[:2]
-    sw = 30      # side strip width
-    vm = 20      # vertical margin to skip black bars
+    return bool(title_screen_mask(frame[np.newaxis], sw, vm, std_threshold)[0])
 
+
+def title_screen_mask(frames, sw=30, vm=20, std_threshold=0.25):
+    """
+    is_title_screen for a whole (N, h, w, 3) batch in one reduction.
+
+    sw is the side strip width and vm the vertical margin skipped to ignore
+    black bars, both in pixels of the (downscaled) frames.
+    """
+    h, w = frames.shape[1:3]
     sides = np.concatenate([
-        frame[vm:h-vm, :sw],          # left strip
-        frame[vm:h-vm, w-sw:]          # right strip
-    ])
-    # print(sides)
+        frames[:, vm:h-vm, :sw],          # left strip
+        frames[:, vm:h-vm, w-sw:]          # right strip
+    ], axis=2)
+
+    sides_std = sides.reshape(len(frames), -1).std(axis=1) / 255  # normalize to [0,1]
+    return ~(sides_std < std_threshold)  # adjust threshold empirically
 
-    sides_std = sides.std() / 255  # normalize to [0,1]
-    return not sides_std < 0.25  # adjust threshold empirically
 
 def downsample_uniformly(lst, max_size=200):
     """Uniformly downsample a list to at most max_size elements."""
@@ -69,38 +135,38 @@ def downsample_uniformly(lst, max_size=200):
     return new_list
 
 
-def video_to_color_barcode(video_path, output="barcode.png", max_uniform_ratio = 0.5, sample_rate=5):
-    """Extract average colors from video frames, returning colors and 4 most distinct."""
-    cap = cv2.VideoCapture(video_path)
-    # cap.set(cv2.CAP_PROP_FRAME_WIDTH, 160)
-    # cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 90)
-
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    frames_to_save = 300
-
-    frames_per_capture = int(total_frames / frames_to_save)
-    # print(f"total frames: {total_frames}")
-    # print(f"frames per capture{frames_per_capture}")
-
-
-    avg_colors = []
-
-    for idx in range(frames_to_save):
-        for _ in range(frames_per_capture - 1):
-            if not cap.grab():
-                break
-
-        ret, frame = cap.read()
-        if not ret:
-            break
+def video_to_color_barcode(video_path, output="barcode.png", max_uniform_ratio = 0.5, sample_rate=5,
+                           sample_mode="seek", frames_to_save=300, max_size=200,
+                           sw=30, vm=20, std_threshold=0.25, frame_size=FRAME_SIZE, stats=None):
+    """
+    Extract average colors from video frames, returning colors and 4 most distinct.
 
-        if not is_title_screen(frame):
-            avg_colors.append(frame.mean(axis=(0, 1))[::-1])     #saves in RGB
+    sample_mode picks the frame sampler from frame_sampler.SAMPLERS: "seek" jumps
+    to the sampled frames, "ffmpeg" decodes through a small rawvideo pipe and
+    "grab" is the original decode-everything loop. Frames are area-downscaled to
+    frame_size as they are decoded; see frames_to_color_barcode for the rest.
+    A stats dict, if given, receives frame counts for the metrics log.
+    """
+    frames = SAMPLERS[sample_mode](video_path, frames_to_save, frame_size, stats)
+    return frames_to_color_barcode(frames, max_size, sw, vm, std_threshold, stats)
 
 
-    cap.release()
+def frames_to_color_barcode(frames, max_size=200, sw=30, vm=20, std_threshold=0.25, stats=None):
+    """
+    Turn an (N, h, w, 3) batch of BGR frames into (avg_colors, overall_avg, four_opposites).
 
-    avg_colors = downsample_uniformly(avg_colors, 200)
+    Title screens are dropped with title_screen_mask(sw, vm, std_threshold) and
+    at most max_size per-frame average colors are kept.
+    """
+    keep = ~title_screen_mask(frames, sw, vm, std_threshold)
+    avg_colors = frames.mean(axis=(1, 2))[keep][:, ::-1]     #saves in RGB
+    if stats is not None:
+        stats["frames_sampled"] = len(frames)
+        stats["frames_kept"] = len(avg_colors)
+    if not len(avg_colors):
+        raise ValueError("no usable frames in video")
+
+    avg_colors = downsample_uniformly(list(avg_colors), max_size)
     overall_avg = np.mean(np.stack(avg_colors), axis=0)
     four_opposites = pick_most_different_colors(avg_colors)
 
@@ -114,96 +180,213 @@ def safe_filename(name):
     return re.sub(r'[<>:"/\\|?*]', '_', name)
 
 
-def add_to_json(movie, avg_colors, overall_avg, four_opposites):
-    """Append movie color data to the JSON results file."""
-    json_path = "results/movies_colors.json"
-
-
-    movie_data = {
-        "title": movie,
-        "avg_colors": [list(map(float, c)) for c in avg_colors],
-        "overall_avg": list(map(float, overall_avg)),
-        "four_opposites": [list(map(float, c)) for c in four_opposites]
-    }
-
-    # load existing JSON or start new
-    if os.path.exists(json_path):
-        with open(json_path, "r") as f:
-            all_data = json.load(f)
-    else:
-        all_data = []
-
-    # append new movie
-    all_data.append(movie_data)
-
-    # save back to JSON
-    with open(json_path, "w") as f:
-        json.dump(all_data, f, indent=4)
-
-    print("saved json")
-
-#skip movies in json:
-json_path = "results/movies_colors.json"
-
-# load existing movie titles if the JSON exists
-if os.path.exists(json_path):
-    with open(json_path, "r") as f:
-        all_data = json.load(f)
-        done_titles = set(d["title"] for d in all_data)
-else:
-    all_data = []
-    done_titles = set()
+# search settings shared by the search worker threads, filled in by main()
+_search_config = {"cache": None, "stub_url": None}
+_search_local = threading.local()
 
 
-# movies = ["UP"]
-df = pd.read_csv("top_movies_by_country_size.csv")  # replace with your path
-movies = df['title'].tolist()
+def _search_backend():
+    """Return this thread's search backend (one YoutubeDL per thread, reused across titles)."""
+    backend = getattr(_search_local, "backend", None)
+    if backend is None:
+        stub_url = _search_config["stub_url"]
+        backend = StaticSearch(stub_url) if stub_url else YoutubeSearch()
+        _search_local.backend = backend
+    return backend
 
-failed_file = "results/failed_movies.txt"
 
-
-for movie in movies:
-    if movie in done_titles:
-        print(f"Skipping {movie}, already processed.")
-        continue  # skip this movie
-
-    print("For movie: " + movie)
-    print("time: " + str(time.time()))
+def search_job(job):
+    """Pipeline stage: look up the trailer URL for a job's title."""
     start = time.time()
+    # stub answers are not real lookups, so they never go into the persistent cache
+    cache = None if _search_config["stub_url"] else _search_config["cache"]
+    job["url"] = find_trailer(job["title"], cache=cache, backend=_search_backend())
+    job["metrics"]["search_s"] = time.time() - start
+    if job["url"] is None:
+        raise LookupError("no trailer found")
+    return job
 
-    find_trailer_start = time.time()
-    url = find_trailer(movie)
-    find_trailer_end = time.time()
-    print("Find trailer duration: " + str(find_trailer_end - find_trailer_start))
-
-    download_start = time.time()
-    path = download_video(url)
-    if path is None:
-        # Save failed movie title
-        print(f"Download failed for {movie}, saving to failed list.")
-        with open(failed_file, "a", encoding="utf-8") as f:
-            f.write(movie + "\n")
-        continue  # skip to next movie
 
+def download_job(job):
+    """Pipeline stage: download the trailer into the job's own temp file (one try; failures are rescheduled)."""
+    start = time.time()
+    metrics = job["metrics"]
+    fetch_video(job["url"], job["path"], ytdlp=job["ytdlp"])
+    metrics["download_s"] = time.time() - start
+    metrics["bytes_downloaded"] = os.path.getsize(job["path"])
+    return job
 
-    download_end = time.time()
-    print("Download duration: " + str(download_end - download_start))
-
-    s_barcode = time.time()
-    avg_colors, overall_avg, four_opposites = video_to_color_barcode( path, "results/" + safe_filename(movie) + ".png", 0.5)
-    add_to_json(movie, avg_colors, overall_avg, four_opposites)
-    get_barcode_png(avg_colors, "results/" + safe_filename(movie) + ".png")
-    e_barcode = time.time()
-    print("Convertion time: ", e_barcode - s_barcode)
-
-    tmp_file = "video.mp4"
 
-    end = time.time()
+def _encode(job, avg_colors, overall_avg, four_opposites):
+    """Write the barcode PNG and attach the colors to the job."""
+    start = time.time()
+    get_barcode_png(avg_colors, "results/" + safe_filename(job["title"]) + ".png")
+    job["metrics"]["encode_s"] = time.time() - start
+    job["avg_colors"] = avg_colors
+    job["overall_avg"] = overall_avg
+    job["four_opposites"] = four_opposites
+    return job
 
-    print("Total Duration: ", end - start)
-    print()
 
+def decode_job(job):
+    """Pipeline stage: extract colors and write the barcode PNG (runs in a worker process)."""
+    start = time.time()
+    try:
+        colors = video_to_color_barcode(job["path"], sample_mode=job["sample_mode"], stats=job["metrics"])
+    finally:
+        if os.path.exists(job["path"]):
+            os.remove(job["path"])
+    job["metrics"]["decode_s"] = time.time() - start
+    return _encode(job, *colors)
 
-    if os.path.exists(tmp_file):
-        os.remove(tmp_file)
 
+def stream_job(job):
+    """Pipeline stage: download and decode in one go through pipes (runs in a worker process)."""
+    start = time.time()
+    metrics = job["metrics"]
+    frames = stream_video_frames(job["url"], 300, ytdlp=job["ytdlp"], stats=metrics)
+    if not len(frames):
+        raise RuntimeError("no frames decoded from stream")
+    colors = frames_to_color_barcode(frames, stats=metrics)
+    metrics["decode_s"] = time.time() - start  # includes the download it overlaps with
+    return _encode(job, *colors)
+
+
+def main():
+    """Run the search -> download -> decode pipeline over the input title list."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input", default="top_movies_by_country_size.csv", help="CSV with a 'title' column")
+    parser.add_argument("--search-workers", type=int, default=4)
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--decode-workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for OpenCV decoding")
+    parser.add_argument("--sample-mode", choices=sorted(SAMPLERS), default="seek",
+                        help="how frames are sampled from each trailer")
+    parser.add_argument("--stream", action="store_true",
+                        help="pipe yt-dlp output straight into the decoder instead of using temp files")
+    parser.add_argument("--yt-dlp", dest="ytdlp", default="yt-dlp",
+                        help="yt-dlp executable (point at a local fake for offline runs)")
+    parser.add_argument("--atlas", metavar="PATH",
+                        help="also pack all barcodes into one sprite atlas (.png or .webp) at the end of the run")
+    parser.add_argument("--compact", metavar="PATH",
+                        help="also write quantized colors as a uint8 blob (.bin) plus its _table.json at the end")
+    parser.add_argument("--palettes", metavar="PATH",
+                        help="also write per-movie LAB k-means palettes and a LAB grid color index at the end")
+    parser.add_argument("--processed", default="../public/data/processed.json",
+                        help="processed.json used to key the compact table and palettes on record id")
+    parser.add_argument("--search-cache", default="results/trailer_cache.sqlite",
+                        help="persistent trailer URL cache ('' to disable; not used with --search-stub)")
+    parser.add_argument("--search-stub", metavar="URL",
+                        help="answer every search with this URL or local file instead of querying YouTube")
+    parser.add_argument("--queue-size", type=int, default=8, help="max jobs waiting between two stages")
+    parser.add_argument("--metrics", default="results/metrics.jsonl", help="per-title metrics event log")
+    parser.add_argument("--db", default="results/movies_colors.sqlite", help="append-only results store")
+    parser.add_argument("--export", default="results/movies_colors.json",
+                        help="movies_colors.json written from the store at the end of the run")
+    parser.add_argument("--jobs-db", default="results/jobs.sqlite",
+                        help="per-title job state (done / retrying / failed, with stage and reason)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="only process titles that failed or were still waiting for a retry in earlier runs")
+    parser.add_argument("--max-attempts", type=int, default=5, help="tries per title before it is marked failed")
+    parser.add_argument("--backoff", type=float, default=3.0,
+                        help="base retry delay in seconds; doubles per attempt, with jitter")
+    parser.add_argument("--backoff-max", type=float, default=300.0, help="upper bound for one retry delay")
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="max yt-dlp downloads started per second across all workers (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=4, help="downloads that may start back to back after a pause")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    job_state = JobStore(args.jobs_db)
+    use_cache = args.search_cache and not args.search_stub
+    _search_config["cache"] = TrailerCache(args.search_cache) if use_cache else None
+    _search_config["stub_url"] = args.search_stub
+    done_titles = store.done_titles()
+    metrics_log = MetricsLog(args.metrics)
+    failed_file = "results/failed_movies.txt"
+    failed_titles = set()
+    if os.path.exists(failed_file):
+        with open(failed_file, "r", encoding="utf-8") as f:
+            failed_titles = set(line.strip() for line in f)
+    df = pd.read_csv(args.input)
+    movies = df["title"].dropna().tolist()
+    if args.retry_failed:
+        outstanding = (job_state.titles(["failed", "retrying"]) | failed_titles) - done_titles
+        movies = [m for m in movies if m in outstanding] + sorted(outstanding - set(movies))
+        print(f"Retrying {len(movies)} outstanding titles")
+    else:
+        skipped = job_state.titles(["failed"], kind=PERMANENT)
+        movies = [m for m in movies if m not in skipped]
+
+    # each job downloads into its own file so concurrent downloads never collide
+    tmp_dir = tempfile.mkdtemp(prefix="trailers_")
+
+    def jobs():
+        for idx, movie in enumerate(movies):
+            if movie in done_titles:
+                print(f"Skipping {movie}, already processed.")
+                continue
+            done_titles.add(movie)  # also skips duplicate titles in the input
+            yield {"title": movie, "path": os.path.join(tmp_dir, f"{idx:05d}.mp4"),
+                   "sample_mode": args.sample_mode, "ytdlp": args.ytdlp,
+                   "started": time.time(), "metrics": {}}
+
+    def on_result(job):
+        store.add(job["title"], job["avg_colors"], job["overall_avg"], job["four_opposites"])
+        job_state.record(job["title"], "done", job.get("attempts", 0))
+        job["metrics"]["retries"] = job.get("attempts", 0)
+        job["metrics"]["total_s"] = time.time() - job["started"]
+        metrics_log.record(job["title"], "ok", job["metrics"])
+        print(f"saved {job['title']} ({job['metrics']['total_s']:.1f}s)")
+
+    def on_retry(stage, job, exc, delay):
+        print(f"{stage} failed for {job['title']} ({exc}), retry {job['attempts']} in {delay:.0f}s.")
+        job_state.record(job["title"], "retrying", job["attempts"], stage, job["error_kind"], str(exc),
+                         time.time() + delay)
+
+    def on_error(stage, job, exc):
+        print(f"{stage} failed for {job['title']} ({exc}), saving to failed list.")
+        kind = job.get("error_kind") or classify_error(exc)
+        job_state.record(job["title"], "failed", job.get("attempts", 0), stage, kind, str(exc))
+        job["metrics"]["retries"] = max(0, job.get("attempts", 1) - 1)
+        job["metrics"]["total_s"] = time.time() - job["started"]
+        metrics_log.record(job["title"], "failed", job["metrics"], stage, f"{type(exc).__name__}: {exc}")
+        if job["title"] not in failed_titles:
+            failed_titles.add(job["title"])
+            with open(failed_file, "a", encoding="utf-8") as f:
+                f.write(job["title"] + "\n")
+
+    limiter = RateLimiter(args.rate, args.burst) if args.rate > 0 else None
+    if args.stream:
+        stages = [
+            Stage("search", search_job, args.search_workers),
+            Stage("stream", stream_job, args.decode_workers, processes=True, limiter=limiter),
+        ]
+    else:
+        stages = [
+            Stage("search", search_job, args.search_workers),
+            Stage("download", download_job, args.download_workers, limiter=limiter),
+            # decode deletes the download, so a retried decode starts over from the download
+            Stage("decode", decode_job, args.decode_workers, processes=True, retry_from="download"),
+        ]
+    retry = RetryPolicy(args.max_attempts, args.backoff, args.backoff_max)
+    start = time.time()
+    try:
+        run_pipeline(jobs(), stages, on_result, on_error, queue_size=args.queue_size, retry=retry, on_retry=on_retry)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        store.export_json(args.export)
+        if args.atlas:
+            build_barcode_atlas(store.movies(), args.atlas, os.path.splitext(args.atlas)[0] + ".json")
+        if args.compact:
+            build_compact_colors(store.movies(), args.compact, os.path.splitext(args.compact)[0] + "_table.json",
+                                 load_title_ids(args.processed))
+        if args.palettes:
+            build_color_index(store.movies(), args.palettes, load_title_ids(args.processed))
+        store.close()
+        job_state.close()
+    print("Total Duration: ", time.time() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Offline benchmarks for the barcode generation pipeline.
+
+Synthetic trailers are generated locally with cv2.VideoWriter, then the frame
+samplers, palette picking, PNG encoding and the full search -> download ->
+decode pipeline (with stubbed search and a fake yt-dlp) are timed. Every case
+runs in a fresh process so its peak RSS is its own. Results are written as
+JSON so runs from different commits can be compared:
+
+    python benchmark.py --out before.json
+    python benchmark.py --out after.json --compare before.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CODECS = {"mp4v": ".mp4", "MJPG": ".avi", "avc1": ".mp4"}
+
+
+def make_trailer(path, seconds, size, codec="mp4v", fps=24, seed=0):
+    """
+    Write a synthetic trailer: drifting color gradients cut into scenes, with the
+    odd flat title card. Returns the number of frames written, or 0 if the codec
+    is not available in this OpenCV build.
+    """
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (w, h))
+    if not writer.isOpened():
+        return 0
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 1, w, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    total = int(seconds * fps)
+    scene_len = 3 * fps
+    for i in range(total):
+        if i % scene_len == 0:
+            title_card = rng.random() < 0.1
+            a, b = rng.integers(0, 256, size=(2, 3)).astype(np.float32)
+        if title_card:
+            frame = np.zeros((h, w, 3), dtype=np.uint8)
+            cv2.putText(frame, "TITLE", (w // 4, h // 2), cv2.FONT_HERSHEY_SIMPLEX, h / 100, (255, 255, 255), 2)
+        else:
+            shift = (i % scene_len) / scene_len
+            row = a + (b - a) * ((ramp + shift) % 1.0)
+            frame = np.broadcast_to(row, (h, w, 3)).astype(np.uint8)
+        writer.write(frame)
+    writer.release()
+    return total
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and its children, in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # bytes on macOS, KB elsewhere
+    return round(max(own, children) / scale, 1)
+
+
+def _timed(func, repeat):
+    """Best wall time of `repeat` calls, plus the last return value."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def bench_sampler(case):
+    """Time video_to_color_barcode on one synthetic trailer with one sampler."""
+    from barcode_generator_download import video_to_color_barcode
+
+    seconds, _ = _timed(lambda: video_to_color_barcode(case["video"], sample_mode=case["mode"]), case["repeat"])
+    return {"seconds": seconds, "frames_per_s": case["frames"] / seconds}
+
+
+def bench_palette(case):
+    """Time pick_most_different_colors per movie and in one batch."""
+    from encoder import pick_most_different_colors, pick_most_different_colors_batch
+
+    rng = np.random.default_rng(0)
+    colors = rng.uniform(0, 255, size=(case["movies"], 200, 3))
+    single, _ = _timed(lambda: [pick_most_different_colors(c) for c in colors], case["repeat"])
+    batch, _ = _timed(lambda: pick_most_different_colors_batch(colors), case["repeat"])
+    return {"seconds": single, "titles_per_s": case["movies"] / single,
+            "batch_seconds": batch, "batch_titles_per_s": case["movies"] / batch}
+
+
+def bench_png(case):
+    """Time get_barcode_png for a batch of 200-color barcodes."""
+    from encoder import get_barcode_png
+
+    rng = np.random.default_rng(0)
+    colors = rng.uniform(0, 255, size=(case["movies"], 200, 3))
+    out = os.path.join(case["workdir"], "bench.png")
+    seconds, _ = _timed(lambda: [get_barcode_png(c, out) for c in colors], case["repeat"])
+    return {"seconds": seconds, "titles_per_s": case["movies"] / seconds}
+
+
+def bench_end_to_end(case):
+    """Run the real pipeline stages with stubbed search and a fake yt-dlp."""
+    import barcode_generator_download as bgd
+    from pipeline import Stage, run_pipeline
+
+    os.environ["FAKE_YTDLP_VIDEO"] = case["video"]
+    bgd._search_config["stub_url"] = case["video"]
+    os.makedirs(os.path.join(case["workdir"], "results"), exist_ok=True)
+    os.chdir(case["workdir"])  # decode_job writes its PNGs under ./results
+
+    ytdlp = os.path.join(HERE, "fake_ytdlp.py")
+    jobs = [{"title": f"movie {i}", "path": os.path.join(case["workdir"], f"{i:05d}.mp4"),
+             "sample_mode": case["mode"], "ytdlp": ytdlp, "metrics": {}} for i in range(case["titles"])]
+    done, failed = [], []
+    stages = [
+        Stage("search", bgd.search_job, 2),
+        Stage("download", bgd.download_job, 2),
+        Stage("decode", bgd.decode_job, case["workers"], processes=True),
+    ]
+    start = time.perf_counter()
+    run_pipeline(iter(jobs), stages, done.append, lambda *err: failed.append(err))
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "titles_per_s": len(done) / seconds, "failed": len(failed)}
+
+
+BENCHMARKS = {
+    "sampler": bench_sampler,
+    "palette": bench_palette,
+    "png": bench_png,
+    "end_to_end": bench_end_to_end,
+}
+
+
+def _run_case(case):
+    """Worker entry point: run one case and attach its peak RSS."""
+    sys.path.insert(0, HERE)
+    try:
+        result = BENCHMARKS[case["bench"]](case)
+    except Exception as exc:  # e.g. ffmpeg missing; record it and keep going
+        result = {"error": f"{type(exc).__name__}: {exc}"}
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _case_worker(case, conn):
+    """Child process entry point: run one case and send its result back."""
+    os.setpgrp()  # its own process group, so a hung case can be killed with everything it started
+    conn.send(_run_case(case))
+    conn.close()
+
+
+def run_isolated(ctx, case, timeout):
+    """
+    Run one case in a fresh process and return its result.
+
+    A case that has not finished within timeout seconds, or whose process does
+    not exit after reporting, is killed and recorded as failed instead of
+    stalling the whole run, together with any processes it started.
+    """
+    receiver, sender = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_case_worker, args=(case, sender))  # not a daemon: cases may start their own pools
+    proc.start()
+    sender.close()
+    try:
+        result = receiver.recv() if receiver.poll(timeout) else None
+    except EOFError:  # the process died without reporting
+        result = None
+    proc.join(timeout if result is None else 30)
+    if proc.is_alive():
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.join()
+        reason = f"did not finish within {timeout}s" if result is None else "hung at exit after reporting"
+        result = {"error": f"Timeout: {reason}", "peak_rss_mb": (result or {}).get("peak_rss_mb")}
+    elif result is None:
+        result = {"error": f"case process exited with code {proc.exitcode}", "peak_rss_mb": None}
+    receiver.close()
+    return result
+
+
+def _git_commit():
+    """Current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_cases(workdir, quick=False, repeat=3):
+    """Generate the synthetic trailers and the list of cases to run."""
+    lengths = [30] if quick else [30, 150]
+    sizes = [(256, 144)] if quick else [(256, 144), (640, 360), (1280, 720)]
+    codecs = ["mp4v"] if quick else list(CODECS)
+    modes = ["grab", "seek", "ffmpeg"]
+
+    cases, e2e_video = [], None
+    for codec in codecs:
+        for seconds in lengths:
+            for size in sizes:
+                name = f"{codec}_{seconds}s_{size[0]}x{size[1]}"
+                video = os.path.join(workdir, name + CODECS[codec])
+                frames = make_trailer(video, seconds, size, codec)
+                if not frames:
+                    print(f"codec {codec} not available, skipping", file=sys.stderr)
+                    break
+                if e2e_video is None and size == (256, 144):
+                    e2e_video = video
+                for mode in modes:
+                    cases.append({"bench": "sampler", "name": f"sampler/{mode}/{name}", "video": video,
+                                  "mode": mode, "frames": frames, "repeat": repeat})
+
+    cases.append({"bench": "palette", "name": "palette/500", "movies": 500, "repeat": repeat})
+    cases.append({"bench": "png", "name": "png/500", "movies": 500, "repeat": repeat, "workdir": workdir})
+    if e2e_video:
+        titles = 4 if quick else 16
+        cases.append({"bench": "end_to_end", "name": f"end_to_end/{titles}", "video": e2e_video,
+                      "mode": "seek", "titles": titles, "workers": os.cpu_count() or 1,
+                      "workdir": os.path.join(workdir, "e2e")})
+    return cases
+
+
+def compare(current, baseline):
+    """Print per-case time ratios between two benchmark reports."""
+    base = {r["name"]: r for r in baseline["results"]}
+    print(f"{'case':55s} {'base s':>9s} {'now s':>9s} {'speedup':>8s}")
+    for r in current["results"]:
+        b = base.get(r["name"])
+        if not b or "seconds" not in b or "seconds" not in r:
+            continue
+        print(f"{r['name']:55s} {b['seconds']:9.3f} {r['seconds']:9.3f} {b['seconds'] / r['seconds']:7.2f}x")
+
+
+def main():
+    """Generate inputs, run every case in a fresh process and report JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="print speedups against an earlier report")
+    parser.add_argument("--quick", action="store_true", help="small grid for a fast smoke run")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repeats per case (best is kept)")
+    parser.add_argument("--only", help="run only cases whose name contains this string")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds before a case is killed and marked failed")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="barcode_bench_") as workdir:
+        cases = build_cases(workdir, args.quick, args.repeat)
+        if args.only:
+            cases = [c for c in cases if args.only in c["name"]]
+        results = []
+        for case in cases:
+            result = run_isolated(ctx, case, args.timeout)
+            result["name"] = case["name"]
+            results.append(result)
+            timing = f"{result['seconds']:.3f}s" if "seconds" in result else result["error"]
+            print(f"{case['name']}: {timing}, peak {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
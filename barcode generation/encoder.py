@@ -1,39 +1,281 @@
 """Color extraction and barcode generation utilities."""
+import hashlib
+import json
+import os
 import numpy as np
-from sklearn.metrics import pairwise_distances
-from skimage import color
 import cv2
 
+# sRGB (D65) -> XYZ matrix and D65 white point, as used by skimage.color.rgb2lab
+_XYZ_FROM_RGB = np.array([
+    [0.412453, 0.357580, 0.180423],
+    [0.212671, 0.715160, 0.072169],
+    [0.019334, 0.119193, 0.950227],
+])
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def rgb_to_lab(rgb):
+    """Convert RGB values in [0, 1] (any leading shape, last axis = 3) to CIE LAB."""
+    rgb = np.asarray(rgb, dtype=np.float64)
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = linear @ _XYZ_FROM_RGB.T / _D65_WHITE
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    L = 116.0 * f[..., 1] - 16.0
+    a = 500.0 * (f[..., 0] - f[..., 1])
+    b = 200.0 * (f[..., 1] - f[..., 2])
+    return np.stack([L, a, b], axis=-1)
+
 
 def pick_most_different_colors(colors, n=4):
     """Select n most perceptually distinct colors using LAB color space."""
     colors = np.array(colors)  # shape (num_colors, 3)
-    colors_lab = color.rgb2lab(colors[np.newaxis, :, :] / 255.0)[0]
+    return colors[farthest_point_indices(colors[np.newaxis], n)[0]]
+
+
+def pick_most_different_colors_batch(colors, n=4, counts=None):
+    """
+    Palettes for many movies at once.
+
+    colors is a stacked (movies, num_colors, 3) RGB array; when movies have
+    fewer colors than num_colors, pass their real lengths in counts and the
+    padding rows are ignored. Returns an (movies, n, 3) array.
+    """
+    colors = np.asarray(colors)
+    idx = farthest_point_indices(colors, n, counts)
+    return np.take_along_axis(colors, idx[..., np.newaxis], axis=1)
+
+
+def farthest_point_indices(colors, n=4, counts=None):
+    """
+    Incremental farthest-point sampling in LAB over a (movies, num_colors, 3) batch.
+
+    Starts from the color farthest from each movie's mean, then repeatedly adds
+    the color whose distance to the nearest already-picked color is largest.
+    A running min-distance vector is updated with just the newest pick, so each
+    step costs O(num_colors) instead of a full pairwise distance matrix.
+    """
+    m, k = colors.shape[:2]
+    lab = rgb_to_lab(colors / 255.0)
+    valid = np.ones((m, k), dtype=bool) if counts is None else np.arange(k) < np.asarray(counts)[:, None]
+    rows = np.arange(m)
 
     # start with the color farthest from the mean in Lab space
-    mean_color = colors_lab.mean(axis=0)
-    first_idx = np.argmax(np.linalg.norm(colors_lab - mean_color, axis=1))
-    selected_indices = [first_idx]
+    mean = (lab * valid[..., None]).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)[:, None]
+    dist = np.linalg.norm(lab - mean[:, None], axis=2)
+    dist[~valid] = -np.inf
+    picks = np.empty((m, n), dtype=int)
+    picks[:, 0] = np.argmax(dist, axis=1)
 
-    while len(selected_indices) < n:
-        # compute distance from all colors to already selected
-        dist = np.min(pairwise_distances(colors_lab, colors_lab[selected_indices]), axis=1)
+    min_dist = np.full((m, k), np.inf)
+    for i in range(1, n):
+        newest = lab[rows, picks[:, i - 1]]
+        min_dist = np.minimum(min_dist, np.linalg.norm(lab - newest[:, None], axis=2))
+        candidates = min_dist.copy()
         # exclude already selected
-        dist[selected_indices] = -1
-        next_idx = np.argmax(dist)
-        selected_indices.append(next_idx)
+        candidates[rows[:, None], picks[:, :i]] = -1
+        candidates[~valid] = -np.inf
+        picks[:, i] = np.argmax(candidates, axis=1)
+    return picks
+
+def barcode_image(avg_colors, h=100):
+    """Return an (h, len(avg_colors), 3) uint8 RGB barcode as a broadcast view."""
+    colors = np.asarray(avg_colors, dtype=np.float64).reshape(-1, 3).astype(np.uint8)
+    return np.broadcast_to(colors[np.newaxis], (h, len(colors), 3))
 
-    # return the original RGB colors
-    return colors[selected_indices]
 
 def get_barcode_png(avg_colors, save_file):
     """Generate and save a barcode image from a list of RGB colors."""
-    h = 100
-    w = len(avg_colors)
-    barcode = np.zeros((h, w, 3), dtype=np.uint8)
-    for x, c in enumerate(avg_colors):
-        barcode[:, x] = c
-
+    barcode = barcode_image(avg_colors, 100)
     cv2.imwrite(save_file, cv2.cvtColor(barcode, cv2.COLOR_RGB2BGR))
 
     return save_file
+
+
+def _row_hash(row):
+    """Content hash of one atlas row."""
+    return hashlib.sha1(row.tobytes()).hexdigest()[:16]
+
+
+def build_barcode_atlas(movies, atlas_path="results/barcodes_atlas.png",
+                        index_path="results/barcodes_atlas.json", width=200):
+    """
+    Pack every movie's barcode into one sprite atlas, one 1px row per movie.
+
+    movies yields dicts with "title", "avg_colors" and optionally "id". Rows of
+    an existing atlas are reused: unchanged movies keep their row untouched,
+    changed ones are overwritten in place and new ones are appended, so row
+    offsets stay stable between runs. The index maps title (and id) to
+    {"row", "width", "hash"}; a .webp atlas_path is written losslessly.
+    """
+    index = {"width": width, "row_height": 1, "image": os.path.basename(atlas_path), "rows": {}, "ids": {}}
+    atlas = np.zeros((0, width, 3), dtype=np.uint8)
+    if os.path.exists(index_path) and os.path.exists(atlas_path):
+        with open(index_path, "r") as f:
+            old_index = json.load(f)
+        old_atlas = cv2.imread(atlas_path, cv2.IMREAD_COLOR)
+        if old_index.get("width") == width and old_atlas is not None and old_atlas.shape[1] == width:
+            index = old_index
+            atlas = cv2.cvtColor(old_atlas, cv2.COLOR_BGR2RGB)
+
+    changed = []
+    new_rows = []
+    for movie in movies:
+        row = np.zeros((width, 3), dtype=np.uint8)
+        colors = barcode_image(movie["avg_colors"][:width], 1)[0]
+        row[:len(colors)] = colors
+        digest = _row_hash(row)
+        entry = index["rows"].get(movie["title"])
+        if entry is None:
+            entry = {"row": len(atlas) + len(new_rows)}
+            new_rows.append(row)
+            index["rows"][movie["title"]] = entry
+        elif entry.get("hash") == digest:
+            continue
+        else:
+            atlas[entry["row"]] = row
+        entry.update(width=len(colors), hash=digest)
+        if movie.get("id") is not None:
+            index["ids"][str(movie["id"])] = entry["row"]
+        changed.append(movie["title"])
+
+    if not changed:
+        print(f"Barcode atlas {atlas_path} is up to date")
+        return atlas_path
+    if new_rows:
+        atlas = np.concatenate([atlas, np.stack(new_rows)])
+
+    params = [cv2.IMWRITE_WEBP_QUALITY, 101] if atlas_path.lower().endswith(".webp") else []
+    cv2.imwrite(atlas_path, cv2.cvtColor(atlas, cv2.COLOR_RGB2BGR), params)
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+    print(f"Updated {len(changed)} of {len(atlas)} rows in {atlas_path}")
+    return atlas_path
+
+
+def load_title_ids(processed_path):
+    """
+    Map title -> record id from the dashboard's processed.json.
+
+    The id is the record's "id" field, as the dashboard compares it (String(id)).
+    Records sharing a title resolve to the most-voted one, which the trailer
+    search most likely found; the others get no barcode rather than its colors.
+    """
+    if not processed_path or not os.path.exists(processed_path):
+        return {}
+    with open(processed_path, "r") as f:
+        records = json.load(f)
+    best = {}
+    for record in records:
+        title, record_id = record.get("title"), record.get("id")
+        if not title or record_id is None:
+            continue
+        if isinstance(record_id, float) and record_id.is_integer():
+            record_id = int(record_id)
+        votes = record.get("numVotes") or 0
+        if title not in best or votes > best[title][0]:
+            best[title] = (votes, str(record_id))
+    return {title: record_id for title, (_, record_id) in best.items()}
+
+
+def _to_uint8(values):
+    """Round color values to uint8, clipping to [0, 255]."""
+    return np.clip(np.rint(np.asarray(values, dtype=np.float64)), 0, 255).astype(np.uint8)
+
+
+def build_compact_colors(movies, blob_path="results/movies_colors.bin",
+                         table_path="results/movies_colors_table.json", title_ids=None, stride=200):
+    """
+    Write barcode colors as one uint8 blob plus a small JSON table.
+
+    Movie i's avg_colors are the RGB bytes [i * stride * 3, (i + 1) * stride * 3)
+    of the blob, zero-padded after counts[i] colors. The table holds the parallel
+    titles / ids / counts / overall_avg / four_opposites arrays, with colors
+    rounded to uint8. ids come from the movie dict or title_ids (title ->
+    processed.json record id), else null.
+    """
+    title_ids = title_ids or {}
+    table = {"version": 1, "stride": stride, "blob": os.path.basename(blob_path),
+             "titles": [], "ids": [], "counts": [], "overall_avg": [], "four_opposites": []}
+    tmp_blob = blob_path + ".tmp"
+    with open(tmp_blob, "wb") as f:
+        for movie in movies:
+            row = np.zeros((stride, 3), dtype=np.uint8)
+            colors = _to_uint8(movie["avg_colors"][:stride]).reshape(-1, 3)
+            row[:len(colors)] = colors
+            f.write(row.tobytes())
+            table["titles"].append(movie["title"])
+            table["ids"].append(movie.get("id") or title_ids.get(movie["title"]))
+            table["counts"].append(len(colors))
+            table["overall_avg"].append(_to_uint8(movie.get("overall_avg") or [0, 0, 0]).tolist())
+            table["four_opposites"].append(_to_uint8(movie.get("four_opposites") or []).reshape(-1, 3).tolist())
+    os.replace(tmp_blob, blob_path)
+    with open(table_path, "w") as f:
+        json.dump(table, f, separators=(",", ":"))
+    matched = sum(1 for i in table["ids"] if i)
+    print(f"Wrote compact colors for {len(table['titles'])} movies ({matched} with ids) to {blob_path}")
+    return blob_path
+
+
+def kmeans_palette(colors, k=4, iters=10):
+    """
+    k-means palette of one movie's colors, clustered in LAB.
+
+    Seeds are picked by farthest-point sampling, so the result is deterministic.
+    Returns (rgb, lab, weights) with the heaviest cluster first: rgb is the mean
+    RGB of each cluster's members, weights the share of colors assigned to it.
+    Movies with fewer than k distinct colors get fewer clusters.
+    """
+    rgb = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    k = min(k, len(np.unique(rgb, axis=0)))
+    if not k:
+        return np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0)
+    lab = rgb_to_lab(rgb / 255.0)
+    centers = lab[farthest_point_indices(rgb[np.newaxis], k)[0]]
+    for _ in range(iters):
+        labels = np.argmin(((lab[:, None] - centers[None]) ** 2).sum(axis=2), axis=1)
+        counts = np.bincount(labels, minlength=k)[:, None]
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, lab)
+        updated = np.where(counts > 0, sums / np.maximum(counts, 1), centers)
+        if np.allclose(updated, centers):
+            break
+        centers = updated
+    labels = np.argmin(((lab[:, None] - centers[None]) ** 2).sum(axis=2), axis=1)
+    counts = np.bincount(labels, minlength=k)
+    order = [c for c in np.argsort(-counts, kind="stable") if counts[c]]
+    palette = np.array([rgb[labels == c].mean(axis=0) for c in order])
+    return palette, centers[order], counts[order] / len(rgb)
+
+
+def _grid_key(lab, cell):
+    """Key of the LAB grid cell containing lab, e.g. "5,-1,2"."""
+    return ",".join(str(int(v)) for v in np.floor(np.asarray(lab) / cell))
+
+
+def build_color_index(movies, path="results/movies_palettes.json", title_ids=None, k=4, cell=10.0):
+    """
+    Precompute per-movie LAB k-means palettes plus a LAB grid over overall colors.
+
+    The JSON holds parallel titles / ids / palettes (uint8 RGB, heaviest first) /
+    weights / lab arrays, where ids are processed.json record ids (see
+    load_title_ids) and lab is the movie's overall_avg in LAB. grid maps
+    "i,j,l" (floor of L, a, b divided by cell) to the movies in that cell, so a
+    nearest-color query only visits the cells within its radius.
+    """
+    title_ids = title_ids or {}
+    index = {"version": 1, "k": k, "cell": cell, "titles": [], "ids": [], "palettes": [], "weights": [],
+             "lab": [], "grid": {}}
+    for i, movie in enumerate(movies):
+        palette, _, weights = kmeans_palette(movie["avg_colors"], k)
+        overall = movie.get("overall_avg") or (palette.T @ weights if len(weights) else [0, 0, 0])
+        lab = np.round(rgb_to_lab(np.asarray(overall, dtype=np.float64) / 255.0), 1)
+        index["titles"].append(movie["title"])
+        index["ids"].append(movie.get("id") or title_ids.get(movie["title"]))
+        index["palettes"].append(_to_uint8(palette).tolist())
+        index["weights"].append(np.round(weights, 3).tolist())
+        index["lab"].append(lab.tolist())
+        index["grid"].setdefault(_grid_key(lab, cell), []).append(i)
+    with open(path, "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    print(f"Wrote palettes for {len(index['titles'])} movies in {len(index['grid'])} grid cells to {path}")
+    return path
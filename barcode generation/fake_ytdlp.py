@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-in for yt-dlp used for offline runs of the barcode pipeline.
+
+Serves the local video named by FAKE_YTDLP_VIDEO (or the URL itself when it is
+an existing file path) to the -o target, or to stdout for "-o -", in small
+chunks so streaming consumers see bytes arrive gradually. Other yt-dlp options
+are accepted and ignored.
+
+    FAKE_YTDLP_VIDEO=sample.mp4 python barcode_generator_download.py --yt-dlp ./fake_ytdlp.py
+
+FAKE_YTDLP_FAIL makes calls fail on a schedule: a comma-separated list of
+outcomes for the 1st, 2nd, ... call with the same output path (or URL, for
+"-o -"), the last one repeating. Outcomes are "ok" or a key of FAILURES, e.g.
+FAKE_YTDLP_FAIL=429,429,ok fails twice with a retryable error and then
+succeeds, while FAKE_YTDLP_FAIL=unavailable fails permanently. Call counts
+are kept in FAKE_YTDLP_STATE (default: fake_ytdlp_calls.json in the temp dir).
+"""
+import fcntl
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+CHUNK_SIZE = 64 * 1024
+
+# stderr lines in the style of real yt-dlp errors
+FAILURES = {
+    "429": "ERROR: [youtube] fake: Unable to download webpage: HTTP Error 429: Too Many Requests",
+    "503": "ERROR: unable to download video data: HTTP Error 503: Service Unavailable",
+    "timeout": "ERROR: [download] Got error: The read operation timed out",
+    "unavailable": "ERROR: [youtube] fake: Video unavailable",
+    "private": "ERROR: [youtube] fake: Private video. Sign in if you've been granted access to this video",
+}
+
+
+def scheduled_outcome(key, schedule):
+    """Count this call for key and return its outcome from the comma-separated schedule."""
+    outcomes = [o.strip() for o in schedule.split(",") if o.strip()] or ["ok"]
+    path = os.environ.get("FAKE_YTDLP_STATE", os.path.join(tempfile.gettempdir(), "fake_ytdlp_calls.json"))
+    with open(path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)  # concurrent downloads share the file
+        f.seek(0)
+        text = f.read()
+        calls = json.loads(text) if text else {}
+        n = calls.get(key, 0)
+        calls[key] = n + 1
+        f.seek(0)
+        f.truncate()
+        json.dump(calls, f)
+    return outcomes[min(n, len(outcomes) - 1)]
+
+
+def main(argv):
+    """Copy the configured video to the requested output."""
+    out_path, url = None, None
+    args = iter(argv)
+    for arg in args:
+        if arg == "-o":
+            out_path = next(args)
+        elif arg in ("-f", "--merge-output-format"):
+            next(args)
+        elif not arg.startswith("-"):
+            url = arg
+
+    schedule = os.environ.get("FAKE_YTDLP_FAIL")
+    if schedule:
+        outcome = scheduled_outcome(url if out_path in (None, "-") else out_path, schedule)
+        if outcome != "ok":
+            print(FAILURES.get(outcome, f"ERROR: {outcome}"), file=sys.stderr)
+            return 1
+
+    source = url if url and os.path.isfile(url) else os.environ.get("FAKE_YTDLP_VIDEO")
+    if not source or not os.path.isfile(source):
+        print("fake yt-dlp: no video to serve (set FAKE_YTDLP_VIDEO)", file=sys.stderr)
+        return 1
+
+    delay = float(os.environ.get("FAKE_YTDLP_CHUNK_DELAY", "0"))  # simulate a slow network
+    if out_path == "-":
+        with open(source, "rb") as src:
+            while chunk := src.read(CHUNK_SIZE):
+                sys.stdout.buffer.write(chunk)
+                if delay:
+                    time.sleep(delay)
+        sys.stdout.buffer.flush()
+    else:
+        shutil.copyfile(source, out_path or os.path.basename(source))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,204 @@
+"""Frame samplers that decode only the frames a color barcode needs."""
+import functools
+import subprocess
+import cv2
+import numpy as np
+
+FRAME_SIZE = (256, 144)  # (width, height) frames are area-downscaled to; matches the 144p downloads
+
+
+class FrameBuffer:
+    """
+    Preallocated (2 * count, h, w, 3) store of sampled frames.
+
+    Frames are area-downscaled to `size` straight into their slot, so no
+    full-resolution frame outlives its decode. push() takes a stream of unknown
+    length: every stride-th frame is kept, and once the buffer is full every
+    other kept frame is dropped and the stride doubles, so the result is still
+    evenly spaced and memory stays bounded.
+    """
+
+    def __init__(self, count, size=FRAME_SIZE):
+        w, h = size
+        self.count = count
+        self.size = (w, h)
+        self.frames = np.empty((2 * count, h, w, 3), dtype=np.uint8)
+        self.n = 0
+        self.stride = 1
+        self.seen = 0
+
+    def wants_next(self):
+        """True if the next pushed frame will be kept (lets callers skip converting it)."""
+        return self.seen % self.stride == 0
+
+    def push(self, frame):
+        """Offer the next frame of a stream; pass None for a frame that was skipped."""
+        if frame is not None and self.wants_next():
+            self.append(frame)
+        self.seen += 1
+
+    def append(self, frame):
+        """Store a frame unconditionally (for samplers that already picked it)."""
+        slot = self.frames[self.n]
+        if frame.shape[:2] == slot.shape[:2]:
+            slot[...] = frame
+        else:
+            cv2.resize(frame, self.size, dst=slot, interpolation=cv2.INTER_AREA)
+        self.n += 1
+        if self.n == len(self.frames):
+            self.frames[:self.count] = self.frames[::2]
+            self.n = self.count
+            self.stride *= 2
+
+    def result(self):
+        """Return at most count evenly spaced frames as an (N, h, w, 3) array."""
+        if self.n <= self.count:
+            return self.frames[:self.n]
+        return self.frames[np.linspace(0, self.n - 1, self.count, dtype=int)]
+
+
+def _decimate_capture(cap, buffer):
+    """Push every remaining frame of cap into buffer, converting only the kept ones."""
+    while cap.grab():
+        buffer.push(cap.retrieve()[1] if buffer.wants_next() else None)
+    return buffer.result()
+
+
+def _record(stats, decoded):
+    """Report how many frames a sampler pulled from the decoder."""
+    if stats is not None:
+        stats["frames_decoded"] = int(decoded)
+
+
+def sample_grab(video_path, count, size=FRAME_SIZE, stats=None):
+    """Original sampler: decode every frame, keeping one every total/count frames."""
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames_per_capture = int(total_frames / count)
+
+    buffer = FrameBuffer(count, size)
+    decoded = 0
+    for idx in range(count):
+        for _ in range(frames_per_capture - 1):
+            if not cap.grab():
+                break
+            decoded += 1
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        decoded += 1
+        buffer.append(frame)
+
+    cap.release()
+    _record(stats, decoded)
+    return buffer.result()
+
+
+def sample_seek(video_path, count, size=FRAME_SIZE, stats=None, min_seek_stride=24):
+    """
+    Seek straight to count evenly spaced frames.
+
+    Each seek lands on the nearest preceding keyframe and decodes forward, so
+    it only pays off when samples are further apart than about half a GOP;
+    below min_seek_stride frames per sample a sequential pass is used instead.
+    Containers with a missing or wrong frame count also fall back to the
+    sequential pass, which does not rely on the count at all.
+    """
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    buffer = FrameBuffer(count, size)
+    if total_frames > 0 and total_frames / count >= min_seek_stride:
+        for target in np.linspace(0, total_frames - 1, count, dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(target))
+            ret, frame = cap.read()
+            if not ret:
+                break
+            buffer.append(frame)
+        if buffer.n < count:
+            # frame count was overstated; rescan without trusting it
+            buffer = FrameBuffer(count, size)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    if buffer.n:
+        frames = buffer.result()
+        _record(stats, buffer.n)  # seeks also decode up to a GOP each; not counted here
+    else:
+        frames = _decimate_capture(cap, buffer)
+        _record(stats, buffer.seen)
+    cap.release()
+    return frames
+
+
+def iter_rawvideo(stream, size):
+    """Yield BGR frames of the given (width, height) from a rawvideo byte stream."""
+    w, h = size
+    frame_bytes = w * h * 3
+    while True:
+        buf = stream.read(frame_bytes)
+        if len(buf) < frame_bytes:
+            return
+        yield np.frombuffer(buf, dtype=np.uint8).reshape(h, w, 3)
+
+
+def sample_rawvideo(stream, count, size=FRAME_SIZE, stats=None):
+    """Decimate a rawvideo byte stream of unknown length into at most count frames."""
+    buffer = FrameBuffer(count, size)
+    for frame in iter_rawvideo(stream, size):
+        buffer.push(frame)
+    _record(stats, buffer.seen)
+    return buffer.result()
+
+
+@functools.lru_cache(maxsize=None)
+def _vfr_args(ffmpeg="ffmpeg"):
+    """Output options that pass frames through without duplication: -fps_mode (ffmpeg 5.1+) or the older -vsync."""
+    try:
+        help_text = subprocess.run([ffmpeg, "-hide_banner", "-h", "full"], capture_output=True, text=True,
+                                   errors="replace").stdout
+    except OSError:
+        help_text = ""
+    return ["-fps_mode", "vfr"] if "-fps_mode" in help_text else ["-vsync", "vfr"]
+
+
+def sample_ffmpeg(video_path, count, size=FRAME_SIZE, stats=None, keyframes_only=False, ffmpeg="ffmpeg"):
+    """
+    Decode through an ffmpeg rawvideo pipe, scaling only the selected frames.
+
+    With a known frame count ffmpeg's select filter drops everything but the
+    samples before scaling and pixel conversion; otherwise every frame is
+    piped at the small output size and decimated here. keyframes_only makes
+    ffmpeg skip decoding of non-key frames entirely, which is the fastest
+    mode but yields fewer samples on trailers with long GOPs.
+    """
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    filters = []
+    if total_frames > 0 and not keyframes_only:
+        step = max(1, total_frames // count)
+        filters.append(f"select='not(mod(n\\,{step}))'")
+    filters.append(f"scale={size[0]}:{size[1]}:flags=area")
+
+    cmd = [ffmpeg, "-v", "error"]
+    if keyframes_only:
+        cmd += ["-skip_frame", "nokey"]
+    cmd += ["-i", video_path, "-vf", ",".join(filters), *_vfr_args(ffmpeg),
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        frames = sample_rawvideo(proc.stdout, count, size, stats)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    return frames
+
+
+SAMPLERS = {
+    "grab": sample_grab,
+    "seek": sample_seek,
+    "ffmpeg": sample_ffmpeg,
+}
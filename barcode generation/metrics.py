@@ -0,0 +1,100 @@
+"""
+Per-title metrics for barcode runs: a JSONL event log and a summary report.
+
+    python metrics.py results/metrics.jsonl --top 10
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from retry import error_reason
+
+DURATION_FIELDS = ["search_s", "download_s", "decode_s", "encode_s", "total_s"]
+COUNT_FIELDS = ["bytes_downloaded", "frames_decoded", "frames_kept", "retries"]
+
+
+class MetricsLog:
+    """Appends one JSON event per title outcome to a JSONL file."""
+
+    def __init__(self, path="results/metrics.jsonl", run_id=None):
+        self.path = path
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        self.lock = threading.Lock()
+
+    def record(self, title, status, metrics, stage=None, error=None):
+        """Write one event; status is "ok" or "failed" (with the failing stage and error)."""
+        event = {"run": self.run_id, "ts": time.time(), "title": title, "status": status}
+        event.update(metrics)
+        if status != "ok":
+            event["failed_stage"] = stage
+            event["error"] = error
+            event["reason"] = error_reason(error or "")
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+
+
+def load_events(path, run_id=None):
+    """Read events from a metrics file, optionally for one run only."""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if run_id is None or event.get("run") == run_id:
+                events.append(event)
+    return events
+
+
+def summarize(events, top=10):
+    """Print stage percentiles, slowest titles and a failure breakdown."""
+    ok = [e for e in events if e["status"] == "ok"]
+    failed = [e for e in events if e["status"] != "ok"]
+    print(f"{len(events)} titles: {len(ok)} ok, {len(failed)} failed")
+
+    print(f"\n{'field':18s} {'n':>6s} {'p50':>10s} {'p90':>10s} {'p99':>10s} {'max':>10s} {'sum':>12s}")
+    for field in DURATION_FIELDS + COUNT_FIELDS:
+        values = np.array([e[field] for e in events if e.get(field) is not None], dtype=float)
+        if not len(values):
+            continue
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        print(f"{field:18s} {len(values):6d} {p50:10.2f} {p90:10.2f} {p99:10.2f} {values.max():10.2f} {values.sum():12.1f}")
+
+    slowest = sorted(ok, key=lambda e: e.get("total_s", 0), reverse=True)[:top]
+    if slowest:
+        print(f"\nSlowest {len(slowest)} titles:")
+        for e in slowest:
+            parts = ", ".join(f"{f[:-2]} {e[f]:.1f}s" for f in DURATION_FIELDS[:-1] if e.get(f) is not None)
+            print(f"  {e.get('total_s', 0):7.1f}s  {e['title']}  ({parts})")
+
+    if failed:
+        print("\nFailures by stage and reason:")
+        reasons = Counter(
+            (e.get("failed_stage"), e.get("reason") or error_reason(e.get("error") or "")) for e in failed
+        )
+        for (stage, reason), n in reasons.most_common():
+            print(f"  {n:5d}  {stage}: {reason}")
+
+
+def main():
+    """Summarize a metrics file."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="results/metrics.jsonl")
+    parser.add_argument("--run", help="only summarize this run id (default: all runs)")
+    parser.add_argument("--last", action="store_true", help="only summarize the most recent run")
+    parser.add_argument("--top", type=int, default=10, help="how many slowest titles to list")
+    args = parser.parse_args()
+
+    events = load_events(args.path, args.run)
+    if args.last and events:
+        events = [e for e in events if e.get("run") == events[-1].get("run")]
+    summarize(events, args.top)
+
+
+if __name__ == "__main__":
+    main()
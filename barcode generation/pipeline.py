@@ -0,0 +1,153 @@
+"""Bounded multi-stage executor used to overlap trailer search, download and decoding."""
+import heapq
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+_DONE = object()  # end-of-stream marker passed from one stage to the next
+
+
+class Stage:
+    """One pipeline step: a function applied to every job by a pool of workers."""
+
+    def __init__(self, name, func, workers=1, processes=False, limiter=None, retry_from=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.processes = processes  # run func in a process pool (CPU-bound work)
+        self.limiter = limiter  # e.g. a retry.RateLimiter; one token is taken before every call
+        self.retry_from = retry_from  # earlier stage that retried jobs restart at (default: this one)
+
+
+def run_pipeline(jobs, stages, on_result, on_error=None, queue_size=8, retry=None, on_retry=None):
+    """
+    Push jobs through the stages, each stage feeding the next through a bounded queue.
+
+    Every stage gets `workers` threads. Thread stages call their function directly;
+    process stages hand the job to a process pool of the same size and wait for it,
+    so at most `workers` jobs per stage are ever in flight. A stage function that
+    returns None drops the job; an exception drops it and is reported to on_error.
+    on_result and on_error are always called from the calling thread, so they can
+    write results without extra locking.
+
+    retry(stage_name, job, exc), if given, may return a delay in seconds instead
+    of None: the job is then parked without holding a worker and put back into
+    the queue of the same stage (or of its retry_from stage) once the delay has
+    passed, and on_retry(stage_name, job, exc, delay) is called (from the
+    calling thread too). The run ends once the input is exhausted and no job is
+    in flight or parked.
+    """
+    inboxes = [queue.Queue(maxsize=queue_size) for _ in stages]
+    events = queue.Queue(maxsize=queue_size)
+    lock = threading.Lock()
+    remaining = [stage.workers for stage in stages]
+    # spawn, not fork: the pools start after the worker threads, and forking a threaded process can deadlock
+    spawn = multiprocessing.get_context("spawn")
+    pools = [ProcessPoolExecutor(max_workers=s.workers, mp_context=spawn) if s.processes else None for s in stages]
+    names = [stage.name for stage in stages]
+    idle = threading.Condition()
+    outstanding = [0]  # jobs fed and not yet finished, parked ones included
+    parked = []  # heap of (due, seq, stage index, job)
+    order = itertools.count()
+    drained = [False]
+
+    def finish():
+        with idle:
+            outstanding[0] -= 1
+            idle.notify_all()
+
+    def feed():
+        for job in jobs:
+            with idle:
+                outstanding[0] += 1
+            inboxes[0].put(job)
+        with idle:
+            while outstanding[0]:
+                idle.wait()
+            drained[0] = True
+            idle.notify_all()
+        inboxes[0].put(_DONE)
+
+    def unpark():
+        while True:
+            with idle:
+                while not drained[0] and not (parked and parked[0][0] <= time.monotonic()):
+                    idle.wait(parked[0][0] - time.monotonic() if parked else None)
+                if drained[0]:
+                    return
+                _, _, i, job = heapq.heappop(parked)
+            inboxes[i].put(job)  # outside the lock: workers need it to finish jobs
+
+    def work(i):
+        stage, inbox, pool = stages[i], inboxes[i], pools[i]
+        last = i == len(stages) - 1
+        restart = names.index(stage.retry_from) if stage.retry_from else i
+        outbox = events if last else inboxes[i + 1]
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                inbox.put(_DONE)  # let sibling workers see it too
+                break
+            if stage.limiter is not None:
+                stage.limiter.acquire()
+            try:
+                out = pool.submit(stage.func, job).result() if pool else stage.func(job)
+            except Exception as exc:
+                delay = retry(stage.name, job, exc) if retry is not None else None
+                if delay is None:
+                    events.put(("error", stage.name, job, exc))
+                    finish()
+                    continue
+                events.put(("retry", stage.name, job, exc, delay))
+                with idle:
+                    heapq.heappush(parked, (time.monotonic() + delay, next(order), restart, job))
+                    idle.notify_all()
+                continue
+            if out is None:
+                finish()
+            elif last:
+                outbox.put(("result", out))
+                finish()
+            else:
+                outbox.put(out)
+        with lock:
+            remaining[i] -= 1
+            finished = remaining[i] == 0
+        if finished:
+            outbox.put(_DONE)
+
+    threads = [threading.Thread(target=feed, daemon=True), threading.Thread(target=unpark, daemon=True)]
+    for i, stage in enumerate(stages):
+        threads += [threading.Thread(target=work, args=(i,), daemon=True, name=f"{stage.name}-{n}")
+                    for n in range(stage.workers)]
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            event = events.get()
+            if event is _DONE:
+                break
+            if event[0] == "result":
+                on_result(event[1])
+            elif event[0] == "retry":
+                if on_retry is not None:
+                    on_retry(*event[1:])
+            elif on_error is not None:
+                on_error(*event[1:])
+    except BaseException:
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+    # Every stage thread is done with its pool once they are joined; only then
+    # shut the pools down and wait, so each worker gets its exit sentinel
+    for t in threads:
+        t.join()
+    for pool in pools:
+        if pool is not None:
+            pool.shutdown(wait=True)
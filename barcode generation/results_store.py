@@ -0,0 +1,123 @@
+"""Append-only SQLite store for per-movie color results."""
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+
+class ResultsStore:
+    """
+    Crash-safe results store backed by SQLite.
+
+    Every movie is committed in its own transaction (WAL mode), so a crash can
+    lose at most the movie being written and never the earlier ones. Several
+    processes may write to the same file; SQLite serializes the commits.
+    export_json() produces the movies_colors.json array the frontend loads.
+    """
+
+    def __init__(self, path="results/movies_colors.sqlite", legacy_json="results/movies_colors.json"):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS movies ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " title TEXT NOT NULL UNIQUE,"
+            " data TEXT NOT NULL,"
+            " added_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        if legacy_json and os.path.exists(legacy_json) and not self.count():
+            self.import_json(legacy_json)
+
+    def add(self, movie, avg_colors, overall_avg, four_opposites):
+        """Commit one movie's colors; re-adding a title replaces the old entry."""
+        movie_data = {
+            "title": movie,
+            "avg_colors": [list(map(float, c)) for c in avg_colors],
+            "overall_avg": list(map(float, overall_avg)),
+            "four_opposites": [list(map(float, c)) for c in four_opposites]
+        }
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO movies (title, data, added_at) VALUES (?, ?, ?)",
+                (movie, json.dumps(movie_data), time.time()),
+            )
+
+    def done_titles(self):
+        """Return the set of titles already stored (reads only the title index)."""
+        return {row[0] for row in self.conn.execute("SELECT title FROM movies")}
+
+    def count(self):
+        """Return the number of stored movies."""
+        return self.conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+
+    def movies(self):
+        """Yield stored movie dicts in insertion order."""
+        for (data,) in self.conn.execute("SELECT data FROM movies ORDER BY seq"):
+            yield json.loads(data)
+
+    def import_json(self, json_path):
+        """Load an existing movies_colors.json array into the store."""
+        with open(json_path, "r") as f:
+            all_data = json.load(f)
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO movies (title, data, added_at) VALUES (?, ?, ?)",
+                [(d["title"], json.dumps(d), now) for d in all_data if d.get("title")],
+            )
+        print(f"Imported {len(all_data)} movies from {json_path}")
+
+    def export_json(self, json_path="results/movies_colors.json", indent=4):
+        """Write all movies as one JSON array, atomically replacing json_path."""
+        folder = os.path.dirname(os.path.abspath(json_path))
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write("[")
+                for i, movie in enumerate(self.movies()):
+                    f.write(",\n" if i else "\n")
+                    f.write(json.dumps(movie, indent=indent))
+                f.write("\n]\n")
+            os.replace(tmp_path, json_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        print(f"Exported {self.count()} movies to {json_path}")
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the results store to movies_colors.json")
+    parser.add_argument("--db", default="results/movies_colors.sqlite")
+    parser.add_argument("--out", default="results/movies_colors.json")
+    parser.add_argument("--atlas", metavar="PATH", help="also (re)build the barcode sprite atlas")
+    parser.add_argument("--compact", metavar="PATH", help="also write the quantized uint8 blob + PATH_table.json")
+    parser.add_argument("--palettes", metavar="PATH", help="also write LAB k-means palettes + a LAB grid color index")
+    parser.add_argument("--processed", default="../public/data/processed.json",
+                        help="processed.json used to key the compact table and palettes on record id")
+    args = parser.parse_args()
+    store = ResultsStore(args.db, legacy_json=None)
+    store.export_json(args.out)
+    if args.atlas:
+        from encoder import build_barcode_atlas
+
+        build_barcode_atlas(store.movies(), args.atlas, os.path.splitext(args.atlas)[0] + ".json")
+    if args.compact:
+        from encoder import build_compact_colors, load_title_ids
+
+        build_compact_colors(store.movies(), args.compact, os.path.splitext(args.compact)[0] + "_table.json",
+                             load_title_ids(args.processed))
+    if args.palettes:
+        from encoder import build_color_index, load_title_ids
+
+        build_color_index(store.movies(), args.palettes, load_title_ids(args.processed))
+    store.close()
@@ -0,0 +1,187 @@
+"""Retry policy, rate limiting and persistent job state for the barcode pipeline."""
+import random
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+
+RETRYABLE = "retryable"
+PERMANENT = "permanent"
+
+# (reason, kind, lowercase fragments of the error text or yt-dlp stderr), first match wins;
+# permanent reasons come first so e.g. "Video unavailable ... HTTP Error 429" is not retried.
+ERROR_REASONS = [
+    ("geo-blocked", PERMANENT, ["available in your country", "blocked it in your country"]),
+    ("private", PERMANENT, ["private video", "members-only"]),
+    ("age-restricted", PERMANENT, ["sign in to confirm your age"]),
+    ("copyright", PERMANENT, ["copyright"]),
+    ("removed", PERMANENT, ["has been removed", "account associated with this video has been terminated",
+                            "video unavailable"]),
+    ("format unavailable", PERMANENT, ["requested format is not available"]),
+    ("unsupported url", PERMANENT, ["unsupported url"]),
+    ("no trailer found", PERMANENT, ["no trailer found"]),
+    ("no usable frames", PERMANENT, ["no usable frames"]),
+    ("rate-limited", RETRYABLE, ["http error 429", "too many requests"]),
+    ("server error", RETRYABLE, ["http error 5"]),
+    ("timeout", RETRYABLE, ["timed out"]),
+    ("network", RETRYABLE, ["connection reset", "connection refused", "temporary failure in name resolution",
+                            "unable to download webpage", "remote end closed connection", "incomplete read"]),
+]
+
+
+def _match_reason(text):
+    """(reason, kind) of the first ERROR_REASONS entry matching text, or (None, None)."""
+    text = text.lower()
+    for reason, kind, fragments in ERROR_REASONS:
+        if any(fragment in text for fragment in fragments):
+            return reason, kind
+    return None, None
+
+
+def error_reason(error):
+    """
+    Short failure reason ("geo-blocked", "rate-limited", ...) for an exception or error text.
+
+    Unrecognized errors fall back to their first line with the "ERROR: [site] id:" prefix
+    yt-dlp adds stripped, so identical messages still group together.
+    """
+    text = f"{error} {getattr(error, 'stderr', '')}"
+    reason, _ = _match_reason(text)
+    if reason:
+        return reason
+    line = str(error).strip().splitlines()[0] if str(error).strip() else ""
+    return re.sub(r"^(\w+:\s*)?(ERROR:\s*)?(\[[^\]]*\]\s*[^:]*:\s*)?", "", line)[:80] or "unknown"
+
+
+class DownloadError(RuntimeError):
+    """A failed yt-dlp run, carrying the tail of its stderr for classification."""
+
+    def __init__(self, message, stderr=""):
+        super().__init__(message, stderr)
+        self.message = message
+        self.stderr = stderr
+
+    def __str__(self):
+        last_line = self.stderr.strip().splitlines()[-1] if self.stderr.strip() else ""
+        return f"{self.message}: {last_line}" if last_line else self.message
+
+
+def classify_error(exc):
+    """Return RETRYABLE or PERMANENT for a stage exception."""
+    _, kind = _match_reason(f"{exc} {getattr(exc, 'stderr', '')}")
+    if kind:
+        return kind
+    if isinstance(exc, (DownloadError, ConnectionError, TimeoutError, subprocess.TimeoutExpired)):
+        return RETRYABLE  # unrecognized yt-dlp/network failures are worth another try
+    return PERMANENT
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed job is retried, and after how long.
+
+    Used as run_pipeline's retry callback: counts failures in job["attempts"],
+    stores the classification in job["error_kind"] and returns the delay before
+    the next try, or None when the error is permanent or the attempts are used
+    up. Delays grow as base * 2^(attempt - 1), capped at cap, with "equal
+    jitter" (a random half of the delay) so parked jobs do not retry in lockstep.
+    """
+
+    def __init__(self, max_attempts=5, base=3.0, cap=300.0, rng=None):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base = base
+        self.cap = cap
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt):
+        """Backoff before retry number `attempt` (1-based)."""
+        full = min(self.cap, self.base * 2 ** (attempt - 1))
+        return full / 2 + self.rng.uniform(0, full / 2)
+
+    def __call__(self, stage, job, exc):
+        job["attempts"] = job.get("attempts", 0) + 1
+        job["error_kind"] = classify_error(exc)
+        if job["error_kind"] == PERMANENT or job["attempts"] >= self.max_attempts:
+            return None
+        return self.delay(job["attempts"])
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all threads of a run.
+
+    acquire() blocks until a token is free: on average at most `rate` calls per
+    second, with bursts of up to `burst` calls after an idle period.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class JobStore:
+    """
+    SQLite record of every title's latest outcome.
+
+    status is "done", "retrying" (parked for a backoff; left behind if the run
+    was interrupted) or "failed" (permanent error or out of attempts), with the
+    failing stage, error kind and message, so a later --retry-failed run can
+    pick up exactly the outstanding titles.
+    """
+
+    def __init__(self, path="results/jobs.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " title TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " stage TEXT,"
+            " kind TEXT,"
+            " error TEXT,"
+            " retry_at REAL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def record(self, title, status, attempts=0, stage=None, kind=None, error=None, retry_at=None):
+        """Store a title's latest outcome, replacing the previous one."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs (title, status, attempts, stage, kind, error, retry_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (title, status, attempts, stage, kind, error, retry_at, time.time()),
+            )
+
+    def titles(self, statuses, kind=None):
+        """Titles whose status is one of statuses (and whose error kind is kind, if given)."""
+        marks = ",".join("?" * len(statuses))
+        query = f"SELECT title FROM jobs WHERE status IN ({marks})"
+        params = list(statuses)
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        return {row[0] for row in self.conn.execute(query, params)}
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
@@ -1,21 +1,143 @@
-"""YouTube trailer URL lookup using yt-dlp."""
-import yt_dlp
+"""YouTube trailer URL lookup using yt-dlp, with a persistent lookup cache."""
+import re
+import sqlite3
+import threading
+import time
 
+DAY = 24 * 60 * 60
 
-def find_trailer(movie_title):
-    """Search YouTube for a movie's official trailer and return the URL."""
-    query = f"ytsearch1:{movie_title} official trailer"  # '1' = return 1 result
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'skip_download': False,
-    }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        result = ydl.extract_info(query, download=False)
-        if 'entries' in result and result['entries']:
+
+def normalize_title(title):
+    """Cache key for a title: lowercase, trimmed, inner whitespace collapsed."""
+    return re.sub(r"\s+", " ", str(title)).strip().lower()
+
+
+class YoutubeSearch:
+    """Search backend that reuses one yt_dlp.YoutubeDL instance for many lookups."""
+
+    def __init__(self):
+        import yt_dlp  # imported lazily so stub backends work without yt-dlp installed
+
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': False,
+        }
+        self.ydl = yt_dlp.YoutubeDL(ydl_opts)
+
+    def search(self, movie_title):
+        """Search YouTube for a movie's official trailer and return the URL."""
+        query = f"ytsearch1:{movie_title} official trailer"  # '1' = return 1 result
+        result = self.ydl.extract_info(query, download=False)
+        if result and 'entries' in result and result['entries']:
             video = result['entries'][0]
             return video['webpage_url']
-    return None
+        return None
+
+    def close(self):
+        """Release the underlying YoutubeDL instance."""
+        self.ydl.close()
+
+
+class StaticSearch:
+    """Offline stub backend that answers every lookup with the same URL (or local file)."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def search(self, movie_title):
+        """Return the configured URL regardless of title."""
+        return self.url
+
+    def close(self):
+        """Nothing to release."""
+
+
+class TrailerCache:
+    """
+    Persistent title -> trailer URL cache stored in SQLite.
+
+    Found URLs are trusted for `ttl` seconds; titles with no result are cached
+    as negative entries for the shorter `negative_ttl`, so reruns skip them
+    without hiding trailers that get uploaded later.
+    """
+
+    def __init__(self, path="results/trailer_cache.sqlite", ttl=90 * DAY, negative_ttl=7 * DAY):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS trailers ("
+            " key TEXT PRIMARY KEY,"
+            " title TEXT NOT NULL,"
+            " url TEXT,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, movie_title):
+        """Return (hit, url); url is None for a cached negative result."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT url, fetched_at FROM trailers WHERE key = ?", (normalize_title(movie_title),)
+            ).fetchone()
+        if row is None:
+            return False, None
+        url, fetched_at = row
+        max_age = self.ttl if url else self.negative_ttl
+        if time.time() - fetched_at > max_age:
+            return False, None
+        return True, url
+
+    def put(self, movie_title, url):
+        """Store a lookup result (url may be None)."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO trailers (key, title, url, fetched_at) VALUES (?, ?, ?, ?)",
+                (normalize_title(movie_title), movie_title, url, time.time()),
+            )
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+
+def find_trailer(movie_title, cache=None, backend=None):
+    """Search YouTube for a movie's official trailer and return the URL."""
+    return find_trailers([movie_title], cache=cache, backend=backend)[movie_title]
+
+
+def find_trailers(movie_titles, cache=None, backend=None):
+    """
+    Look up trailers for many titles, returning {title: url or None}.
+
+    Cached titles are answered without searching; the rest share one search
+    backend (a YoutubeSearch unless another one is passed in).
+    """
+    urls = {}
+    misses = []
+    for title in movie_titles:
+        hit, url = cache.get(title) if cache is not None else (False, None)
+        if hit:
+            urls[title] = url
+        else:
+            misses.append(title)
+
+    if misses:
+        own_backend = backend is None
+        if own_backend:
+            backend = YoutubeSearch()
+        try:
+            for title in misses:
+                urls[title] = backend.search(title)
+                if cache is not None:
+                    cache.put(title, urls[title])
+        finally:
+            if own_backend:
+                backend.close()
+    return urls
+
 
 if __name__ == "__main__":
     movie = "Inception"
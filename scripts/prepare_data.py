@@ -10,22 +10,140 @@ Inputs (expected in data/raw/):
   name.basics.tsv.gz: IMDB non-commercial data exports.
 
 Outputs:
-- public/data/processed.json
+- public/data/processed.json, plus a content-hashed copy with .gz/.br
+  siblings listed in public/data/manifest.json
+- public/data/processed_columns.bin: the same table in a columnar binary format
+- public/data/cube.json: year x region x genre aggregates for the timeline and matrix
+- public/data/shards/ (with --shard-years): year-bucketed shards listed in manifest.json
+- public/data/search_index.json: title/actor token index for search autocomplete
+- public/data/deltas/: per-build record changes, listed in manifest.json (see data/schema.md)
 - public/data/sample_processed.json
+
+The IMDB dumps are converted once into typed Parquet files under data/cache/
+(requires pyarrow); later runs read only the needed columns and rows from
+there. Pass --no-cache to always parse the TSV files.
+
+The work is split into named stages (movies, engagement, ratings, principals,
+basics, imdb, cast, merged) whose outputs are pickled under
+data/cache/stages/ and reused until their code, raw inputs or upstream
+stages change. --list shows their status, --stage builds single stages and
+--force NAME (or all) recomputes a stage and everything downstream of it.
+
+--low-memory reads the IMDB dumps with compact dtypes, streams Parquet rows
+in batches and runs one stage at a time; --max-memory 2G additionally fits
+the chunk sizes and the number of scan workers to that budget. IMDB ids are
+always matched as sorted integer arrays and titles as 64-bit hashes.
 """
 from __future__ import annotations
 
+import argparse
+import gzip
+import hashlib
+import inspect
+import io
 import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
 import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from ast import literal_eval
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Iterable, Iterator, List, Optional
 
 import pandas as pd
 
+try:  # optional: columnar cache of the IMDB dumps
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - falls back to parsing the TSV dumps
+    pa = ds = pq = None
+
+try:  # optional: .br copies of the exported JSON
+    import brotli
+except ImportError:  # pragma: no cover - only .gz copies are written
+    brotli = None
+
 ROOT = Path(__file__).resolve().parents[1]
 RAW_DIR = ROOT / "data" / "raw"
 PUBLIC_DATA = ROOT / "public" / "data"
+CACHE_DIR: Optional[Path] = ROOT / "data" / "cache"  # set to None to disable the Parquet cache
+
+# Columns kept in the Parquet cache per IMDB dump, with the dtype they are stored as.
+IMDB_CACHE_COLUMNS = {
+    "title.basics": {
+        "tconst": "string",
+        "titleType": "string",
+        "primaryTitle": "string",
+        "originalTitle": "string",
+        "startYear": "float64",
+        "runtimeMinutes": "float64",
+        "genres": "string",
+    },
+    "title.ratings": {"tconst": "string", "averageRating": "float64", "numVotes": "int64"},
+    "title.principals": {"tconst": "string", "ordering": "int64", "nconst": "string", "category": "string"},
+    "name.basics": {"nconst": "string", "primaryName": "string"},
+}
+CACHE_VERSION = 1
+JOIN_STATS = ROOT / "data" / "join_stats.json"  # report written by merge_sources
+STAGE_DIR = ROOT / "data" / "cache" / "stages"  # pickled outputs of the stage DAG
+BUILD_STATE = ROOT / "data" / "cache" / "build_state.json"  # per-record hashes of the last export
+# Columnar export (processed_columns.bin): column encodings, see data/schema.md.
+COLUMNAR_MAGIC = b"MVC1"
+COLUMNAR_FLOAT = ["duration_minutes", "rating", "actor_rating"]
+COLUMNAR_FLOAT64 = ["budget", "revenue", "numVotes", "viewership"]  # large values that float32 would round
+COLUMNAR_INT = ["release_year"]
+COLUMNAR_DICT = ["region", "country", "language"]
+COLUMNAR_BITSET = ["genres"]
+INT32_NULL = -(2**31)
+SHARD_STAT_COLUMNS = ["release_year", "budget", "revenue", "rating", "numVotes", "viewership"]
+CUBE_MEASURES = ["budget", "revenue", "rating", "viewership"]  # summed per year x region x genre cell
+MAX_DELTAS = 14  # deltas kept next to processed.json; older clients refetch the full file
+SCAN_WORKERS = os.cpu_count() or 1  # processes used to filter TSV chunks; 1 = serial
+TITLE_TYPES = ["movie", "tvSeries", "tvMiniSeries"]
+# Low-memory mode (--low-memory / --max-memory): explicit dtypes, streamed Parquet batches, one stage at a time.
+LOW_MEMORY = False
+MAX_MEMORY: Optional[int] = None  # bytes; chunk sizes and scan workers are fitted to it
+LOW_MEMORY_DTYPES = {
+    "title.basics": {"titleType": "category", "genres": "category"},
+    "title.ratings": {"numVotes": "int32"},
+    "title.principals": {"category": "category", "ordering": "int16"},
+}
+CHUNK_MEMORY_SHARE = 0.25  # share of MAX_MEMORY for the IMDB chunks in flight; the rest is for stage outputs
+ROW_BYTES_GUESS = 300  # in-memory bytes per IMDB row until the first chunk has been measured
+MIN_CHUNK_ROWS = 10_000
+WORKER_MEMORY = 150 << 20  # rough footprint of one spawned scan worker (interpreter + pandas)
+SCAN_BLOCK_BYTES = 32 << 20  # TSV text per block parsed by a scan worker
+PARSE_EXPANSION = 4  # a parsed block takes roughly this many times its text size
+
+
+def _parse_size(text: str) -> int:
+    """Parse a memory size such as "512M", "2G" or "1500000000" into bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", text, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid memory size {text!r} (e.g. 512M, 2G)")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+def _chunk_rows(default: int, row_bytes: Optional[float] = None) -> int:
+    """
+    Rows per IMDB chunk: the default, or fewer when a --max-memory budget is set.
+
+    Every chunk that can be in flight at once (two per scan worker plus the one
+    being parsed) gets an equal part of CHUNK_MEMORY_SHARE of the budget.
+    row_bytes is the measured size of a row of the previous chunk.
+    """
+    if MAX_MEMORY is None:
+        return default
+    in_flight = 2 * SCAN_WORKERS + 1
+    rows = int(MAX_MEMORY * CHUNK_MEMORY_SHARE / in_flight / (row_bytes or ROW_BYTES_GUESS))
+    return max(MIN_CHUNK_ROWS, min(default, rows))
 
 
 def _ensure_paths() -> None:
@@ -52,6 +170,138 @@ def _read_tsv(name: str, usecols: Optional[List[str]] = None) -> pd.DataFrame:
     return pd.read_csv(path, sep="\t", compression="infer", na_values="\\N", usecols=usecols)
 
 
+def _imdb_path(name: str) -> Path:
+    """Locate an IMDB dump (e.g. "title.basics") as .tsv.gz or plain .tsv."""
+    for suffix in (".tsv.gz", ".tsv"):
+        path = RAW_DIR / f"{name}{suffix}"
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"Missing raw file: {RAW_DIR / (name + '.tsv.gz')} (or .tsv)")
+
+
+def _file_digest(path: Path) -> str:
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cached_imdb(name: str) -> Optional[Path]:
+    """
+    Return the Parquet cache for an IMDB dump, building it first if needed.
+
+    The cache is keyed by the source file's size, mtime and SHA-256: a size or
+    mtime change triggers a hash check, and only a different hash rebuilds.
+    Returns None when caching is disabled or pyarrow is not installed.
+    """
+    if CACHE_DIR is None or pq is None:
+        return None
+    source = _imdb_path(name)
+    stat = source.stat()
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_path = CACHE_DIR / f"{name}.parquet"
+    meta_path = CACHE_DIR / f"{name}.meta.json"
+
+    meta = json.loads(meta_path.read_text()) if meta_path.exists() and cache_path.exists() else {}
+    if meta.get("version") == CACHE_VERSION and meta.get("source") == source.name:
+        if meta.get("size") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns:
+            return cache_path
+        digest = _file_digest(source)
+        if meta.get("sha256") == digest:
+            meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            meta_path.write_text(json.dumps(meta))
+            return cache_path
+    else:
+        digest = _file_digest(source)
+
+    print(f"Building Parquet cache for {source.name} (one-time)...")
+    dtypes = IMDB_CACHE_COLUMNS[name]
+    tmp_path = cache_path.with_suffix(".parquet.tmp")
+    writer = None
+    rows = 0
+    try:
+        for chunk in pd.read_csv(
+            source,
+            sep="\t",
+            na_values="\\N",
+            usecols=list(dtypes),
+            compression="infer",
+            chunksize=500_000,
+        ):
+            for col, dtype in dtypes.items():
+                if dtype == "string":
+                    chunk[col] = chunk[col].astype("string")
+                else:
+                    chunk[col] = pd.to_numeric(chunk[col], errors="coerce").astype(dtype)
+            table = pa.Table.from_pandas(chunk[list(dtypes)], preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression="zstd")
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    tmp_path.replace(cache_path)
+    meta = {
+        "version": CACHE_VERSION,
+        "source": source.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest,
+        "rows": rows,
+    }
+    meta_path.write_text(json.dumps(meta))
+    print(f"Cached {rows} rows of {source.name} in {cache_path}")
+    return cache_path
+
+
+def _iter_imdb(name: str, usecols: List[str], chunksize: int, filter=None) -> Iterator[pd.DataFrame]:
+    """
+    Yield an IMDB dump as DataFrame chunks.
+
+    From the Parquet cache this is a single frame holding only usecols and
+    (when given) the rows matching the pyarrow `filter` expression, built by
+    a callable so it is only evaluated when pyarrow is available; otherwise
+    the TSV is streamed in chunks and callers must apply the same filter.
+
+    In low-memory mode columns get the LOW_MEMORY_DTYPES, the Parquet rows
+    arrive in batches instead of one frame, and with a --max-memory budget
+    each TSV chunk is sized from the measured size of the previous one.
+    """
+    dtypes = {col: dtype for col, dtype in LOW_MEMORY_DTYPES.get(name, {}).items() if col in usecols}
+    dtypes = dtypes if LOW_MEMORY else {}
+    cache_path = _cached_imdb(name)
+    if cache_path is not None:
+        dataset = ds.dataset(cache_path, format="parquet")
+        expression = filter() if filter is not None else None
+        if not LOW_MEMORY:
+            yield dataset.to_table(columns=usecols, filter=expression).to_pandas()
+            return
+        for batch in dataset.to_batches(columns=usecols, filter=expression, batch_size=_chunk_rows(chunksize)):
+            yield batch.to_pandas().astype(dtypes)
+        return
+    with pd.read_csv(
+        _imdb_path(name),
+        sep="\t",
+        na_values="\\N",
+        usecols=usecols,
+        dtype=dtypes or None,
+        compression="infer",
+        iterator=True,
+    ) as reader:
+        rows = _chunk_rows(chunksize)
+        while True:
+            try:
+                chunk = reader.get_chunk(rows)
+            except StopIteration:
+                return
+            yield chunk
+            if MAX_MEMORY is not None and len(chunk):
+                rows = _chunk_rows(chunksize, chunk.memory_usage(deep=True).sum() / len(chunk))
+
+
 def load_movies() -> pd.DataFrame:
     """Load and clean Kaggle movies dataset with budget, revenue, and production info."""
     df = _read_csv("movies.csv")
@@ -59,20 +309,16 @@ def load_movies() -> pd.DataFrame:
     if "release_year" not in df.columns and "release_date" in df.columns:
         df["release_year"] = pd.to_datetime(df["release_date"], errors="coerce").dt.year
     df["release_year"] = df["release_year"].astype("Int64")
-    df["country_code"] = df.get("production_countries", pd.Series(dtype=object)).apply(
-        lambda raw: _first_from_list(raw, "iso_3166_1")
+    countries = _first_from_lists(
+        df.get("production_countries", pd.Series(dtype=object, index=df.index)), ["iso_3166_1", "name"]
     )
-    df["country"] = df.get("production_countries", pd.Series(dtype=object)).apply(
-        lambda raw: _first_from_list(raw, "name")
+    df["country_code"] = countries["iso_3166_1"]
+    df["country"] = countries["name"].fillna(df["country_code"])
+    languages = _first_from_lists(
+        df.get("spoken_languages", pd.Series(dtype=object, index=df.index)), ["iso_639_1", "name"]
     )
-    df["country"] = df["country"].fillna(df["country_code"])
-    df["language_code"] = df.get("spoken_languages", pd.Series(dtype=object)).apply(
-        lambda raw: _first_from_list(raw, "iso_639_1")
-    )
-    df["language"] = df.get("spoken_languages", pd.Series(dtype=object)).apply(
-        lambda raw: _first_from_list(raw, "name")
-    )
-    df["language"] = df["language"].fillna(df["language_code"]).fillna(df.get("original_language"))
+    df["language_code"] = languages["iso_639_1"]
+    df["language"] = languages["name"].fillna(df["language_code"]).fillna(df.get("original_language"))
     keep = [
         "id",
         "imdb_id",
@@ -126,144 +372,434 @@ def _normalize_title(s: pd.Series) -> pd.Series:
     return s.fillna("").str.lower().str.strip()
 
 
-def load_imdb(candidate_titles: set[str]) -> pd.DataFrame:
-    """Load IMDB data (basics + ratings) in chunks, filtering to candidate titles."""
-    basics_path = RAW_DIR / "title.basics.tsv.gz"
-    if not basics_path.exists():
-        basics_path = RAW_DIR / "title.basics.tsv"
-    if not basics_path.exists():
-        raise FileNotFoundError(f"Missing raw file: {basics_path}")
-
-    basics_chunks = []
-    for chunk in pd.read_csv(
-        basics_path,
+def _empty_lists(index: pd.Index) -> pd.Series:
+    """A Series holding a separate empty list per index entry."""
+    return pd.Series([[] for _ in range(len(index))], index=index, dtype=object)
+
+
+def _split_genres(genres: pd.Series) -> pd.Series:
+    """Split comma-separated genres into lists, dropping empty items; missing or empty values become []."""
+    cleaned = genres.astype(object).str.replace(r",{2,}", ",", regex=True).str.strip(",")
+    split = cleaned.str.split(",")
+    return split.where(cleaned.fillna("").ne(""), _empty_lists(genres.index))
+
+
+def _hash_titles(titles: pd.Series) -> np.ndarray:
+    """64-bit hashes of normalized titles, one per row."""
+    return pd.util.hash_pandas_object(_normalize_title(titles.astype(object)), index=False).to_numpy()
+
+
+def _numeric_ids(ids: pd.Series) -> np.ndarray:
+    """IMDB ids ("tt0111161", "nm0000151") as int64 numbers; missing or malformed ids become -1."""
+    numbers = pd.to_numeric(ids.astype(object).str[2:], errors="coerce")
+    return numbers.fillna(-1).astype("int64").to_numpy()
+
+
+def _in_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """Boolean mask of values found in the sorted array sorted_values (binary search, no hashing)."""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_values, values).clip(max=len(sorted_values) - 1)
+    return sorted_values[positions] == values
+
+
+def _filter_basics_chunk(chunk: pd.DataFrame, candidate_hashes: np.ndarray) -> pd.DataFrame:
+    """Keep movie/series rows from 1990 on whose title hash matches a candidate (sorted _hash_titles values)."""
+    chunk = chunk[chunk["titleType"].isin(TITLE_TYPES)]
+    chunk["release_year"] = pd.to_numeric(chunk["startYear"], errors="coerce").astype("Int64")
+    chunk = chunk[(chunk["release_year"].isna()) | (chunk["release_year"] >= 1990)]
+    chunk["title"] = chunk["primaryTitle"].fillna(chunk["originalTitle"])
+    mask = _in_sorted(_hash_titles(chunk["primaryTitle"]), candidate_hashes) | _in_sorted(
+        _hash_titles(chunk["originalTitle"]), candidate_hashes
+    )
+    chunk = chunk[mask]
+    chunk["genres"] = _split_genres(chunk["genres"])
+    chunk.rename(columns={"runtimeMinutes": "duration_minutes"}, inplace=True)
+    return chunk[["tconst", "title", "release_year", "duration_minutes", "genres"]]
+
+
+def _filter_ids_chunk(chunk: pd.DataFrame, key: tuple[str, np.ndarray]) -> pd.DataFrame:
+    """Keep rows whose IMDB id column, as a number, is in the given sorted array."""
+    column, ids = key
+    return chunk[_in_sorted(_numeric_ids(chunk[column]), ids)]
+
+
+def _filter_principals_chunk(chunk: pd.DataFrame, _: object = None) -> pd.DataFrame:
+    """
+    Keep the top-3 billed actors/actresses, with tconst/nconst as int32 ids.
+
+    A missing nconst becomes -1 rather than dropping the row, so the title
+    still ends up with an (empty) actor list.
+    """
+    chunk = chunk[chunk["category"].isin(["actor", "actress"]) & (chunk["ordering"] <= 3)]
+    chunk = chunk.dropna(subset=["tconst"])
+    present = chunk["nconst"].notna().to_numpy()
+    nconst_id = np.full(len(chunk), -1, dtype="int32")
+    nconst_id[present] = chunk["nconst"][present].str[2:].astype("int32").to_numpy()
+    return pd.DataFrame({"tconst_id": chunk["tconst"].str[2:].astype("int32").to_numpy(), "nconst_id": nconst_id})
+
+
+def _read_block(source) -> bytes:
+    """
+    The bytes of one scan block: either the bytes themselves, or a (path, start, end)
+    byte range of a plain TSV widened to whole lines. A line belongs to the block
+    its first byte falls in; start is never 0 (the header line is skipped).
+    """
+    if isinstance(source, bytes):
+        return source
+    path, start, end = source
+    with open(path, "rb") as f:
+        f.seek(start - 1)
+        f.readline()  # finish the line that started before this block
+        pos = f.tell()
+        if pos >= end:
+            return b""
+        data = f.read(end - pos)
+        if data and not data.endswith(b"\n"):
+            data += f.readline()
+    return data
+
+
+def _scan_block(task: tuple) -> pd.DataFrame:
+    """Pool worker: parse one block of an IMDB TSV and return the rows chunk_filter keeps."""
+    source, header, usecols, dtypes, chunk_filter, context = task
+    data = _read_block(source)
+    chunk = pd.read_csv(
+        io.BytesIO(data),
         sep="\t",
+        header=None,
+        names=header,
+        usecols=usecols,
         na_values="\\N",
-        usecols=["tconst", "titleType", "primaryTitle", "originalTitle", "startYear", "runtimeMinutes", "genres"],
-        compression="infer",
-        chunksize=500_000,
-    ):
-        chunk = chunk[chunk["titleType"].isin(["movie", "tvSeries", "tvMiniSeries"])]
-        chunk["release_year"] = pd.to_numeric(chunk["startYear"], errors="coerce").astype("Int64")
-        chunk = chunk[(chunk["release_year"].isna()) | (chunk["release_year"] >= 1990)]
-        chunk["title"] = chunk["primaryTitle"].fillna(chunk["originalTitle"])
-        norm_primary = _normalize_title(chunk["primaryTitle"])
-        norm_original = _normalize_title(chunk["originalTitle"])
-        mask = norm_primary.isin(candidate_titles) | norm_original.isin(candidate_titles)
-        chunk = chunk[mask]
-        chunk["genres"] = chunk["genres"].fillna("").apply(lambda g: [x for x in g.split(",") if x])
-        chunk.rename(columns={"runtimeMinutes": "duration_minutes"}, inplace=True)
-        basics_chunks.append(chunk[["tconst", "title", "release_year", "duration_minutes", "genres"]])
-
-    basics = pd.concat(basics_chunks, ignore_index=True) if basics_chunks else pd.DataFrame(
+        dtype=dtypes or None,
+    )
+    return chunk_filter(chunk, context)
+
+
+def _block_bytes() -> int:
+    """Size of the TSV blocks handed to scan workers, fitted to --max-memory if set."""
+    if MAX_MEMORY is None:
+        return SCAN_BLOCK_BYTES
+    in_flight = 2 * SCAN_WORKERS + 1
+    fitted = int(MAX_MEMORY * CHUNK_MEMORY_SHARE / in_flight / PARSE_EXPANSION)
+    return max(1 << 20, min(SCAN_BLOCK_BYTES, fitted))
+
+
+def _tsv_blocks(path: Path) -> tuple[List[str], Iterator[object]]:
+    """
+    Header and block sources of an IMDB TSV.
+
+    Plain .tsv files are split into byte ranges that workers read themselves;
+    gzip streams cannot be split, so they are decompressed here and cut into
+    whole-line byte blocks (raw bytes are cheap to ship, parsing happens in
+    the workers).
+    """
+    size = _block_bytes()
+    if path.suffix != ".gz":
+        with path.open("rb") as f:
+            header_line = f.readline()
+        total = path.stat().st_size
+        ranges = ((str(path), start, min(start + size, total)) for start in range(len(header_line), total, size))
+        return header_line.decode().rstrip("\r\n").split("\t"), ranges
+
+    f = gzip.open(path, "rb")
+    header_line = f.readline()
+
+    def blocks() -> Iterator[bytes]:
+        with f:
+            rest = b""
+            while chunk := f.read(size):
+                chunk = rest + chunk
+                cut = chunk.rfind(b"\n") + 1
+                if cut:
+                    rest = chunk[cut:]
+                    yield chunk[:cut]
+                else:
+                    rest = chunk
+            if rest:
+                yield rest
+
+    return header_line.decode().rstrip("\r\n").split("\t"), blocks()
+
+
+# One spawn pool shared by every scan (stages scan concurrently from threads).
+_SCAN_POOL: Optional[ProcessPoolExecutor] = None
+_SCAN_POOL_LOCK = threading.Lock()
+
+
+def _scan_pool() -> ProcessPoolExecutor:
+    """The shared scan pool, created on first use."""
+    global _SCAN_POOL
+    with _SCAN_POOL_LOCK:
+        if _SCAN_POOL is None:
+            _SCAN_POOL = ProcessPoolExecutor(
+                max_workers=SCAN_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),  # scans run from threads; don't fork them
+            )
+        return _SCAN_POOL
+
+
+def _close_scan_pool() -> None:
+    """Shut the shared scan pool down, if it was started."""
+    global _SCAN_POOL
+    with _SCAN_POOL_LOCK:
+        if _SCAN_POOL is not None:
+            _SCAN_POOL.shutdown()
+            _SCAN_POOL = None
+
+
+def _scan(name: str, usecols: List[str], chunksize: int, chunk_filter, context, filter=None) -> List[pd.DataFrame]:
+    """
+    Read an IMDB dump and apply chunk_filter(chunk, context) to every chunk.
+
+    Reading from the Parquet cache is already multi-threaded inside pyarrow.
+    When parsing the TSV instead, the file is cut into line-aligned blocks
+    (byte ranges for plain .tsv, decompressed bytes for .gz) and SCAN_WORKERS
+    processes of one shared pool both parse and filter them, so only the kept
+    rows travel back. A bounded number of blocks is in flight per scan and
+    results keep the file order.
+    """
+    if SCAN_WORKERS <= 1 or _cached_imdb(name) is not None:
+        return [chunk_filter(chunk, context) for chunk in _iter_imdb(name, usecols, chunksize, filter)]
+
+    header, sources = _tsv_blocks(_imdb_path(name))
+    dtypes = {col: dtype for col, dtype in LOW_MEMORY_DTYPES.get(name, {}).items() if col in usecols}
+    dtypes = dtypes if LOW_MEMORY else {}
+    pool = _scan_pool()
+    results: List[pd.DataFrame] = []
+    pending: deque = deque()
+    for source in sources:
+        pending.append(pool.submit(_scan_block, (source, header, usecols, dtypes, chunk_filter, context)))
+        if len(pending) >= 2 * SCAN_WORKERS:
+            results.append(pending.popleft().result())
+    results.extend(future.result() for future in pending)
+    return results
+
+
+def _candidate_hashes(*titles: pd.Series) -> np.ndarray:
+    """Sorted, unique hashes of the normalized candidate titles, for load_basics."""
+    return np.unique(np.concatenate([_hash_titles(t) for t in titles])) if titles else np.zeros(0, dtype="uint64")
+
+
+def load_basics(candidate_hashes: np.ndarray) -> pd.DataFrame:
+    """Load IMDB title basics in chunks, filtering to candidate titles (see _candidate_hashes)."""
+    basics_chunks = _scan(
+        "title.basics",
+        ["tconst", "titleType", "primaryTitle", "originalTitle", "startYear", "runtimeMinutes", "genres"],
+        500_000,
+        _filter_basics_chunk,
+        candidate_hashes,
+        filter=lambda: ds.field("titleType").isin(TITLE_TYPES)
+        & (ds.field("startYear").is_null() | (ds.field("startYear") >= 1990)),
+    )
+    return pd.concat(basics_chunks, ignore_index=True) if basics_chunks else pd.DataFrame(
         columns=["tconst", "title", "release_year", "duration_minutes", "genres"]
     )
 
-    ratings_path = RAW_DIR / "title.ratings.tsv.gz"
-    if not ratings_path.exists():
-        ratings_path = RAW_DIR / "title.ratings.tsv"
-    if not ratings_path.exists():
-        raise FileNotFoundError(f"Missing raw file: {ratings_path}")
 
-    rating_chunks = []
-    for chunk in pd.read_csv(
-        ratings_path,
-        sep="\t",
-        na_values="\\N",
-        usecols=["tconst", "averageRating", "numVotes"],
-        compression="infer",
-        chunksize=500_000,
-    ):
-        chunk = chunk[chunk["tconst"].isin(basics["tconst"])]
-        rating_chunks.append(chunk)
+def load_ratings(tconsts: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Load IMDB ratings, optionally only for the given tconsts (the dump is small either way)."""
+    if tconsts is None:
+        rating_chunks = list(_iter_imdb("title.ratings", ["tconst", "averageRating", "numVotes"], 500_000))
+    else:
+        tconsts = pd.Series(list(tconsts), dtype=object)
+        rating_chunks = _scan(
+            "title.ratings",
+            ["tconst", "averageRating", "numVotes"],
+            500_000,
+            _filter_ids_chunk,
+            ("tconst", np.unique(_numeric_ids(tconsts))),
+            filter=lambda: ds.field("tconst").isin(tconsts.dropna().unique().tolist()),
+        )
     ratings = pd.concat(rating_chunks, ignore_index=True) if rating_chunks else pd.DataFrame(
         columns=["tconst", "averageRating", "numVotes"]
     )
     ratings.rename(columns={"averageRating": "rating"}, inplace=True)
+    return ratings
+
+
+def load_imdb(
+    candidate_titles: set[str], ratings: Optional[pd.DataFrame] = None, basics: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """Load IMDB data (basics + ratings) in chunks, filtering to candidate titles."""
+    if basics is None:
+        basics = load_basics(_candidate_hashes(pd.Series(list(candidate_titles), dtype=object)))
+    if ratings is None:
+        ratings = load_ratings(basics["tconst"])
+    else:
+        ratings = ratings[ratings["tconst"].isin(basics["tconst"])]
 
     imdb = basics.merge(ratings, on="tconst", how="left")
     return imdb[["tconst", "title", "release_year", "duration_minutes", "genres", "rating", "numVotes"]]
 
 
-def load_cast_ratings(valid_tconsts: Iterable[str]) -> pd.DataFrame:
-    """Load top 3 actors/actresses for each title from IMDB principals data."""
-    valid = set(valid_tconsts)
-    collected = []
-    principals_path = RAW_DIR / "title.principals.tsv"
-    if not principals_path.exists():
-        principals_path = RAW_DIR / "title.principals.tsv.gz"
-    if not principals_path.exists():
-        raise FileNotFoundError(f"Missing raw file: {principals_path}")
+def scan_principals() -> pd.DataFrame:
+    """
+    Pre-filter IMDB principals to top-3 billed actors for all titles.
 
-    for chunk in pd.read_csv(
-        principals_path,
-        sep="\t",
-        na_values="\\N",
-        usecols=["tconst", "nconst", "category", "ordering"],
-        chunksize=200_000,
-        compression="infer",
-    ):
-        chunk = chunk[chunk["tconst"].isin(valid)]
-        chunk = chunk[chunk["category"].isin(["actor", "actress"]) & (chunk["ordering"] <= 3)]
-        collected.append(chunk[["tconst", "nconst"]])
-    principals = pd.concat(collected, ignore_index=True) if collected else pd.DataFrame(columns=["tconst", "nconst"])
+    Needs no other dump, so it can run while the title basics are scanned;
+    ids are kept as int32 to keep the unfiltered result small.
+    """
+    collected = _scan(
+        "title.principals",
+        ["tconst", "nconst", "category", "ordering"],
+        200_000,
+        _filter_principals_chunk,
+        None,
+        filter=lambda: ds.field("category").isin(["actor", "actress"]) & (ds.field("ordering") <= 3),
+    )
+    return pd.concat(collected, ignore_index=True) if collected else pd.DataFrame(
+        {"tconst_id": pd.Series(dtype="int32"), "nconst_id": pd.Series(dtype="int32")}
+    )
 
-    if principals.empty:
-        return pd.DataFrame(columns=["tconst", "actor_name"])
 
-    needed_nconst = set(principals["nconst"].dropna().unique().tolist())
-    names_path = RAW_DIR / "name.basics.tsv.gz"
-    if not names_path.exists():
-        names_path = RAW_DIR / "name.basics.tsv"
-    if not names_path.exists():
-        raise FileNotFoundError(f"Missing raw file: {names_path}")
+def load_cast_ratings(valid_tconsts: Iterable[str], principals: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Load top 3 actors/actresses for each title from IMDB principals data.
 
-    name_chunks = []
-    for chunk in pd.read_csv(
-        names_path,
-        sep="\t",
-        na_values="\\N",
-        usecols=["nconst", "primaryName"],
-        chunksize=200_000,
-        compression="infer",
-    ):
-        chunk = chunk[chunk["nconst"].isin(needed_nconst)]
-        name_chunks.append(chunk)
+    principals may be the result of scan_principals(), run ahead of time.
+    Title and name ids are matched as sorted int arrays, not string sets.
+    """
+    valid_ids = np.unique(_numeric_ids(pd.Series(list(valid_tconsts), dtype=object)))
+    if principals is None:
+        valid_list = [f"tt{i:07d}" for i in valid_ids if i >= 0]
+        collected = _scan(
+            "title.principals",
+            ["tconst", "nconst", "category", "ordering"],
+            200_000,
+            _filter_principals_chunk,
+            None,
+            filter=lambda: ds.field("tconst").isin(valid_list)
+            & ds.field("category").isin(["actor", "actress"])
+            & (ds.field("ordering") <= 3),
+        )
+        principals = pd.concat(collected, ignore_index=True) if collected else None
+    if principals is not None:
+        principals = principals[_in_sorted(principals["tconst_id"].to_numpy(), valid_ids)]
+
+    if principals is None or principals.empty:
+        return pd.DataFrame(columns=["tconst", "actor_name"])
+
+    needed_ids = np.unique(principals["nconst_id"].to_numpy())
+    needed_ids = needed_ids[needed_ids >= 0]  # -1: no nconst, never matches a name
+    name_chunks = _scan(
+        "name.basics",
+        ["nconst", "primaryName"],
+        200_000,
+        _filter_ids_chunk,
+        ("nconst", needed_ids),
+        filter=lambda: ds.field("nconst").isin([f"nm{i:07d}" for i in needed_ids]),
+    )
     names = pd.concat(name_chunks, ignore_index=True) if name_chunks else pd.DataFrame(columns=["nconst", "primaryName"])
-    names.rename(columns={"primaryName": "actor_name"}, inplace=True)
-    cast = principals.merge(names, on="nconst", how="left")
-    grouped = cast.groupby("tconst")["actor_name"].apply(lambda s: [n for n in s.dropna().tolist()])
-    return grouped.reset_index()
+    names = pd.DataFrame({"nconst_id": _numeric_ids(names["nconst"]), "actor_name": names["primaryName"]})
+    cast = principals.merge(names, on="nconst_id", how="left")
+    titles = cast.groupby("tconst_id").size().index
+    grouped = cast.dropna(subset=["actor_name"]).groupby("tconst_id")["actor_name"].agg(list).reindex(titles)
+    grouped = grouped.where(grouped.notna(), _empty_lists(titles))  # titles whose actors all lack a name
+    return pd.DataFrame({"tconst": "tt" + titles.astype(str).str.zfill(7), "actor_name": grouped.to_numpy()})
 
 
-def merge_data() -> pd.DataFrame:
-    """Merge Kaggle, Netflix, and IMDB data on imdb_id with title+year fallback."""
-    movies = load_movies()
-    engagement = load_engagement()
-    candidate_titles = set(_normalize_title(movies["title"]).dropna().tolist()) | set(
-        _normalize_title(engagement["title"]).dropna().tolist()
+# IMDB match tiers in priority order: (name, movie key columns, IMDB key columns).
+JOIN_TIERS = [
+    ("imdb_id", ["imdb_id"], ["tconst"]),
+    ("title_year", ["title_key", "release_year"], ["title_key", "release_year"]),
+    ("title", ["title_key"], ["title_key"]),
+]
+
+
+def _title_key(titles: pd.Series) -> pd.Series:
+    """Normalized title used as a join key; empty titles become NaN so they never match."""
+    return _normalize_title(titles).replace("", np.nan)
+
+
+def match_imdb(movies: pd.DataFrame, imdb: pd.DataFrame, stats: dict) -> pd.Series:
+    """
+    Return the matched tconst (or NA) for every movie row.
+
+    Tiers in JOIN_TIERS are tried in order on the movies still unmatched. Per
+    key the most-voted IMDB title wins (then the lowest tconst), and each
+    tconst is given to at most one movie, the first one in file order; movies
+    that lose a tconst to an earlier one stay open for the next tier.
+    """
+    imdb = imdb.dropna(subset=["tconst"]).sort_values(
+        ["numVotes", "tconst"], ascending=[False, True], na_position="last", kind="mergesort"
     )
-    imdb = load_imdb(candidate_titles)
-    cast = load_cast_ratings(imdb["tconst"])
-    imdb = imdb.merge(cast, on="tconst", how="left")
+    match = pd.Series(pd.NA, index=movies.index, dtype=object)
+    claimed: set = set()
+    for tier, left_on, right_on in JOIN_TIERS:
+        todo = movies.loc[match.isna(), left_on].dropna()
+        candidates = imdb[~imdb["tconst"].isin(claimed)].dropna(subset=right_on).drop_duplicates(right_on)
+        found = (
+            todo.rename_axis("row")
+            .reset_index()
+            .merge(
+                candidates[list(dict.fromkeys(right_on + ["tconst"]))].rename(columns={"tconst": "match"}),
+                left_on=left_on,
+                right_on=[c if c != "tconst" else "match" for c in right_on],
+                how="inner",
+                validate="many_to_one",
+            )
+            .sort_values("row", kind="mergesort")
+        )
+        unique = found.drop_duplicates("match")
+        match.loc[unique["row"].to_numpy()] = unique["match"].to_numpy()
+        claimed.update(unique["match"])
+        stats[f"matched_by_{tier}"] = len(unique)
+        stats[f"conflicts_{tier}"] = len(found) - len(unique)
+    stats["unmatched_movies"] = int(match.isna().sum())
+    return match
+
 
-    # Join Kaggle movies to IMDB on imdb_id when present.
-    merged_by_id = movies.merge(imdb, left_on="imdb_id", right_on="tconst", how="left", suffixes=("", "_imdb"))
-    fallback = movies.merge(imdb, on=["title", "release_year"], how="left", suffixes=("", "_imdb"))
-    merged = merged_by_id.combine_first(fallback)
+def _write_join_stats(stats: dict) -> None:
+    """Print the join report and save it next to the raw data."""
+    JOIN_STATS.parent.mkdir(parents=True, exist_ok=True)
+    JOIN_STATS.write_text(json.dumps(stats, indent=2))
+    print("Join statistics:")
+    for key, value in stats.items():
+        print(f"  {key:28s} {value}")
 
-    # Add engagement (title/country level).
-    merged = merged.merge(engagement, on="title", how="left", suffixes=("", "_engagement"))
+
+def merge_sources(
+    movies: pd.DataFrame, engagement: pd.DataFrame, imdb: pd.DataFrame, cast: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Merge Kaggle, Netflix, and IMDB data into one row per Kaggle movie.
+
+    Movies are matched to IMDB by match_imdb() and to engagement on the
+    normalized title, keeping the most-viewed engagement row per title. Every
+    join is many-to-one on a unique key, so rows never fan out.
+    """
+    stats = {"movies_in": len(movies), "imdb_titles": len(imdb), "engagement_rows": len(engagement)}
+    duplicate_ids = movies["id"].notna() & movies["id"].duplicated()
+    movies = movies[~duplicate_ids].reset_index(drop=True)
+    stats["duplicate_movie_ids_dropped"] = int(duplicate_ids.sum())
+    movies["title_key"] = _title_key(movies["title"])
+
+    imdb = imdb.drop_duplicates("tconst").merge(cast, on="tconst", how="left", validate="one_to_one")
+    imdb["title_key"] = _title_key(imdb["title"])
+    movies["tconst"] = match_imdb(movies, imdb, stats)
+    merged = movies.merge(
+        imdb.drop(columns="title_key"), on="tconst", how="left", suffixes=("", "_imdb"), validate="many_to_one"
+    )
+
+    engagement = engagement.assign(title_key=_title_key(engagement["title"])).dropna(subset=["title_key"])
+    engagement = engagement.sort_values("hours_viewed", ascending=False, na_position="last", kind="mergesort")
+    deduped = engagement.drop_duplicates("title_key").drop(columns="title")
+    stats["engagement_duplicates_dropped"] = len(engagement) - len(deduped)
+    merged = merged.merge(deduped, on="title_key", how="left", suffixes=("", "_engagement"), validate="many_to_one")
+    stats["matched_engagement"] = int(merged["hours_viewed"].notna().sum())
 
     # Clean up.
     merged["duration_minutes"] = merged["duration_minutes"].fillna(merged["duration_minutes_engagement"])
     merged["viewership"] = merged["viewership"].fillna(merged["hours_viewed"])
-    merged["genres"] = merged["genres"].apply(lambda g: g if isinstance(g, list) else [])
+    merged["genres"] = merged["genres"].where(merged["genres"].notna(), _empty_lists(merged.index))
     merged["country"] = merged["country"].fillna(merged["country_engagement"]).fillna("Unknown")
     merged["language"] = merged["language"].fillna("Unknown")
     merged["actor_rating"] = pd.NA  # Placeholder for future enrichment.
-    merged["region"] = merged.apply(lambda row: _to_region(row.get("country"), row.get("country_code")), axis=1)
+    merged["region"] = _to_region(merged["country"], merged["country_code"])
     merged["id"] = merged["id"].fillna(merged["tconst"])
+    stats["rows_out"] = len(merged)
+    _write_join_stats(stats)
     return merged[
         [
             "id",
@@ -285,21 +821,32 @@ def merge_data() -> pd.DataFrame:
     ]
 
 
-def _first_from_list(raw: object, key: str) -> Optional[str]:
-    """Extract first value of a key from a JSON-encoded list of dicts."""
-    if raw is None or (isinstance(raw, float) and np.isnan(raw)):
-        return None
-    items = raw
-    try:
-        if isinstance(raw, str):
-            items = literal_eval(raw)
-    except Exception:
-        return None
-    if isinstance(items, list):
-        for item in items:
-            if isinstance(item, dict) and item.get(key):
-                return item.get(key)
-    return None
+def _first_from_lists(raw: pd.Series, keys: List[str]) -> pd.DataFrame:
+    """
+    Extract the first truthy value of each key from JSON-encoded lists of dicts.
+
+    Every distinct string is parsed once and its dicts exploded into a long
+    (text, key, value) frame; the first row per (text, key) is then mapped
+    back onto all rows. Keys are independent, as if looked up one at a time.
+    Unparseable or missing values give NaN.
+    """
+    text = raw.dropna().astype(str)
+    records = []
+    for value in text.unique():
+        try:
+            items = literal_eval(value)
+        except Exception:
+            continue
+        if not isinstance(items, list):
+            continue
+        records.extend(
+            (value, key, item[key]) for item in items if isinstance(item, dict) for key in keys if item.get(key)
+        )
+    long = pd.DataFrame.from_records(records, columns=["text", "key", "value"])
+    first = long.drop_duplicates(["text", "key"]).pivot(index="text", columns="key", values="value")
+    first = first.reindex(columns=keys).reindex(text.values)
+    first.index = text.index
+    return first.reindex(raw.index)
 
 
 COUNTRY_REGION_MAP = {
@@ -370,35 +917,793 @@ COUNTRY_REGION_MAP = {
 }
 
 
-def _to_region(country: Optional[str], country_code: Optional[str] = None) -> str:
-    """Map country name or code to a continent/region."""
-    def _lookup(val: Optional[str]) -> Optional[str]:
-        if not isinstance(val, str):
-            return None
-        key = val.upper()
-        return COUNTRY_REGION_MAP.get(key)
+def _to_region(country: pd.Series, country_code: pd.Series) -> pd.Series:
+    """Map country codes, falling back to country names, to a continent/region."""
+
+    def _lookup(values: pd.Series) -> np.ndarray:
+        return values.astype(object).str.upper().map(COUNTRY_REGION_MAP).to_numpy(dtype=object)  # non-strings: NaN
+
+    codes, names = _lookup(country_code), _lookup(country)
+    region = np.where(pd.notna(codes), codes, np.where(pd.notna(names), names, "Other"))
+    return pd.Series(region, index=country.index, dtype=object)
+
+
+# Stage DAG: every stage's output is pickled under STAGE_DIR together with a
+# fingerprint of its code, raw input files and upstream fingerprints, so a
+# rerun only recomputes stages whose fingerprint changed.
+STAGES: dict = {}
+
+
+def stage(name: str, deps: Iterable[str] = (), inputs: Iterable[str] = (), code: Iterable[object] = ()):
+    """
+    Register a pipeline stage.
 
-    region = _lookup(country_code) or _lookup(country)
-    return region or "Other"
+    The decorated function receives its deps' outputs as keyword arguments.
+    inputs are raw files (e.g. "movies.csv" or "title.basics"); code lists the
+    helpers (or constants) whose source also versions the stage.
+    """
 
+    def register(func):
+        STAGES[name] = {"func": func, "deps": tuple(deps), "inputs": tuple(inputs), "code": (func, *code)}
+        return func
 
-def _export_json(df: pd.DataFrame, path: Path, sample: bool = False) -> None:
-    """Export DataFrame to JSON file, converting NaN to null."""
-    cleaned = df.replace([np.inf, -np.inf], np.nan)
-    # Use pandas JSON export to coerce NaN -> null safely.
-    records = json.loads(cleaned.to_json(orient="records"))
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(records, f, indent=2, allow_nan=False)
-    print(f"Wrote {len(records)} rows to {path}")
-    if sample:
-        print("Sample contents:", records[:2])
+    return register
+
+
+@stage("movies", inputs=["movies.csv"], code=[load_movies, _first_from_lists])
+def stage_movies() -> pd.DataFrame:
+    """Kaggle movies, cleaned."""
+    return load_movies()
+
+
+@stage("engagement", inputs=["engagement.csv"], code=[load_engagement])
+def stage_engagement() -> pd.DataFrame:
+    """Netflix engagement report, cleaned."""
+    return load_engagement()
+
+
+@stage("ratings", inputs=["title.ratings"], code=[load_ratings])
+def stage_ratings() -> pd.DataFrame:
+    """All IMDB ratings."""
+    return load_ratings()
+
+
+@stage("principals", inputs=["title.principals"], code=[scan_principals, _filter_principals_chunk])
+def stage_principals() -> pd.DataFrame:
+    """Top-3 billed cast for all IMDB titles."""
+    return scan_principals()
+
+
+@stage(
+    "basics",
+    deps=["movies", "engagement"],
+    inputs=["title.basics"],
+    code=[
+        load_basics,
+        _filter_basics_chunk,
+        _candidate_hashes,
+        _hash_titles,
+        _in_sorted,
+        _normalize_title,
+        _split_genres,
+        TITLE_TYPES,
+    ],
+)
+def stage_basics(movies: pd.DataFrame, engagement: pd.DataFrame) -> pd.DataFrame:
+    """IMDB titles matching a Kaggle or Netflix title."""
+    return load_basics(_candidate_hashes(movies["title"], engagement["title"]))
+
+
+@stage("imdb", deps=["basics", "ratings"], code=[load_imdb])
+def stage_imdb(basics: pd.DataFrame, ratings: pd.DataFrame) -> pd.DataFrame:
+    """IMDB titles joined with their ratings."""
+    return load_imdb(set(), ratings=ratings, basics=basics)
+
+
+@stage(
+    "cast",
+    deps=["imdb", "principals"],
+    inputs=["name.basics"],
+    code=[load_cast_ratings, _empty_lists, _filter_ids_chunk, _numeric_ids, _in_sorted],
+)
+def stage_cast(imdb: pd.DataFrame, principals: pd.DataFrame) -> pd.DataFrame:
+    """Actor names per IMDB title."""
+    return load_cast_ratings(imdb["tconst"], principals=principals)
+
+
+@stage(
+    "merged",
+    deps=["movies", "engagement", "imdb", "cast"],
+    code=[merge_sources, match_imdb, _title_key, JOIN_TIERS, _to_region, COUNTRY_REGION_MAP],
+)
+def stage_merged(
+    movies: pd.DataFrame, engagement: pd.DataFrame, imdb: pd.DataFrame, cast: pd.DataFrame
+) -> pd.DataFrame:
+    """The final merged table."""
+    return merge_sources(movies, engagement, imdb, cast)
+
+
+def _raw_input(name: str) -> Path:
+    """Path of a stage input: a CSV in RAW_DIR or an IMDB dump name."""
+    if name.endswith(".csv"):
+        return RAW_DIR / name
+    try:
+        return _imdb_path(name)
+    except FileNotFoundError:
+        return RAW_DIR / f"{name}.tsv.gz"
+
+
+def _stage_order(targets: Iterable[str]) -> List[str]:
+    """Targets and their transitive deps, dependencies first."""
+    order: List[str] = []
+
+    def visit(name: str) -> None:
+        if name not in STAGES:
+            raise KeyError(f"Unknown stage {name!r}; choose from {', '.join(STAGES)}")
+        if name in order:
+            return
+        for dep in STAGES[name]["deps"]:
+            visit(dep)
+        order.append(name)
+
+    for target in targets:
+        visit(target)
+    return order
+
+
+def _fingerprint(name: str, dep_fingerprints: dict) -> str:
+    """Hash of a stage's code, raw input size/mtime and upstream fingerprints."""
+    spec = STAGES[name]
+    digest = hashlib.sha256(f"{name}|pandas {pd.__version__}".encode())
+    for obj in spec["code"]:
+        digest.update((inspect.getsource(obj) if callable(obj) else repr(obj)).encode())
+    for input_name in spec["inputs"]:
+        path = _raw_input(input_name)
+        stat = path.stat() if path.exists() else None
+        digest.update(f"{path.name}:{stat and stat.st_size}:{stat and stat.st_mtime_ns}".encode())
+    for dep in spec["deps"]:
+        digest.update(dep_fingerprints[dep].encode())
+    return digest.hexdigest()
+
+
+def _stage_meta(name: str) -> dict:
+    """Stored metadata of a cached stage output, or {} if there is none."""
+    meta_path = STAGE_DIR / f"{name}.json"
+    if not meta_path.exists() or not (STAGE_DIR / f"{name}.pkl").exists():
+        return {}
+    return json.loads(meta_path.read_text())
+
+
+def _stage_fingerprints(order: List[str]) -> dict:
+    """Fingerprints for stages listed dependencies first."""
+    fingerprints: dict = {}
+    for name in order:
+        fingerprints[name] = _fingerprint(name, fingerprints)
+    return fingerprints
+
+
+def run_stages(targets: Iterable[str], force: Iterable[str] = ()) -> dict:
+    """
+    Compute the target stages, reusing cached outputs where fingerprints match.
+
+    Forced stages (or "all") and everything downstream of them are recomputed.
+    Each stage runs on its own thread as soon as its deps are done, so
+    independent stages (e.g. the ratings, principals and basics scans) overlap;
+    in low-memory mode they take turns instead. Up-to-date stages are only
+    unpickled if a rerunning stage needs them.
+    """
+    targets = list(targets)
+    order = _stage_order(targets)
+    fingerprints = _stage_fingerprints(order)
+    forced = set(order) if "all" in force else set(force)
+    for name in order:
+        if any(dep in forced for dep in STAGES[name]["deps"]):
+            forced.add(name)
+
+    STAGE_DIR.mkdir(parents=True, exist_ok=True)
+    futures: dict = {}
+    lock = threading.Lock()
+    slots = threading.Semaphore(1 if LOW_MEMORY else len(order))  # stages computing at the same time
+
+    def run(name: str) -> object:
+        spec = STAGES[name]
+        if name not in forced and _stage_meta(name).get("fingerprint") == fingerprints[name]:
+            print(f"[{name}] up to date")
+            return pd.read_pickle(STAGE_DIR / f"{name}.pkl")
+        dep_futures = {dep: get(dep) for dep in spec["deps"]}
+        kwargs = {dep: future.result() for dep, future in dep_futures.items()}
+        with slots:
+            print(f"[{name}] running...")
+            start = time.perf_counter()
+            output = spec["func"](**kwargs)
+            seconds = time.perf_counter() - start
+        tmp_path = STAGE_DIR / f"{name}.pkl.tmp"
+        pd.to_pickle(output, tmp_path)
+        tmp_path.replace(STAGE_DIR / f"{name}.pkl")
+        meta = {"fingerprint": fingerprints[name], "seconds": round(seconds, 2), "built_at": time.time()}
+        if isinstance(output, pd.DataFrame):
+            meta["rows"] = len(output)
+        (STAGE_DIR / f"{name}.json").write_text(json.dumps(meta))
+        print(f"[{name}] done in {seconds:.1f}s")
+        return output
+
+    # One thread per stage, so a stage blocked on its deps never starves them.
+    with ThreadPoolExecutor(max_workers=len(order)) as pool:
+
+        def get(name: str):
+            with lock:
+                if name not in futures:
+                    futures[name] = pool.submit(run, name)
+                return futures[name]
+
+        return {name: get(name).result() for name in targets}
+
+
+def list_stages() -> None:
+    """Print every stage with its deps and whether its cached output is current."""
+    fingerprints = _stage_fingerprints(_stage_order(STAGES))
+    for name, spec in STAGES.items():
+        meta = _stage_meta(name)
+        if not meta:
+            status = "not built"
+        elif meta["fingerprint"] != fingerprints[name]:
+            status = "stale"
+        else:
+            status = f"cached ({meta.get('seconds', 0):.1f}s to build)"
+        deps = ", ".join(spec["deps"]) or "-"
+        print(f"{name:12s} deps: {deps:32s} {status}")
+
+
+def merge_data() -> pd.DataFrame:
+    """Merge Kaggle, Netflix, and IMDB data, reusing cached stage outputs."""
+    return run_stages(["merged"])["merged"]
+
+
+def _column_values(col: pd.Series) -> list:
+    """A column as JSON-ready Python values; NaN and NA (and +-inf in float columns) become None."""
+    if pd.api.types.is_float_dtype(col.dtype):
+        values = col.to_numpy(dtype="float64", na_value=np.nan)
+        return np.where(np.isfinite(values), values.astype(object), None).tolist()
+    values = col.to_numpy(dtype=object, copy=True)
+    values[col.isna().to_numpy()] = None
+    return values.tolist()
+
+
+def _json_default(value: object) -> object:
+    """Convert numpy scalars and arrays left in object columns."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_ENCODER = json.JSONEncoder(separators=(",", ":"), allow_nan=False, default=_json_default)
+
+
+def _iter_json_records(df: pd.DataFrame) -> Iterator[str]:
+    """Yield every row as compact JSON, built straight from the column arrays."""
+    names = [str(c) for c in df.columns]
+    columns = [_column_values(df[c]) for c in df.columns]
+    for row in zip(*columns):
+        yield _ENCODER.encode(dict(zip(names, row)))
+
+
+def _write_text(path: Path, text: str) -> None:
+    """Write a text file atomically (temp file + rename)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def _write_json(path: Path, obj: object) -> None:
+    """Write compact JSON atomically."""
+    _write_text(path, json.dumps(obj, separators=(",", ":"), allow_nan=False))
+
+
+def _precompress(path: Path) -> dict:
+    """Write .gz and (with brotli installed) .br siblings of a file; returns {encoding: file name}."""
+    encodings = {}
+    with path.open("rb") as src, open(f"{path}.gz", "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", compresslevel=9, fileobj=raw, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    encodings["gzip"] = f"{path.name}.gz"
+    if brotli is not None:
+        compressor = brotli.Compressor(quality=11)
+        with path.open("rb") as src, open(f"{path}.br", "wb") as dst:
+            for block in iter(lambda: src.read(1 << 20), b""):
+                dst.write(compressor.process(block))
+            dst.write(compressor.finish())
+        encodings["br"] = f"{path.name}.br"
+    return encodings
+
+
+def _manifest_entry(name: str) -> dict:
+    """One entry of public/data/manifest.json ({} if there is none)."""
+    manifest_path = PUBLIC_DATA / "manifest.json"
+    return json.loads(manifest_path.read_text()).get(name, {}) if manifest_path.exists() else {}
+
+
+def _update_manifest(name: str, entry: Optional[dict]) -> None:
+    """Set one entry of public/data/manifest.json, or remove it when entry is None."""
+    manifest_path = PUBLIC_DATA / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    if entry is None:
+        if name not in manifest:
+            return
+        del manifest[name]
+    else:
+        manifest[name] = entry
+    _write_json(manifest_path, manifest)
+
+
+def _publish(path: Path, sha256: str, records: int) -> None:
+    """
+    Copy an export to a content-hashed name with precompressed siblings.
+
+    <name>.<hash><suffix>, plus .gz and (with brotli installed) .br, can be
+    served with long-lived caching; public/data/manifest.json maps the name to
+    the current copy and is the only file clients need to revalidate.
+    Superseded hashed copies are deleted. The version and deltas of the entry
+    are kept for write_delta to continue from.
+    """
+    name = path.stem
+    hashed = path.with_name(f"{name}.{sha256[:12]}{path.suffix}")
+    shutil.copyfile(path, hashed)
+    encodings = _precompress(hashed)
+    previous = _manifest_entry(name)
+    _update_manifest(
+        name,
+        {
+            **{key: previous[key] for key in ("version", "deltas") if key in previous},
+            "file": hashed.name,
+            "sha256": sha256,
+            "bytes": path.stat().st_size,
+            "records": records,
+            "encodings": encodings,
+        },
+    )
+
+    current = {hashed.name, *encodings.values()}
+    pattern = re.compile(rf"^{re.escape(name)}\.[0-9a-f]{{12}}{re.escape(path.suffix)}(\.gz|\.br)?$")
+    for old in path.parent.iterdir():
+        if pattern.match(old.name) and old.name not in current:
+            old.unlink()
+
+
+def _write_records(df: pd.DataFrame, path: Path, sample: bool = False) -> tuple[str, List[str]]:
+    """
+    Stream a DataFrame to a compact JSON array (one record per line), NaN/inf as null.
+
+    Records are encoded one at a time from the column arrays, so no full JSON
+    copy of the table is held in memory. Returns the file's SHA-256 and the
+    per-record content hashes.
+    """
+    digest = hashlib.sha256()
+    hashes: List[str] = []
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+
+        def write(chunk: bytes) -> None:
+            f.write(chunk)
+            digest.update(chunk)
+
+        write(b"[")
+        for i, line in enumerate(_iter_json_records(df)):
+            data = line.encode("utf-8")
+            write((b",\n" if i else b"\n") + data)
+            hashes.append(hashlib.sha256(data).hexdigest()[:16])
+            if sample and i < 2:
+                print("Sample record:", line)
+        write(b"\n]\n")
+    tmp_path.replace(path)
+    return digest.hexdigest(), hashes
+
+
+def _export_json(df: pd.DataFrame, path: Path, sample: bool = False) -> List[str]:
+    """Write a DataFrame as a JSON array and publish it (see _publish); returns per-record hashes."""
+    sha256, hashes = _write_records(df, path, sample)
+    _publish(path, sha256, len(hashes))
+    print(f"Wrote {len(hashes)} rows to {path}")
+    return hashes
+
+
+def _shard_stats(part: pd.DataFrame) -> dict:
+    """Min/max of the numeric columns of one shard (null when a column is empty)."""
+    stats = {}
+    for column in SHARD_STAT_COLUMNS:
+        values = pd.to_numeric(part[column], errors="coerce").replace([np.inf, -np.inf], np.nan).dropna()
+        stats[column] = [float(values.min()), float(values.max())] if len(values) else None
+    return stats
+
+
+def _export_shards(df: pd.DataFrame, directory: Path, bucket_years: int, by_region: bool = False) -> None:
+    """
+    Write the table as JSON shards by release-year bucket (and optionally region).
+
+    Shards get content-hashed names (with .gz/.br siblings) and are listed,
+    newest bucket first, under "processed_shards" in public/data/manifest.json
+    with row counts and min/max stats, so the dashboard can fetch the years it
+    shows first and the rest in the background. Rows without a year go to
+    the "unknown" bucket. Files in `directory` from earlier runs are removed.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    years = pd.to_numeric(df["release_year"], errors="coerce")
+    keys = pd.DataFrame({"bucket": (years // bucket_years * bucket_years).astype("Int64")}, index=df.index)
+    keys["region"] = _region_label(df) if by_region else None
+    shards, current = [], set()
+    for (bucket, region), part in df.groupby([keys["bucket"], keys["region"]], sort=False, dropna=False):
+        bucket = None if pd.isna(bucket) else int(bucket)
+        slug = "unknown" if bucket is None else str(bucket)
+        if by_region:
+            slug += "." + (re.sub(r"[^a-z0-9]+", "-", str(region).lower()).strip("-") or "unknown")
+        tmp_path = directory / f"processed.{slug}.json"
+        sha256, hashes = _write_records(part, tmp_path)
+        path = directory / f"processed.{slug}.{sha256[:12]}.json"
+        tmp_path.replace(path)
+        encodings = _precompress(path)
+        current.update([path.name, *encodings.values()])
+        part_years = years.loc[part.index].dropna()
+        shards.append(
+            {
+                "file": f"{directory.relative_to(PUBLIC_DATA).as_posix()}/{path.name}",
+                "rows": len(hashes),
+                "year_min": int(part_years.min()) if len(part_years) else None,
+                "year_max": int(part_years.max()) if len(part_years) else None,
+                "region": region if by_region else None,
+                "bytes": path.stat().st_size,
+                "encodings": encodings,
+                "stats": _shard_stats(part),
+            }
+        )
+    for old in directory.iterdir():
+        if old.name not in current:
+            old.unlink()
+    shards.sort(key=lambda s: (s["year_max"] is None, -(s["year_max"] or 0), s["region"] or ""))
+    _update_manifest(
+        "processed_shards",
+        {"bucket_years": bucket_years, "by_region": by_region, "records": len(df), "shards": shards},
+    )
+    print(f"Wrote {len(df)} rows as {len(shards)} shards to {directory}")
+
+
+def _remove_shards(directory: Path) -> None:
+    """Delete shards from an earlier --shard-years run and their manifest entry, so clients stop loading them."""
+    _update_manifest("processed_shards", None)
+    if not directory.exists():
+        return
+    for old in directory.glob("processed.*"):
+        old.unlink()
+    if not any(directory.iterdir()):
+        directory.rmdir()
+    print(f"Removed old shards from {directory}")
+
+
+def _dictionary_column(col: pd.Series) -> tuple[np.ndarray, list]:
+    """Dictionary-encode a column: code 0 is null, codes 1.. index the sorted values."""
+    codes, uniques = pd.factorize(col, sort=True)
+    dtype = "<u1" if len(uniques) < 256 else "<u2"
+    return (codes + 1).astype(dtype), [None, *_column_values(pd.Series(uniques, dtype=object))]
+
+
+def _bitset_column(col: pd.Series) -> tuple[np.ndarray, list, int]:
+    """Encode list values as per-row uint32 bitsets over the sorted distinct values."""
+    exploded = col.reset_index(drop=True).explode().dropna()
+    codes, uniques = pd.factorize(exploded, sort=True)
+    words = max(1, -(-len(uniques) // 32))
+    bits = np.zeros((len(col), words), dtype="<u4")
+    np.bitwise_or.at(bits, (exploded.index.to_numpy(), codes // 32), (1 << (codes % 32)).astype("<u4"))
+    return bits.ravel(), list(uniques), words
+
+
+def _export_columnar(df: pd.DataFrame, path: Path) -> None:
+    """
+    Export a DataFrame in the dashboard's columnar binary format (see data/schema.md).
+
+    Numeric columns become little-endian float32/float64/int32 arrays (float64
+    for money and counts), region/country/language dictionary codes, genres
+    per-row bitsets and the rest JSON arrays. Blobs are 8-byte aligned so the
+    browser can view them as typed arrays without copying.
+    """
+    header_columns = {}
+    blobs: List[bytes] = []
+    offset = 0
+    for name in df.columns:
+        col = df[name]
+        meta: dict = {}
+        if name in COLUMNAR_FLOAT:
+            values = pd.to_numeric(col, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            blob = np.where(np.isfinite(values), values, np.nan).astype("<f4").tobytes()
+            meta = {"type": "float32"}
+        elif name in COLUMNAR_FLOAT64:
+            values = pd.to_numeric(col, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            blob = np.where(np.isfinite(values), values, np.nan).astype("<f8").tobytes()
+            meta = {"type": "float64"}
+        elif name in COLUMNAR_INT:
+            values = pd.to_numeric(col, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            blob = np.where(np.isnan(values), INT32_NULL, values).astype("<i4").tobytes()
+            meta = {"type": "int32", "null": INT32_NULL}
+        elif name in COLUMNAR_DICT:
+            codes, dictionary = _dictionary_column(col)
+            blob = codes.tobytes()
+            meta = {"type": "dict", "dtype": "uint8" if codes.itemsize == 1 else "uint16", "dictionary": dictionary}
+        elif name in COLUMNAR_BITSET:
+            bits, dictionary, words = _bitset_column(col)
+            blob = bits.tobytes()
+            meta = {"type": "bitset", "words": words, "dictionary": dictionary}
+        else:
+            blob = _ENCODER.encode(_column_values(col)).encode("utf-8")
+            meta = {"type": "json"}
+        meta.update(offset=offset, bytes=len(blob))
+        header_columns[str(name)] = meta
+        blobs.append(blob + b"\0" * (-len(blob) % 8))
+        offset += len(blobs[-1])
+
+    header = _ENCODER.encode({"version": 1, "rows": len(df), "columns": header_columns}).encode("utf-8")
+    header += b" " * (-(len(header) + 8) % 8)  # blobs start 8-byte aligned
+    digest = hashlib.sha256()
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        for chunk in (COLUMNAR_MAGIC, len(header).to_bytes(4, "little"), header, *blobs):
+            f.write(chunk)
+            digest.update(chunk)
+    tmp_path.replace(path)
+    _publish(path, digest.hexdigest(), len(df))
+    print(f"Wrote {len(df)} rows ({path.stat().st_size} bytes) to {path}")
+
+
+def _region_label(df: pd.DataFrame) -> pd.Series:
+    """Python twin of regionLabel() in src/main.js: region, else country, else "Unknown"."""
+    region = df["region"].where(df["region"].notna() & ~df["region"].isin(["Other", "Unknown", ""]))
+    country = df["country"].where(df["country"].notna() & ~df["country"].isin(["Unknown", ""]))
+    return region.fillna(country).fillna("Unknown")
+
+
+def build_cube(df: pd.DataFrame) -> dict:
+    """
+    Aggregate the table into a year x region x genre cube for the dashboard.
+
+    Cells hold the row count and, per CUBE_MEASURES column, the sum and number
+    of non-null values, stored as running totals along year within each
+    (genre, region) series so any year range is two lookups per series.
+    Movies without genres count as "Unknown" (as in the matrix); an extra
+    all-genres slice counts every movie once. Rows without a year pass every
+    year filter in the dashboard, so they are kept apart in "nulls".
+    """
+    base = pd.DataFrame({"year": df["release_year"], "region": _region_label(df)})
+    for measure in CUBE_MEASURES:
+        base[measure] = pd.to_numeric(df[measure], errors="coerce").replace([np.inf, -np.inf], np.nan)
+    base = base.reset_index(drop=True)
+    genres = df["genres"].reset_index(drop=True)
+    no_genre = genres.isna() | genres.str.len().fillna(0).eq(0)
+    unknown = pd.Series([["Unknown"] for _ in range(int(no_genre.sum()))], index=genres.index[no_genre], dtype=object)
+    genres = genres.where(~no_genre, unknown).explode()
+
+    genre_names = sorted(genres.dropna().unique().tolist())
+    region_names = sorted(base["region"].unique().tolist())
+    all_genres = len(genre_names)
+    frame = pd.concat(
+        [
+            base.loc[genres.index].assign(genre=pd.Categorical(genres.to_numpy(), categories=genre_names).codes),
+            base.assign(genre=all_genres),
+        ],
+        ignore_index=True,
+    )
+    frame["region"] = pd.Categorical(frame["region"], categories=region_names).codes
+    aggs = {"count": ("region", "size")}
+    for measure in CUBE_MEASURES:
+        aggs[f"{measure}_sum"] = (measure, "sum")
+        aggs[f"{measure}_n"] = (measure, "count")
+
+    has_year = frame["year"].notna()
+    cells = frame[has_year].astype({"year": "int64"}).groupby(["genre", "region", "year"], sort=True).agg(**aggs)
+    cells = cells.groupby(level=["genre", "region"]).cumsum().reset_index()
+    nulls = frame[~has_year].groupby(["genre", "region"], sort=True).agg(**aggs).reset_index()
+    series = cells.groupby(["genre", "region"], sort=False).size().reset_index(name="length")
+    series["start"] = series["length"].cumsum() - series["length"]
+
+    def columns(table: pd.DataFrame) -> dict:
+        return {c: _column_values(table[c].round(4) if table[c].dtype.kind == "f" else table[c]) for c in table}
+
+    years = cells["year"]
+    return {
+        "version": 1,
+        "rows": len(df),
+        "years": [int(years.min()), int(years.max())] if len(years) else None,
+        "regions": region_names,
+        "genres": genre_names,
+        "all_genres": all_genres,
+        "measures": list(aggs),
+        "series": columns(series[["genre", "region", "start", "length"]]),
+        "cells": columns(cells.drop(columns=["genre", "region"])),
+        "nulls": columns(nulls),
+    }
+
+
+def _export_cube(df: pd.DataFrame, path: Path) -> None:
+    """Write the aggregate cube as compact JSON and publish a hashed copy."""
+    text = _ENCODER.encode(build_cube(df))
+    _write_text(path, text)
+    _publish(path, hashlib.sha256(text.encode("utf-8")).hexdigest(), len(df))
+    print(f"Wrote aggregate cube ({len(text)} bytes) to {path}")
+
+
+def _tokens(text: pd.Series) -> pd.Series:
+    """Split normalized text into word tokens (lists); src/search.js tokenizes queries the same way."""
+    return _normalize_title(text).str.split(r"[\W_]+", regex=True)
+
+
+def build_search_index(df: pd.DataFrame) -> dict:
+    """
+    Build the dashboard's title/actor search index.
+
+    Records are ranked by numVotes (most voted first, ties in file order) and
+    referred to by rank, so every posting list is sorted by popularity and
+    the first hits are the best ones. Tokens come from _normalize_title() of
+    titles and actor names and are stored sorted for binary search; the
+    postings of token i are postings[offsets[i]:offsets[i + 1]].
+    """
+    votes = pd.to_numeric(df["numVotes"], errors="coerce").fillna(-1)
+    order = df.iloc[np.argsort(-votes.to_numpy(), kind="stable")].reset_index(drop=True)
+    titles = pd.DataFrame({"record": order.index, "token": _tokens(order["title"].astype(object)).to_numpy()})
+    actors = order["actor_name"].explode().dropna()
+    actors = pd.DataFrame({"record": actors.index, "token": _tokens(actors.astype(str)).to_numpy()})
+    pairs = pd.concat([titles.explode("token"), actors.explode("token")], ignore_index=True)
+    pairs = pairs[pairs["token"].notna() & pairs["token"].ne("")].drop_duplicates()
+    pairs = pairs.sort_values(["token", "record"], kind="mergesort")
+    counts = pairs.groupby("token", sort=True).size()
+    return {
+        "version": 1,
+        "records": {
+            "id": _column_values(order["id"]),
+            "title": _column_values(order["title"]),
+            "release_year": _column_values(order["release_year"]),
+        },
+        "tokens": counts.index.tolist(),
+        "offsets": [0, *counts.cumsum().tolist()],
+        "postings": pairs["record"].astype("int64").tolist(),
+    }
+
+
+def _export_search_index(df: pd.DataFrame, path: Path) -> None:
+    """Write the search index sidecar as compact JSON and publish a hashed copy."""
+    text = _ENCODER.encode(build_search_index(df))
+    _write_text(path, text)
+    _publish(path, hashlib.sha256(text.encode("utf-8")).hexdigest(), len(df))
+    print(f"Wrote search index ({len(text)} bytes) to {path}")
+
+
+def _record_keys(df: pd.DataFrame) -> List[str]:
+    """Stable key per record: its id, else "title|release_year"; repeats get a "#n" suffix."""
+    keys: List[str] = []
+    seen: dict = {}
+    for record_id, title, year in zip(
+        _column_values(df["id"]), _column_values(df["title"]), _column_values(df["release_year"])
+    ):
+        key = str(record_id) if record_id is not None else f"{title}|{year}"
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        keys.append(key if n == 0 else f"{key}#{n}")
+    return keys
+
+
+def write_delta(df: pd.DataFrame, record_hashes: List[str], name: str = "processed") -> None:
+    """
+    Version an export and write the records that changed since the last build.
+
+    The base version is the one published in manifest.json. record_hashes are
+    the per-record hashes returned by _export_json; those of the published
+    build live in BUILD_STATE. Changed or new records and removed keys go to
+    public/data/deltas/<name>.<version>.json, and the manifest entry gets the
+    new version and the last MAX_DELTAS deltas, so a client on an older
+    version can patch its copy instead of downloading the full file (format in
+    data/schema.md). When BUILD_STATE is missing or belongs to another version
+    (a fresh checkout, a cleaned cache), the version still goes up but no
+    delta can be trusted: the old ones are dropped and clients refetch the
+    full file.
+    """
+    published = _manifest_entry(name)
+    previous = published.get("version", 0)
+    deltas = published.get("deltas", [])
+    state = json.loads(BUILD_STATE.read_text()) if BUILD_STATE.exists() else {}
+    old_hashes = state.get("hashes") if previous and state.get("version") == previous else None
+    keys = _record_keys(df)
+    hashes = dict(zip(keys, record_hashes))
+
+    if old_hashes is None:
+        if previous:
+            print(f"Build state does not match published {name} version {previous}; writing a full snapshot")
+        for stale in deltas:
+            (PUBLIC_DATA / stale["path"]).unlink(missing_ok=True)
+        version, deltas = previous + 1, []
+    else:
+        changed = [i for i, key in enumerate(keys) if old_hashes.get(key) != hashes[key]]
+        removes = [key for key in old_hashes if key not in hashes]
+        version = previous + 1 if changed or removes else previous
+        if version != previous:
+            delta_path = f"deltas/{name}.{version}.json"
+            upserts = ",\n".join(
+                f"{json.dumps(keys[i])}:{line}" for i, line in zip(changed, _iter_json_records(df.iloc[changed]))
+            )
+            removed = json.dumps(removes, separators=(",", ":"))
+            _write_text(
+                PUBLIC_DATA / delta_path,
+                f'{{"from":{previous},"to":{version},"upserts":{{\n{upserts}\n}},"removes":{removed}}}\n',
+            )
+            deltas.append(
+                {"from": previous, "to": version, "path": delta_path, "upserts": len(changed), "removes": len(removes)}
+            )
+            print(f"Wrote delta {previous} -> {version}: {len(changed)} upserts, {len(removes)} removes")
+            for stale in deltas[:-MAX_DELTAS]:
+                (PUBLIC_DATA / stale["path"]).unlink(missing_ok=True)
+            deltas = deltas[-MAX_DELTAS:]
+
+    if version == previous:
+        print(f"No record changes; {name} stays at version {previous}")
+    else:
+        _write_json(BUILD_STATE, {"version": version, "hashes": hashes})
+        print(f"{name} is now at version {version}")
+    _update_manifest(name, {**_manifest_entry(name), "version": version, "deltas": deltas})
+    (PUBLIC_DATA / f"{name}.version.json").unlink(missing_ok=True)  # superseded by the manifest entry
 
 
 def main() -> None:
     """Entry point: merge all data sources and export to JSON."""
+    global CACHE_DIR, SCAN_WORKERS, LOW_MEMORY, MAX_MEMORY
+    parser = argparse.ArgumentParser(description="Merge raw movie data into public/data/processed.json.")
+    parser.add_argument("--no-cache", action="store_true", help="parse the IMDB TSV dumps instead of the Parquet cache")
+    parser.add_argument(
+        "--workers", type=int, default=SCAN_WORKERS, help="processes parsing and filtering IMDB TSV blocks"
+    )
+    parser.add_argument("--stage", action="append", choices=list(STAGES), help="only (re)build these stages, no export")
+    parser.add_argument(
+        "--force", action="append", default=[], choices=[*STAGES, "all"], help="recompute a stage and its dependents"
+    )
+    parser.add_argument("--list", action="store_true", help="list stages and their cache status")
+    parser.add_argument(
+        "--shard-years", type=int, default=0, metavar="N", help="also write shards of N release years each (0 = off)"
+    )
+    parser.add_argument("--shard-by-region", action="store_true", help="split year shards further by region")
+    parser.add_argument(
+        "--low-memory", action="store_true", help="compact dtypes, streamed IMDB batches and one stage at a time"
+    )
+    parser.add_argument(
+        "--max-memory", type=_parse_size, metavar="SIZE", help="memory budget, e.g. 2G (implies --low-memory)"
+    )
+    args = parser.parse_args()
+    if args.list:
+        list_stages()
+        return
+    SCAN_WORKERS = max(1, args.workers)
+    LOW_MEMORY = args.low_memory or args.max_memory is not None
+    MAX_MEMORY = args.max_memory
+    if MAX_MEMORY is not None:
+        workers = max(1, min(SCAN_WORKERS, int(MAX_MEMORY * (1 - CHUNK_MEMORY_SHARE) // WORKER_MEMORY)))
+        if workers < SCAN_WORKERS:
+            print(f"Using {workers} scan workers to stay within --max-memory")
+        SCAN_WORKERS = workers
+    if args.no_cache:
+        CACHE_DIR = None
+    elif pq is None:
+        print("pyarrow not installed; parsing IMDB TSV dumps directly (pip install pyarrow to enable the cache)")
+
     _ensure_paths()
-    merged = merge_data()
-    _export_json(merged, PUBLIC_DATA / "processed.json")
+    try:
+        if args.stage:
+            run_stages(args.stage, force=args.force)
+            return
+        merged = run_stages(["merged"], force=args.force)["merged"]
+    finally:
+        _close_scan_pool()
+    write_delta(merged, _export_json(merged, PUBLIC_DATA / "processed.json"))
+    _export_columnar(merged, PUBLIC_DATA / "processed_columns.bin")
+    _export_cube(merged, PUBLIC_DATA / "cube.json")
+    _export_search_index(merged, PUBLIC_DATA / "search_index.json")
+    if args.shard_years > 0:
+        _export_shards(merged, PUBLIC_DATA / "shards", args.shard_years, args.shard_by_region)
+    else:
+        _remove_shards(PUBLIC_DATA / "shards")
     _export_json(merged.sample(min(50, len(merged))), PUBLIC_DATA / "sample_processed.json")
 
 
@@ -0,0 +1,138 @@
+// ============================================================================
+// COLUMNAR DATASET
+// ============================================================================
+
+// Reader for processed_columns.bin written by scripts/prepare_data.py:
+// "MVC1", uint32 header length, JSON header, then 8-byte aligned
+// little-endian column blobs (layout in data/schema.md). Numeric and coded
+// columns are viewed as typed arrays in place; filters scan those arrays.
+// Typed arrays use the platform byte order, which is little-endian on every
+// browser platform we target.
+
+const MAGIC = "MVC1";
+const CODE_ARRAYS = { uint8: Uint8Array, uint16: Uint16Array };
+
+// Parses a columnar file into { rows, columns }; each column keeps its header
+// fields plus `values` (typed array, or a plain array for JSON columns)
+export function parseColumnar(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== MAGIC) throw new Error(`Not a columnar dataset (magic ${magic})`);
+  const headerLength = view.getUint32(4, true);
+  const decoder = new TextDecoder();
+  const header = JSON.parse(decoder.decode(new Uint8Array(buffer, 8, headerLength)));
+  const base = 8 + headerLength;
+
+  const columns = {};
+  for (const [name, col] of Object.entries(header.columns)) {
+    const start = base + col.offset;
+    let values;
+    if (col.type === "float32") values = new Float32Array(buffer, start, col.bytes / 4);
+    else if (col.type === "float64") values = new Float64Array(buffer, start, col.bytes / 8);
+    else if (col.type === "int32") values = new Int32Array(buffer, start, col.bytes / 4);
+    else if (col.type === "dict") {
+      const Codes = CODE_ARRAYS[col.dtype];
+      values = new Codes(buffer, start, col.bytes / Codes.BYTES_PER_ELEMENT);
+    } else if (col.type === "bitset") values = new Uint32Array(buffer, start, col.bytes / 4);
+    else values = JSON.parse(decoder.decode(new Uint8Array(buffer, start, col.bytes)));
+    columns[name] = { ...col, values };
+  }
+  return { rows: header.rows, columns };
+}
+
+// Fetches and parses a columnar file; null if it is not available
+export async function loadColumnar(url, options) {
+  const res = await fetch(url, options);
+  if (!res.ok) return null;
+  return parseColumnar(await res.arrayBuffer());
+}
+
+// Decodes one cell back to its JSON value
+export function cellValue(col, i) {
+  switch (col.type) {
+    case "float32": {
+      const v = col.values[i];
+      return Number.isNaN(v) ? null : Number(v.toPrecision(7)); // drop float32 rounding noise
+    }
+    case "float64":
+      return Number.isNaN(col.values[i]) ? null : col.values[i];
+    case "int32":
+      return col.values[i] === col.null ? null : col.values[i];
+    case "dict":
+      return col.dictionary[col.values[i]];
+    case "bitset":
+      return bitsetValues(col, i);
+    default:
+      return col.values[i];
+  }
+}
+
+// Dictionary values whose bits are set in row i of a bitset column
+function bitsetValues(col, i) {
+  const out = [];
+  for (let w = 0; w < col.words; w++) {
+    let word = col.values[i * col.words + w];
+    while (word) {
+      const bit = 31 - Math.clz32(word & -word);
+      out.push(col.dictionary[w * 32 + bit]);
+      word &= word - 1;
+    }
+  }
+  return out;
+}
+
+// Builds plain row objects (used for rendering and detail views)
+export function decodeRows(table) {
+  const entries = Object.entries(table.columns);
+  const rows = new Array(table.rows);
+  for (let i = 0; i < table.rows; i++) {
+    const row = {};
+    for (const [name, col] of entries) row[name] = cellValue(col, i);
+    rows[i] = row;
+  }
+  return rows;
+}
+
+// 1/0 flag per dictionary entry: is that value in `selected`?
+export function codeFlags(dictionary, selected) {
+  const flags = new Uint8Array(dictionary.length);
+  dictionary.forEach((value, code) => {
+    flags[code] = selected.has(value) ? 1 : 0;
+  });
+  return flags;
+}
+
+// Bit mask (one uint32 per word) over a bitset column for the values in `selected`
+export function bitMask(col, selected) {
+  const mask = new Uint32Array(col.words);
+  col.dictionary.forEach((value, code) => {
+    if (selected.has(value)) mask[code >> 5] |= 1 << (code & 31);
+  });
+  return mask;
+}
+
+// Indices of rows passing every filter, in row order. Filters are
+//   { codes, flags }            row passes if flags[codes[i]]
+//   { bits, words, mask }       row passes if any masked bit is set
+//   { ints, nullValue, min, max } row passes if null or min <= v <= max
+export function selectRows(rowCount, filters) {
+  const out = new Uint32Array(rowCount);
+  let n = 0;
+  for (let i = 0; i < rowCount; i++) {
+    let keep = true;
+    for (const f of filters) {
+      if (f.flags) {
+        keep = f.flags[f.codes[i]] === 1;
+      } else if (f.mask) {
+        keep = false;
+        for (let w = 0; w < f.words && !keep; w++) keep = (f.bits[i * f.words + w] & f.mask[w]) !== 0;
+      } else {
+        const v = f.ints[i];
+        keep = v === f.nullValue || (v >= f.min && v <= f.max);
+      }
+      if (!keep) break;
+    }
+    if (keep) out[n++] = i;
+  }
+  return out.subarray(0, n);
+}
@@ -0,0 +1,115 @@
+// ============================================================================
+// AGGREGATE CUBE
+// ============================================================================
+
+// Queries over cube.json written by scripts/prepare_data.py: per (genre,
+// region) series, running totals along year of count and the sum / non-null
+// count of budget, revenue, rating and viewership. A year range costs two
+// binary searches per series, independent of the number of movies.
+
+// Adds name → index lookups to a parsed cube
+export function prepareCube(cube) {
+  cube.regionIndex = new Map(cube.regions.map((name, i) => [name, i]));
+  cube.genreIndex = new Map(cube.genres.map((name, i) => [name, i]));
+  return cube;
+}
+
+// Index of the last cell in [start, end) with year <= year, or start - 1
+function lastAtOrBefore(years, start, end, year) {
+  let lo = start;
+  let hi = end;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (years[mid] <= year) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo - 1;
+}
+
+// Zeroed totals for every cube measure
+function emptyTotals(cube) {
+  return Object.fromEntries(cube.measures.map((m) => [m, 0]));
+}
+
+// Series (and rows without a year) matching a genre index and optional region index set
+function matches(table, i, genre, regions) {
+  return table.genre[i] === genre && (!regions || regions.has(table.region[i]));
+}
+
+// Region names → index set (null means all regions)
+function regionSet(cube, regionNames) {
+  if (!regionNames || !regionNames.size) return null;
+  return new Set([...regionNames].map((r) => cube.regionIndex.get(r)).filter((i) => i !== undefined));
+}
+
+// Genre name → index, or the all-genres slice when no genre is given
+function genreCode(cube, genreName) {
+  if (!genreName) return cube.all_genres;
+  return cube.genreIndex.has(genreName) ? cube.genreIndex.get(genreName) : -1;
+}
+
+// Totals over [minYear, maxYear] plus rows without a year, for the given
+// regions (Set of names, empty = all) and genre (name, or null for all)
+export function rangeTotals(cube, { regions, genre, minYear, maxYear }) {
+  const totals = emptyTotals(cube);
+  const g = genreCode(cube, genre);
+  const r = regionSet(cube, regions);
+  const { series, cells, nulls } = cube;
+  for (let s = 0; s < series.start.length; s++) {
+    if (!matches(series, s, g, r)) continue;
+    const start = series.start[s];
+    const end = start + series.length[s];
+    const hi = lastAtOrBefore(cells.year, start, end, maxYear);
+    if (hi < start) continue;
+    const lo = lastAtOrBefore(cells.year, start, end, minYear - 1);
+    for (const m of cube.measures) totals[m] += cells[m][hi] - (lo >= start ? cells[m][lo] : 0);
+  }
+  for (let i = 0; i < nulls.genre.length; i++) {
+    if (!matches(nulls, i, g, r)) continue;
+    for (const m of cube.measures) totals[m] += nulls[m][i];
+  }
+  return totals;
+}
+
+// Per-year totals for the given regions and genre, as a Map year → totals
+export function yearlyTotals(cube, { regions, genre }) {
+  const byYear = new Map();
+  const g = genreCode(cube, genre);
+  const r = regionSet(cube, regions);
+  const { series, cells } = cube;
+  for (let s = 0; s < series.start.length; s++) {
+    if (!matches(series, s, g, r)) continue;
+    const start = series.start[s];
+    for (let c = start; c < start + series.length[s]; c++) {
+      const year = cells.year[c];
+      if (!byYear.has(year)) byYear.set(year, emptyTotals(cube));
+      const totals = byYear.get(year);
+      for (const m of cube.measures) totals[m] += cells[m][c] - (c > start ? cells[m][c - 1] : 0);
+    }
+  }
+  return byYear;
+}
+
+// Movie counts per "genre||region" over [minYear, maxYear] (rows without a year included)
+export function matrixCounts(cube, minYear, maxYear) {
+  const counts = new Map();
+  const { series, cells, nulls } = cube;
+  const add = (genre, region, n) => {
+    if (n <= 0) return;
+    const key = `${cube.genres[genre]}||${cube.regions[region]}`;
+    counts.set(key, (counts.get(key) || 0) + n);
+  };
+  for (let s = 0; s < series.start.length; s++) {
+    if (series.genre[s] === cube.all_genres) continue;
+    const start = series.start[s];
+    const end = start + series.length[s];
+    const hi = lastAtOrBefore(cells.year, start, end, maxYear);
+    if (hi < start) continue;
+    const lo = lastAtOrBefore(cells.year, start, end, minYear - 1);
+    add(series.genre[s], series.region[s], cells.count[hi] - (lo >= start ? cells.count[lo] : 0));
+  }
+  for (let i = 0; i < nulls.genre.length; i++) {
+    if (nulls.genre[i] !== cube.all_genres) add(nulls.genre[i], nulls.region[i], nulls.count[i]);
+  }
+  return counts;
+}
@@ -1,3 +1,8 @@
+import { bitMask, cellValue, codeFlags, decodeRows, loadColumnar, selectRows } from "./columnar.js";
+import { matrixCounts, prepareCube, rangeTotals, yearlyTotals } from "./cube.js";
+import { blendPalettes, nearestColors, paletteIndexOf, preparePalettes } from "./palettes.js";
+import { prepareSearchIndex, searchIndex } from "./search.js";
+
 // ============================================================================
 // STATE MANAGEMENT
 // ============================================================================
@@ -11,11 +16,19 @@ const state = {
   compare: [],                           // IDs of movies in compare panel
   selected: null,                        // Currently selected movie from search
   barcodeColors: {},                     // Title → color data lookup
+  barcodeById: {},                       // Record id → color data (compact colors only)
   scatterGenres: new Set(),              // Genres shown in scatter plot
   deepDive: [],                          // IDs of movies in deep dive panel
   selectedRegions: new Set(),            // Regions selected via matrix
   selectedGenres: new Set(),             // Genres selected via matrix
   deepDiveHidden: new Set(),             // IDs hidden in combined glyph
+  table: null,                           // Typed-array columns when loaded from the columnar file
+  regionCodes: null,                     // Per-row index into regionLabels (columnar only)
+  regionLabels: [],                      // Distinct regionLabel() values (columnar only)
+  cube: null,                            // Year × region × genre aggregates (cube.json)
+  searchIndex: null,                     // Title/actor token index (search_index.json)
+  palettes: null,                        // Per-movie LAB palettes + color grid (movies_palettes.json)
+  matrixColors: null,                    // Per-cell matrix colors by year (see matrixColorIndex)
 };
 
 // ============================================================================
@@ -42,8 +55,153 @@ const selectAllBtn = document.querySelector("#selectAllBtn");
 // DATA LOADING
 // ============================================================================
 
+// Directories that may hold the data files, depending on how the site is served
+const DATA_DIRS = ["./public/data/", "/public/data/", "./data/", "/data/", "./"];
+
+// Finds public/data/manifest.json; returns { dir, manifest } or null. Only the
+// small manifest is revalidated: the content-hashed files it lists never
+// change, so the browser may cache them for as long as the server allows.
+let manifestRequest = null;
+function findManifest() {
+  manifestRequest ??= (async () => {
+    for (const dir of DATA_DIRS) {
+      try {
+        const res = await fetch(`${dir}manifest.json`, { cache: "no-cache" });
+        if (res.ok) return { dir, manifest: await res.json() };
+      } catch (err) {
+        console.warn(`Unable to load ${dir}manifest.json`, err);
+      }
+    }
+    return null;
+  })();
+  return manifestRequest;
+}
+
+// Loads a JSON sidecar listed in the manifest (e.g. "cube"); null if there is none
+async function loadSidecar(name) {
+  const found = await findManifest();
+  if (!found || !found.manifest[name]) return null;
+  try {
+    const res = await fetch(`${found.dir}${found.manifest[name].file}`);
+    return res.ok ? await res.json() : null;
+  } catch (err) {
+    console.warn(`Unable to load ${name}`, err);
+    return null;
+  }
+}
+
+// Rows to have before the first render when the data is sharded
+const FIRST_PAINT_ROWS = 2000;
+
+// Remaining shard rows still downloading (sharded data only)
+let pendingRows = null;
+
+// Loads year shards: shards inside the timeline selection first, newest first,
+// until FIRST_PAINT_ROWS; the rest start downloading into pendingRows
+async function loadShards(dir, entry) {
+  const { min, max } = state.timelineSelection;
+  const inSelection = (s) => s.year_min === null || (s.year_max >= min && s.year_min <= max);
+  const ordered = [...entry.shards.filter(inSelection), ...entry.shards.filter((s) => !inSelection(s))];
+  let count = 0;
+  let split = 0;
+  while (split < ordered.length && (split === 0 || count < FIRST_PAINT_ROWS)) {
+    count += ordered[split].rows;
+    split += 1;
+  }
+  const fetchShard = async (shard) => {
+    const res = await fetch(`${dir}${shard.file}`);
+    if (!res.ok) throw new Error(`Fetch failed for ${dir}${shard.file}: ${res.status}`);
+    return res.json();
+  };
+  const rows = (await Promise.all(ordered.slice(0, split).map(fetchShard))).flat();
+  const rest = ordered.slice(split);
+  if (rest.length) pendingRows = Promise.all(rest.map(fetchShard)).then((parts) => parts.flat());
+  console.log(`Loaded ${rows.length} of ${entry.records} rows from ${split} shards`);
+  return rows;
+}
+
+// Adds rows that arrived after the first render, keeping the user's selections
+function appendRows(rows) {
+  const fullRange =
+    state.timelineSelection.min === state.years.min && state.timelineSelection.max === state.years.max;
+  const selection = state.timelineSelection;
+  const region = regionFilter ? regionFilter.value : "";
+  const genre = genreFilter ? genreFilter.value : "";
+  state.data = state.data.concat(rows);
+  populateFilters(state.data);
+  if (!fullRange) state.timelineSelection = selection;
+  if (regionFilter) regionFilter.value = region;
+  if (genreFilter) genreFilter.value = genre;
+  console.log(`[init] all ${state.data.length} rows loaded`);
+  applyFilters();
+}
+
+// Loads the sharded, columnar or JSON export listed in the manifest; null if none works
+async function loadFromManifest() {
+  const found = await findManifest();
+  if (!found) return null;
+  const { dir, manifest } = found;
+  if (manifest.processed_shards) {
+    try {
+      const rows = await loadShards(dir, manifest.processed_shards);
+      if (rows.length) return rows;
+    } catch (err) {
+      console.warn("Unable to load data shards, falling back to a single file", err);
+      pendingRows = null;
+    }
+  }
+  if (manifest.processed_columns) {
+    try {
+      const table = await loadColumnar(`${dir}${manifest.processed_columns.file}`);
+      if (table && table.rows) {
+        console.log(`Loaded ${table.rows} rows from ${dir}${manifest.processed_columns.file}`);
+        useTable(table);
+        return decodeRows(table);
+      }
+    } catch (err) {
+      console.warn("Unable to load columnar data, falling back to JSON", err);
+    }
+  }
+  if (manifest.processed) {
+    try {
+      const res = await fetch(`${dir}${manifest.processed.file}`);
+      const json = res.ok ? await res.json() : null;
+      if (Array.isArray(json) && json.length) {
+        console.log(`Loaded ${json.length} rows from ${dir}${manifest.processed.file}`);
+        return json;
+      }
+    } catch (err) {
+      console.warn(`Unable to load ${dir}${manifest.processed.file}`, err);
+    }
+  }
+  return null;
+}
+
+// Keeps the typed-array table for filtering and precomputes region label codes
+// (regionLabel folds region and country, so it gets its own dictionary)
+function useTable(table) {
+  const region = table.columns.region;
+  const country = table.columns.country;
+  const labels = [];
+  const labelCode = new Map();
+  const codes = new Uint16Array(table.rows);
+  for (let i = 0; i < table.rows; i++) {
+    const label = regionLabel({ region: cellValue(region, i), country: cellValue(country, i) });
+    if (!labelCode.has(label)) {
+      labelCode.set(label, labels.length);
+      labels.push(label);
+    }
+    codes[i] = labelCode.get(label);
+  }
+  state.table = table;
+  state.regionCodes = codes;
+  state.regionLabels = labels;
+}
+
 // Loads movie data from JSON, tries multiple paths, falls back to sample
 async function loadData() {
+  const fromManifest = await loadFromManifest();
+  if (fromManifest) return fromManifest;
   const candidates = [
     "./public/data/processed.json",
     "/public/data/processed.json",
@@ -80,8 +238,83 @@ async function loadData() {
   throw new Error("No data file found. Run the prep script first.");
 }
 
-// Loads barcode color data, returns lookup object keyed by movie title
+// Color data entry whose avg_colors are decoded from the blob on first use
+function compactColorEntry(bytes, offset, count, overallAvg, fourOpposites) {
+  let avgColors = null;
+  return {
+    get avg_colors() {
+      if (!avgColors) {
+        avgColors = new Array(count);
+        for (let i = 0; i < count; i++) {
+          const o = offset + i * 3;
+          avgColors[i] = [bytes[o], bytes[o + 1], bytes[o + 2]];
+        }
+      }
+      return avgColors;
+    },
+    overall_avg: overallAvg,
+    four_opposites: fourOpposites,
+  };
+}
+
+// Loads the quantized movies_colors_table.json + uint8 blob written by the
+// barcode scripts; returns { byTitle, byId } or null when not available.
+// Entries with a record id are only found by id, so other movies sharing
+// their title do not borrow their colors
+async function loadCompactColors() {
+  for (const dir of DATA_DIRS) {
+    try {
+      const res = await fetch(`${dir}movies_colors_table.json`);
+      if (!res.ok) continue;
+      const table = await res.json();
+      const blob = await fetch(`${dir}${table.blob}`);
+      if (!blob.ok) continue;
+      const bytes = new Uint8Array(await blob.arrayBuffer());
+      const byTitle = {};
+      const byId = {};
+      table.titles.forEach((title, i) => {
+        const entry = compactColorEntry(bytes, i * table.stride * 3, table.counts[i],
+          table.overall_avg[i], table.four_opposites[i]);
+        if (table.ids[i]) byId[table.ids[i]] = entry;
+        else if (title) byTitle[title] = entry;
+      });
+      console.log(`Loaded compact barcode colors for ${table.titles.length} movies from ${dir}`);
+      return { byTitle, byId };
+    } catch (err) {
+      console.warn(`Unable to load compact barcode colors from ${dir}`, err);
+    }
+  }
+  return null;
+}
+
+// Loads movies_palettes.json (LAB k-means palettes + color grid); null if not available
+async function loadPalettes() {
+  for (const dir of DATA_DIRS) {
+    try {
+      const res = await fetch(`${dir}movies_palettes.json`);
+      if (res.ok) return preparePalettes(await res.json());
+    } catch (err) {
+      console.warn(`Unable to load palettes from ${dir}`, err);
+    }
+  }
+  return null;
+}
+
+// Color data for a movie: record id first, then title
+function barcodeFor(movie) {
+  if (!movie) return undefined;
+  return (movie.id != null && state.barcodeById[String(movie.id)]) || state.barcodeColors[movie.title];
+}
+
+// Loads barcode color data, returns lookup object keyed by movie title.
+// Prefers the compact format (also fills state.barcodeById); falls back to movies_colors.json
 async function loadBarcodeColors() {
+  const compact = await loadCompactColors();
+  if (compact) {
+    state.barcodeById = compact.byId;
+    return compact.byTitle;
+  }
+
   const candidates = [
     "./public/data/movies_colors.json",
     "/public/data/movies_colors.json",
@@ -170,10 +403,17 @@ function applyFilters() {
   const minYear = state.timelineSelection.min;
   const maxYear = state.timelineSelection.max;
 
-  const source = baseDataForSelections();
-  state.filtered = source.filter((d) => {
-    return matchesYearRange(d, minYear, maxYear);
-  });
+  if (state.table) {
+    const years = state.table.columns.release_year;
+    const filters = selectionFilters();
+    filters.push({ ints: years.values, nullValue: years.null, min: minYear, max: maxYear });
+    state.filtered = rowsAt(selectRows(state.table.rows, filters));
+  } else {
+    const source = baseDataForSelections();
+    state.filtered = source.filter((d) => {
+      return matchesYearRange(d, minYear, maxYear);
+    });
+  }
   const filteredIds = new Set(state.filtered.map((d) => String(d.id)));
   state.deepDive = state.deepDive.filter((id) => filteredIds.has(String(id)));
   render();
@@ -184,6 +424,10 @@ function baseDataForSelections() {
   const hasRegions = state.selectedRegions.size > 0;
   const hasGenres = state.selectedGenres.size > 0;
 
+  if (state.table) {
+    if (!hasRegions && !hasGenres) return state.data.slice();
+    return rowsAt(selectRows(state.table.rows, selectionFilters()));
+  }
   return state.data.filter((d) => {
     const matchesRegion = !hasRegions || state.selectedRegions.has(regionLabel(d));
     const matchesGenre =
@@ -192,6 +436,36 @@ function baseDataForSelections() {
   });
 }
 
+// Typed-array scan filters for the selected regions and genres (columnar data only)
+function selectionFilters() {
+  const filters = [];
+  if (state.selectedRegions.size > 0) {
+    filters.push({ codes: state.regionCodes, flags: codeFlags(state.regionLabels, state.selectedRegions) });
+  }
+  if (state.selectedGenres.size > 0) {
+    const genres = state.table.columns.genres;
+    filters.push({ bits: genres.values, words: genres.words, mask: bitMask(genres, state.selectedGenres) });
+  }
+  return filters;
+}
+
+// Row objects for the given row indices
+function rowsAt(indices) {
+  return Array.from(indices, (i) => state.data[i]);
+}
+
+// True when the cube describes the loaded rows (not the sample file)
+function cubeMatchesData() {
+  return !!state.cube && state.cube.rows === state.data.length;
+}
+
+// The cube answers timeline aggregates for any region selection and at most
+// one genre; several genres (a movie may have more than one) and the
+// synthetic "Unknown" genre fall back to aggregating rows
+function cubeAppliesToTimeline() {
+  return cubeMatchesData() && state.selectedGenres.size <= 1 && !state.selectedGenres.has("Unknown");
+}
+
 // Checks if movie falls within the given year range
 function matchesYearRange(d, minYear, maxYear) {
   return (!d.release_year && d.release_year !== 0) || (d.release_year >= minYear && d.release_year <= maxYear);
@@ -209,14 +483,15 @@ function regionLabel(d) {
 // ============================================================================
 
 // Main render function - calls all visualization renderers
+// With a cube matching the data, the timeline and matrix get no rows and
+// answer from aggregates; only the detail views below use state.filtered
 function render() {
   renderTitles();
   const minYear = state.timelineSelection.min;
   const maxYear = state.timelineSelection.max;
-  const matrixData = state.data.filter((d) => matchesYearRange(d, minYear, maxYear));
   renderSummary(state.filtered);
-  renderTimeline(baseDataForSelections());
-  renderGenreRegionMatrix(matrixData);
+  renderTimeline(cubeAppliesToTimeline() ? null : baseDataForSelections());
+  renderGenreRegionMatrix(cubeMatchesData() ? null : state.data.filter((d) => matchesYearRange(d, minYear, maxYear)));
   renderScatter(state.filtered);
   renderSearchResult(searchInput.value);
   renderCompare();
@@ -305,24 +580,33 @@ function renderSummary(data) {
 // TIMELINE VISUALIZATION
 // ============================================================================
 
-// Renders dual-axis line chart (budget + rating over time) with brush selection
+// Renders dual-axis line chart (budget + rating over time) with brush selection.
+// data is null when the cube answers the aggregates
 function renderTimeline(data) {
   const container = d3.select("#timeline");
   container.selectAll("*").remove();
-  if (!data.length) {
+  const cubeQuery = data
+    ? null
+    : { regions: state.selectedRegions, genre: [...state.selectedGenres][0] || null };
+  const cubeYears = cubeQuery ? yearlyTotals(state.cube, cubeQuery) : null;
+  if (cubeYears ? !cubeYears.size : !data.length) {
     container.append("div").text("No data for current filters.");
     return;
   }
 
   const selectedMin = state.timelineSelection.min;
   const selectedMax = state.timelineSelection.max;
-  const selectedData = data.filter(
+  const selectedData = cubeQuery ? [] : data.filter(
     (d) =>
       (!d.release_year && d.release_year !== 0) ||
       (d.release_year >= selectedMin && d.release_year <= selectedMax)
   );
-  const avgBudget = d3.mean(selectedData, (d) => d.budget) || 0;
-  const avgRating = d3.mean(selectedData, (d) => d.rating) || 0;
+  const mean = (t, m) => (t[`${m}_n`] ? t[`${m}_sum`] / t[`${m}_n`] : undefined);
+  const selectedTotals = cubeQuery
+    ? rangeTotals(state.cube, { ...cubeQuery, minYear: selectedMin, maxYear: selectedMax })
+    : null;
+  const avgBudget = (selectedTotals ? mean(selectedTotals, "budget") : d3.mean(selectedData, (d) => d.budget)) || 0;
+  const avgRating = (selectedTotals ? mean(selectedTotals, "rating") : d3.mean(selectedData, (d) => d.rating)) || 0;
 
   const summaryNode = container
     .append("div")
@@ -335,17 +619,23 @@ function renderTimeline(data) {
 
   const genreLabel = genreFilter && genreFilter.value ? `${genreFilter.value}` : "All genres";
 
-  const agg = d3
-    .rollups(
-      data,
-      (v) => ({
-        avgBudget: d3.mean(v, (d) => d.budget),
-        avgRating: d3.mean(v, (d) => d.rating),
-      }),
-      (d) => +d.release_year
-    )
-    .filter(([year]) => !Number.isNaN(year))
-    .sort((a, b) => a[0] - b[0]);
+  const agg = (
+    cubeQuery
+      ? Array.from(cubeYears, ([year, t]) => [
+          year,
+          { avgBudget: mean(t, "budget"), avgRating: mean(t, "rating") },
+        ])
+      : d3
+          .rollups(
+            data,
+            (v) => ({
+              avgBudget: d3.mean(v, (d) => d.budget),
+              avgRating: d3.mean(v, (d) => d.rating),
+            }),
+            (d) => +d.release_year
+          )
+          .filter(([year]) => !Number.isNaN(year))
+  ).sort((a, b) => a[0] - b[0]);
 
   const containerNode = container.node();
   const width = containerNode.clientWidth || 600;
@@ -681,7 +971,7 @@ function renderScatter(data) {
     if (showQuadrants) {
       // Create quadrant groups for each point with reduced opacity
       plotted.forEach((d) => {
-        const colorData = state.barcodeColors[d.title];
+        const colorData = barcodeFor(d);
         if (colorData && colorData.four_opposites && colorData.four_opposites.length >= 4) {
           const colors = colorData.four_opposites.map(rgb =>
             `rgb(${Math.round(rgb[0])}, ${Math.round(rgb[1])}, ${Math.round(rgb[2])})`
@@ -900,7 +1190,7 @@ function adjustColor(rgb, factor) {
 function averageMovieColor(movie) {
   const fallback = "rgb(120, 140, 170)";
   if (!movie || !movie.title) return fallback;
-  const colorData = state.barcodeColors[movie.title];
+  const colorData = barcodeFor(movie);
   if (!colorData || !Array.isArray(colorData.overall_avg)) return fallback;
   const rgb = colorData.overall_avg.map((v) => clamp(Math.round(v), 20, 235));
   if (rgb.length < 3) return fallback;
@@ -917,17 +1207,35 @@ function hexToRgb(hex) {
   ] : null;
 }
 
+// Max LAB distance (ΔE) for a color search match when palettes are loaded
+const COLOR_MATCH_DELTA_E = 30;
+
 // Filters deep dive selection to movies closest to the given color
 function findMoviesByColor(hexColor) {
   const targetRgb = hexToRgb(hexColor);
   if (!targetRgb) return;
 
-  const maxDistance = 100;
   const selectedIds = new Set(state.deepDive);
-  const candidates = state.data.filter(m => selectedIds.has(m.id) && state.barcodeColors[m.title]);
+  if (state.palettes) {
+    // Grid lookup in LAB: only cells near the target color are visited
+    const idAt = new Map();
+    state.data.forEach((m) => {
+      if (!selectedIds.has(m.id)) return;
+      const position = paletteIndexOf(state.palettes, m);
+      if (position >= 0 && !idAt.has(position)) idAt.set(position, m.id);
+    });
+    const nearest = nearestColors(state.palettes, targetRgb, COLOR_MATCH_DELTA_E, (p) => idAt.has(p));
+    state.deepDive = nearest.slice(0, 50).map((m) => idAt.get(m.position));
+    renderDeepDiveSelection();
+    renderScatter(state.filtered);
+    return;
+  }
+
+  const maxDistance = 100;
+  const candidates = state.data.filter(m => selectedIds.has(m.id) && barcodeFor(m));
 
   const matches = candidates.map(movie => {
-    const movieColor = state.barcodeColors[movie.title].overall_avg;
+    const movieColor = barcodeFor(movie).overall_avg;
     if (!movieColor) return null;
     const dist = Math.sqrt(
       Math.pow(movieColor[0] - targetRgb[0], 2) +
@@ -945,7 +1253,22 @@ function findMoviesByColor(hexColor) {
   renderScatter(state.filtered);
 }
 
+// Fills a list of up to k colors to exactly k with lighter/darker variants
+function padColors(colors, k) {
+  if (!colors.length) return [];
+  const result = [...colors];
+  let idx = 0;
+  const factors = [1.15, 0.9, 1.25, 0.75, 1.05];
+  while (result.length < k) {
+    const base = colors[idx % colors.length];
+    result.push(adjustColor(base, factors[idx % factors.length]));
+    idx += 1;
+  }
+  return result.slice(0, k);
+}
+
 // Performs k-means clustering on colors to find k representative colors
+// (fallback when movies_palettes.json is not available)
 function kMeansColors(colors, k) {
   if (!colors.length) return [];
   const unique = [];
@@ -958,17 +1281,7 @@ function kMeansColors(colors, k) {
     }
   });
 
-  if (unique.length <= k) {
-    const result = [...unique];
-    let idx = 0;
-    const factors = [1.15, 0.9, 1.25, 0.75, 1.05];
-    while (result.length < k) {
-      const base = unique[idx % unique.length];
-      result.push(adjustColor(base, factors[idx % factors.length]));
-      idx += 1;
-    }
-    return result.slice(0, k);
-  }
+  if (unique.length <= k) return padColors(unique, k);
 
   let centers = unique.slice(0, k).map((c) => [...c]);
   for (let iter = 0; iter < 8; iter += 1) {
@@ -1009,17 +1322,121 @@ function kMeansColors(colors, k) {
 // GENRE-REGION MATRIX
 // ============================================================================
 
-// Renders clickable heatmap showing genre/region combinations with color quadrants
+// Palette position or four-opposites colors of a movie for the matrix; null if it has neither
+function matrixColorsOf(movie) {
+  const palette = state.palettes ? paletteIndexOf(state.palettes, movie) : -1;
+  if (palette >= 0) return { palette };
+  const colorData = barcodeFor(movie);
+  const opposites = colorData && Array.isArray(colorData.four_opposites) ? colorData.four_opposites : [];
+  const colors = opposites
+    .filter((rgb) => rgb && rgb.length >= 3)
+    .map((rgb) => [Math.round(rgb[0]), Math.round(rgb[1]), Math.round(rgb[2])]);
+  return colors.length ? { colors } : null;
+}
+
+// Matrix colors per "genre||region", built in one pass over the rows and kept
+// until the rows or color data change: movies sorted by year (undated ones
+// apart), so a year range is two binary searches per cell. The blended colors
+// of the last year range are cached too, so region/genre clicks reuse them.
+function matrixColorIndex() {
+  const cached = state.matrixColors;
+  if (
+    cached &&
+    cached.rows === state.data.length &&
+    cached.palettes === state.palettes &&
+    cached.barcodes === state.barcodeColors
+  ) {
+    return cached;
+  }
+  const cells = new Map();
+  state.data.forEach((movie) => {
+    const entry = matrixColorsOf(movie);
+    if (!entry) return;
+    const region = regionLabel(movie);
+    const dated = movie.release_year || movie.release_year === 0;
+    (movie.genres && movie.genres.length ? movie.genres : ["Unknown"]).forEach((genre) => {
+      const key = `${genre}||${region}`;
+      const cell = cells.get(key) || { dated: [], undated: [] };
+      if (dated) cell.dated.push({ year: +movie.release_year, ...entry });
+      else cell.undated.push(entry);
+      cells.set(key, cell);
+    });
+  });
+  cells.forEach((cell) => {
+    cell.dated.sort((a, b) => a.year - b.year);
+    cell.years = cell.dated.map((e) => e.year);
+  });
+  state.matrixColors = {
+    rows: state.data.length,
+    palettes: state.palettes,
+    barcodes: state.barcodeColors,
+    cells,
+    range: null,
+    centers: new Map(),
+  };
+  return state.matrixColors;
+}
+
+// First index in the sorted array whose value is >= value
+function lowerBound(values, value) {
+  let lo = 0;
+  let hi = values.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (values[mid] < value) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Four representative colors for a matrix cell over [minYear, maxYear]
+function matrixCellColors(key, minYear, maxYear) {
+  const index = matrixColorIndex();
+  const range = `${minYear}-${maxYear}`;
+  if (index.range !== range) {
+    index.range = range;
+    index.centers = new Map();
+  }
+  if (index.centers.has(key)) return index.centers.get(key);
+
+  const cell = index.cells.get(key);
+  const entries = cell
+    ? cell.dated.slice(lowerBound(cell.years, minYear), lowerBound(cell.years, maxYear + 1)).concat(cell.undated)
+    : [];
+  const palettes = entries.filter((e) => e.palette !== undefined).map((e) => e.palette);
+  let centers;
+  if (palettes.length) {
+    // Precomputed palettes: a weighted merge instead of clustering per render
+    centers = padColors(blendPalettes(state.palettes, palettes, 4), 4);
+  } else {
+    const colors = entries.flatMap((e) => e.colors || []);
+    const usableColors = colors.filter((c) => c[0] + c[1] + c[2] > 30);
+    centers = kMeansColors(usableColors.length ? usableColors : colors, 4);
+  }
+  index.centers.set(key, centers);
+  return centers;
+}
+
+// Renders clickable heatmap showing genre/region combinations with color quadrants.
+// data holds the rows in the selected years, or is null when the cube matches the data
 function renderGenreRegionMatrix(data) {
   const container = d3.select("#matrix");
   container.selectAll("*").remove();
-  if (!data.length) {
+  const minYear = state.timelineSelection.min;
+  const maxYear = state.timelineSelection.max;
+  const cubeCounts = data ? null : matrixCounts(state.cube, minYear, maxYear);
+  if (cubeCounts ? !cubeCounts.size : !data.length) {
     container.append("div").text("No data for current filters.");
     return;
   }
 
-  const regions = Array.from(new Set(data.map((d) => regionLabel(d)))).filter(Boolean).sort();
-  const genres = Array.from(new Set(data.flatMap((d) => d.genres || []))).filter(Boolean).sort();
+  const cubeKeys = cubeCounts ? [...cubeCounts.keys()].map((key) => key.split("||")) : null;
+  const regions = cubeKeys
+    ? Array.from(new Set(cubeKeys.map(([, region]) => region))).sort()
+    : Array.from(new Set(data.map((d) => regionLabel(d)))).filter(Boolean).sort();
+  const genres = cubeKeys
+    ? Array.from(new Set(cubeKeys.map(([genre]) => genre))).filter((g) => g !== "Unknown").sort()
+    : Array.from(new Set(data.flatMap((d) => d.genres || []))).filter(Boolean).sort();
 
   if (!regions.length || !genres.length) {
     container.append("div").text("No region/genre data available.");
@@ -1027,30 +1444,16 @@ function renderGenreRegionMatrix(data) {
   }
 
   const keyFor = (genre, region) => `${genre}||${region}`;
-  const stats = new Map();
-
-  data.forEach((movie) => {
-    const region = regionLabel(movie);
-    const movieGenres = movie.genres && movie.genres.length ? movie.genres : ["Unknown"];
-    const colorData = state.barcodeColors[movie.title];
-    const opposites = colorData && Array.isArray(colorData.four_opposites) ? colorData.four_opposites : null;
-
-    movieGenres.forEach((genre) => {
-      const key = keyFor(genre, region);
-      const current = stats.get(key) || { count: 0, colors: [] };
-      current.count += 1;
-      if (opposites && opposites.length) {
-        opposites.forEach((rgb) => {
-          if (!rgb || rgb.length < 3) return;
-          const r = Math.round(rgb[0]);
-          const g = Math.round(rgb[1]);
-          const b = Math.round(rgb[2]);
-          current.colors.push([r, g, b]);
-        });
-      }
-      stats.set(key, current);
+  const counts = cubeCounts || new Map();
+  if (!cubeCounts) {
+    data.forEach((movie) => {
+      const region = regionLabel(movie);
+      (movie.genres && movie.genres.length ? movie.genres : ["Unknown"]).forEach((genre) => {
+        const key = keyFor(genre, region);
+        counts.set(key, (counts.get(key) || 0) + 1);
+      });
     });
-  });
+  }
 
   const activeRegions = regions;
   const activeGenres = genres;
@@ -1105,17 +1508,14 @@ function renderGenreRegionMatrix(data) {
   activeGenres.forEach((genre) => {
     activeRegions.forEach((region) => {
       const key = keyFor(genre, region);
-      const entry = stats.get(key) || { count: 0, colors: [] };
-      const usableColors = entry.colors.filter((c) => c[0] + c[1] + c[2] > 30);
-      const sourceColors = usableColors.length ? usableColors : entry.colors;
-      const centers = kMeansColors(sourceColors, 4);
+      const centers = matrixCellColors(key, minYear, maxYear);
       const topColors = centers.length
         ? centers.map((c) => `rgb(${c[0]}, ${c[1]}, ${c[2]})`)
         : ["rgb(20, 24, 35)", "rgb(20, 24, 35)", "rgb(20, 24, 35)", "rgb(20, 24, 35)"];
       cells.push({
         genre,
         region,
-        count: entry.count,
+        count: counts.get(key) || 0,
         colors: topColors,
       });
     });
@@ -1216,7 +1616,11 @@ function renderSearchResult(query) {
     state.selected = null;
     return;
   }
-  const matches = source.filter((d) => (d.title || "").toLowerCase().includes(q)).slice(0, 6);
+  // The index covers the full export; sample or partially loaded data is scanned instead
+  const indexed = state.searchIndex && state.searchIndex.records.id.length === source.length;
+  const matches = indexed
+    ? searchIndex(state.searchIndex, q, 6)
+    : source.filter((d) => (d.title || "").toLowerCase().includes(q)).slice(0, 6);
   searchSuggestions.innerHTML = matches
     .map((m) => `<li data-id="${m.id}">${m.title} (${m.release_year || "—"})</li>`)
     .join("");
@@ -1671,7 +2075,7 @@ function renderDeepDiveSelection() {
     const safeId = String(movie.id);
     const card = document.createElement("div");
     card.className = "deepdive-card";
-    const colorData = state.barcodeColors[movie.title];
+    const colorData = barcodeFor(movie);
     const avgColor = colorData && Array.isArray(colorData.overall_avg) ? colorData.overall_avg : null;
     const avgColorStyle = avgColor
       ? `background: rgb(${Math.round(avgColor[0])}, ${Math.round(avgColor[1])}, ${Math.round(avgColor[2])});`
@@ -2350,10 +2754,16 @@ async function init() {
   try {
     state.data = await loadData();
     console.log("[init] data loaded", state.data.length);
-    state.barcodeColors = await loadBarcodeColors();
+    const [cube, index] = await Promise.all([loadSidecar("cube"), loadSidecar("search_index")]);
+    state.cube = cube && prepareCube(cube);
+    state.searchIndex = index && prepareSearchIndex(index);
+    [state.barcodeColors, state.palettes] = await Promise.all([loadBarcodeColors(), loadPalettes()]);
     console.log("[init] barcode colors loaded", Object.keys(state.barcodeColors).length);
     populateFilters(state.data);
     applyFilters();
+    if (pendingRows) {
+      pendingRows.then(appendRows).catch((err) => console.warn("Unable to load remaining shards", err));
+    }
     window.addEventListener("resize", () => render());
     if (regionFilter) regionFilter.addEventListener("change", applyFilters);
     if (genreFilter) genreFilter.addEventListener("change", applyFilters);
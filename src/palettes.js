@@ -0,0 +1,104 @@
+// ============================================================================
+// COLOR PALETTES
+// ============================================================================
+
+// Lookups over movies_palettes.json written by the barcode scripts
+// (encoder.build_color_index): per-movie LAB k-means palettes with weights,
+// and a LAB grid over each movie's overall color. A nearest-color query only
+// visits the grid cells within its radius.
+
+// sRGB (D65) → XYZ, same constants as encoder.rgb_to_lab
+const XYZ_FROM_RGB = [
+  [0.412453, 0.357580, 0.180423],
+  [0.212671, 0.715160, 0.072169],
+  [0.019334, 0.119193, 0.950227],
+];
+const D65_WHITE = [0.95047, 1.0, 1.08883];
+
+// Converts an [r, g, b] color (0-255) to CIE LAB
+export function rgbToLab(rgb) {
+  const linear = rgb.map((v) => {
+    const c = v / 255;
+    return c > 0.04045 ? ((c + 0.055) / 1.055) ** 2.4 : c / 12.92;
+  });
+  const f = XYZ_FROM_RGB.map((row, i) => {
+    const t = (row[0] * linear[0] + row[1] * linear[1] + row[2] * linear[2]) / D65_WHITE[i];
+    return t > 0.008856 ? Math.cbrt(t) : 7.787 * t + 16 / 116;
+  });
+  return [116 * f[1] - 16, 500 * (f[0] - f[1]), 200 * (f[1] - f[2])];
+}
+
+// Adds id/title → position lookups and a Map over the grid. Movies with a
+// record id are only found by id, so titles shared by several records do not
+// collide; the title lookup covers movies the barcode scripts could not key
+export function preparePalettes(index) {
+  index.byId = new Map();
+  index.byTitle = new Map();
+  index.ids.forEach((id, i) => {
+    if (id && !index.byId.has(id)) index.byId.set(id, i);
+  });
+  index.titles.forEach((title, i) => {
+    if (title && !index.ids[i] && !index.byTitle.has(title)) index.byTitle.set(title, i);
+  });
+  index.grid = new Map(Object.entries(index.grid));
+  return index;
+}
+
+// Position of a movie in the index (record id first, then title), or -1
+export function paletteIndexOf(index, movie) {
+  if (!movie) return -1;
+  const id = movie.id != null ? String(movie.id) : null;
+  if (id && index.byId.has(id)) return index.byId.get(id);
+  return index.byTitle.has(movie.title) ? index.byTitle.get(movie.title) : -1;
+}
+
+// Movies whose overall color lies within maxDistance (LAB ΔE) of rgb, nearest
+// first, as [{ position, dist }]; accept(position) can narrow the candidates
+export function nearestColors(index, rgb, maxDistance, accept = () => true) {
+  const target = rgbToLab(rgb);
+  const cell = target.map((v) => Math.floor(v / index.cell));
+  const reach = Math.ceil(maxDistance / index.cell);
+  const out = [];
+  for (let i = cell[0] - reach; i <= cell[0] + reach; i++) {
+    for (let j = cell[1] - reach; j <= cell[1] + reach; j++) {
+      for (let l = cell[2] - reach; l <= cell[2] + reach; l++) {
+        const bucket = index.grid.get(`${i},${j},${l}`);
+        if (!bucket) continue;
+        for (const position of bucket) {
+          if (!accept(position)) continue;
+          const lab = index.lab[position];
+          const dist = Math.hypot(lab[0] - target[0], lab[1] - target[1], lab[2] - target[2]);
+          if (dist <= maxDistance) out.push({ position, dist });
+        }
+      }
+    }
+  }
+  return out.sort((a, b) => a.dist - b.dist);
+}
+
+// Up to k colors for a group of movies: palette colors are binned (16 levels
+// per channel) and summed by weight; the heaviest bins' weighted means win.
+// Near-black colors only count when nothing else is available.
+export function blendPalettes(index, positions, k) {
+  const bins = new Map();
+  const add = (skipDark) => {
+    positions.forEach((p) => {
+      index.palettes[p].forEach((rgb, c) => {
+        if (skipDark && rgb[0] + rgb[1] + rgb[2] <= 30) return;
+        const key = ((rgb[0] >> 4) << 8) | ((rgb[1] >> 4) << 4) | (rgb[2] >> 4);
+        const w = index.weights[p][c];
+        const bin = bins.get(key) || { weight: 0, sum: [0, 0, 0] };
+        bin.weight += w;
+        for (let ch = 0; ch < 3; ch++) bin.sum[ch] += rgb[ch] * w;
+        bins.set(key, bin);
+      });
+    });
+  };
+  add(true);
+  if (!bins.size) add(false);
+  return [...bins.values()]
+    .filter((bin) => bin.weight > 0)
+    .sort((a, b) => b.weight - a.weight)
+    .slice(0, k)
+    .map((bin) => bin.sum.map((s) => Math.round(s / bin.weight)));
+}
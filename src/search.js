@@ -0,0 +1,111 @@
+// ============================================================================
+// SEARCH INDEX
+// ============================================================================
+
+// Lookups over search_index.json written by scripts/prepare_data.py: sorted
+// title/actor tokens with posting lists of record ranks (0 = most voted).
+// The last query word matches as a prefix, earlier words as whole tokens.
+
+// Converts the postings to a typed array for fast slicing
+export function prepareSearchIndex(index) {
+  index.postings = Int32Array.from(index.postings);
+  return index;
+}
+
+// Same normalization as _normalize_title + _tokens in prepare_data.py
+export function tokenize(text) {
+  return (text || "")
+    .toLowerCase()
+    .trim()
+    .split(/[^\p{L}\p{N}]+/u)
+    .filter(Boolean);
+}
+
+// First token index whose token is >= key
+function lowerBound(tokens, key) {
+  let lo = 0;
+  let hi = tokens.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (tokens[mid] < key) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Posting list (ascending record ranks) of token index t
+function postingsOf(index, t) {
+  return index.postings.subarray(index.offsets[t], index.offsets[t + 1]);
+}
+
+// First position in [from, list.length) whose rank is >= rank
+function seek(list, from, rank) {
+  let lo = from;
+  let hi = list.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (list[mid] < rank) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Up to `limit` records matching the query, most voted first, as
+// { id, title, release_year }
+export function searchIndex(index, query, limit = 6) {
+  const terms = tokenize(query);
+  if (!terms.length) return [];
+  const prefix = terms.pop();
+  const prefixTokens = [];
+  for (let t = lowerBound(index.tokens, prefix); t < index.tokens.length && index.tokens[t].startsWith(prefix); t++) {
+    prefixTokens.push(t);
+  }
+  if (!prefixTokens.length) return [];
+
+  let ranks;
+  if (!terms.length) {
+    // Lists are sorted by rank, so only the first `limit` of each can make the top `limit`
+    const heads = new Set();
+    prefixTokens.forEach((t) => postingsOf(index, t).subarray(0, limit).forEach((r) => heads.add(r)));
+    ranks = [...heads].sort((a, b) => a - b).slice(0, limit);
+  } else {
+    const exact = terms.map((term) => {
+      const t = lowerBound(index.tokens, term);
+      return index.tokens[t] === term ? postingsOf(index, t) : null;
+    });
+    if (exact.some((p) => !p)) return [];
+    exact.sort((a, b) => a.length - b.length);
+    const prefixLists = prefixTokens.map((t) => postingsOf(index, t));
+    const exactPos = exact.map(() => 0);
+    const prefixPos = prefixLists.map(() => 0);
+    // Leapfrog over the rank-sorted lists: raise `rank` until every exact list
+    // and at least one prefix list hold it; stops after `limit` hits
+    ranks = [];
+    let rank = 0;
+    while (ranks.length < limit) {
+      let next = rank;
+      for (let i = 0; i < exact.length && next === rank; i++) {
+        exactPos[i] = seek(exact[i], exactPos[i], rank);
+        next = exactPos[i] < exact[i].length ? exact[i][exactPos[i]] : Infinity;
+      }
+      if (next === rank) {
+        next = Infinity;
+        prefixLists.forEach((list, i) => {
+          prefixPos[i] = seek(list, prefixPos[i], rank);
+          if (prefixPos[i] < list.length) next = Math.min(next, list[prefixPos[i]]);
+        });
+        if (next === rank) {
+          ranks.push(rank);
+          next = rank + 1;
+        }
+      }
+      if (next === Infinity) break;
+      rank = next;
+    }
+  }
+  return ranks.map((r) => ({
+    id: index.records.id[r],
+    title: index.records.title[r],
+    release_year: index.records.release_year[r],
+  }));
+}
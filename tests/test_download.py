@@ -0,0 +1,80 @@
+"""
+Tests for the search and download stages of barcode generation/barcode_generator_download.py.
+
+    python -m pytest -q tests
+"""
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+HERE = Path(__file__).resolve().parents[1] / "barcode generation"
+sys.path.insert(0, str(HERE))
+import barcode_generator_download as bgd  # noqa: E402
+from benchmark import make_trailer  # noqa: E402
+from frame_sampler import FRAME_SIZE, sample_seek  # noqa: E402
+from retry import RETRYABLE, DownloadError, classify_error  # noqa: E402
+from url_finder import TrailerCache  # noqa: E402
+
+FAKE_YTDLP = str(HERE / "fake_ytdlp.py")  # run directly, as --yt-dlp would, so it must stay executable
+
+
+@pytest.fixture
+def trailer(tmp_path, monkeypatch):
+    """A 2 s synthetic trailer served by fake_ytdlp.py, with its call counts kept under tmp_path."""
+    path = tmp_path / "trailer.mp4"
+    if not make_trailer(str(path), 2, FRAME_SIZE):
+        pytest.skip("no mp4v encoder in this OpenCV build")
+    monkeypatch.setenv("FAKE_YTDLP_VIDEO", str(path))
+    monkeypatch.setenv("FAKE_YTDLP_STATE", str(tmp_path / "calls.json"))
+    return path
+
+
+@pytest.fixture
+def search_config(monkeypatch):
+    """A fresh copy of the module's search settings, with no thread-local backend left over."""
+    monkeypatch.setattr(bgd, "_search_config", {"cache": None, "stub_url": None})
+    monkeypatch.setattr(bgd, "_search_local", type(bgd._search_local)())
+    return bgd._search_config
+
+
+def test_stub_search_never_writes_the_trailer_cache(tmp_path, search_config):
+    cache = TrailerCache(str(tmp_path / "trailer_cache.sqlite"))
+    search_config.update(cache=cache, stub_url="/tmp/stub.mp4")
+    try:
+        job = bgd.search_job({"title": "Inception", "metrics": {}})
+        assert job["url"] == "/tmp/stub.mp4"
+        assert cache.get("Inception") == (False, None)
+    finally:
+        cache.close()
+
+
+def test_download_stage_fetches_the_trailer_through_ytdlp(tmp_path, trailer):
+    job = {"url": "https://youtu.be/fake", "path": str(tmp_path / "00000.mp4"), "ytdlp": FAKE_YTDLP, "metrics": {}}
+    bgd.download_job(job)
+    assert job["metrics"]["bytes_downloaded"] == trailer.stat().st_size > 0
+    assert len(sample_seek(job["path"], 10)) == 10
+
+
+def test_download_stage_surfaces_ytdlp_errors(tmp_path, trailer, monkeypatch):
+    monkeypatch.setenv("FAKE_YTDLP_FAIL", "429,ok")
+    job = {"url": "https://youtu.be/fake", "path": str(tmp_path / "00000.mp4"), "ytdlp": FAKE_YTDLP, "metrics": {}}
+    with pytest.raises(DownloadError) as err:
+        bgd.download_job(job)
+    assert classify_error(err.value) == RETRYABLE
+    bgd.download_job(job)  # the second call succeeds
+    assert job["metrics"]["bytes_downloaded"] > 0
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_streamed_frames_arrive_through_the_pipes(tmp_path, trailer, monkeypatch):
+    fragmented = tmp_path / "fragmented.mp4"  # like YouTube's DASH streams, decodable from a pipe
+    subprocess.run(["ffmpeg", "-v", "error", "-i", str(trailer), "-c", "copy",
+                    "-movflags", "frag_keyframe+empty_moov", str(fragmented)], check=True)
+    monkeypatch.setenv("FAKE_YTDLP_VIDEO", str(fragmented))
+    monkeypatch.setenv("FAKE_YTDLP_CHUNK_DELAY", "0.001")
+    frames = bgd.stream_video_frames("https://youtu.be/fake", 20, ytdlp=FAKE_YTDLP)
+    assert 0 < len(frames) <= 20
+    assert frames.shape[1:] == (FRAME_SIZE[1], FRAME_SIZE[0], 3)
@@ -0,0 +1,79 @@
+"""
+Tests for the public/data exports of scripts/prepare_data.py.
+
+    python -m pytest -q tests
+"""
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import prepare_data  # noqa: E402
+
+
+@pytest.fixture
+def public_data(tmp_path, monkeypatch):
+    """PUBLIC_DATA redirected to a temp dir."""
+    monkeypatch.setattr(prepare_data, "PUBLIC_DATA", tmp_path)
+    return tmp_path
+
+
+def _manifest(public_data: Path) -> dict:
+    return json.loads((public_data / "manifest.json").read_text())
+
+
+def test_shards_are_removed_when_sharding_is_off(public_data):
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "title": ["A", "B", "C"],
+            "release_year": [1999, 2004, None],
+            "region": ["Europe", "Asia", "Other"],
+            "country": ["FR", "JP", "Unknown"],
+            "genres": [["Drama"], [], ["Comedy"]],
+            "rating": [7.0, 6.5, None],
+            "budget": [1e6, None, 2e6],
+            "revenue": [3e6, 1e5, None],
+            "viewership": [None, 2.5, 1.0],
+            "numVotes": [1200, 30, None],
+            "duration_minutes": [95, 120, None],
+        }
+    )
+    prepare_data._update_manifest("processed", {"file": "processed.json"})
+    prepare_data._export_shards(df, public_data / "shards", 10)
+    assert _manifest(public_data)["processed_shards"]["records"] == 3
+    assert any((public_data / "shards").iterdir())
+
+    prepare_data._remove_shards(public_data / "shards")
+    assert _manifest(public_data) == {"processed": {"file": "processed.json"}}
+    assert not (public_data / "shards").exists()
+    prepare_data._remove_shards(public_data / "shards")  # nothing left to remove
+
+
+def test_delta_chain_follows_the_published_version(public_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(prepare_data, "BUILD_STATE", tmp_path / "cache" / "build_state.json")
+    (tmp_path / "cache").mkdir()
+    df = pd.DataFrame({"id": [1, 2, 3], "title": ["A", "B", "C"], "release_year": [1999, 2004, 2010]})
+
+    def build(frame):
+        prepare_data.write_delta(frame, prepare_data._export_json(frame, public_data / "processed.json"))
+        return _manifest(public_data)["processed"]
+
+    assert (build(df)["version"], build(df)["version"]) == (1, 1)  # unchanged records keep the version
+    entry = build(df.assign(title=["A", "B2", "C"]))
+    assert entry["version"] == 2
+    assert entry["deltas"] == [
+        {"from": 1, "to": 2, "path": "deltas/processed.2.json", "upserts": 1, "removes": 0}
+    ]
+    assert json.loads((public_data / "deltas" / "processed.2.json").read_text())["upserts"] == {
+        "2": {"id": 2, "title": "B2", "release_year": 2004}
+    }
+
+    prepare_data.BUILD_STATE.unlink()  # e.g. a fresh checkout: the published version must not reset
+    entry = build(df.iloc[:2])
+    assert (entry["version"], entry["deltas"]) == (3, [])
+    assert not (public_data / "deltas" / "processed.2.json").exists()
+    assert build(df)["deltas"][0]["from"] == 3
@@ -0,0 +1,25 @@
+"""
+Tests for the ffmpeg option handling in barcode generation/frame_sampler.py.
+
+    python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "barcode generation"))
+import frame_sampler  # noqa: E402
+
+
+def _fake_ffmpeg(path: Path, help_text: str) -> str:
+    """An executable that prints help_text, standing in for `ffmpeg -h full`."""
+    path.write_text(f"#!/bin/sh\necho '{help_text}'\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_vfr_args_prefer_fps_mode_and_fall_back_to_vsync(tmp_path):
+    new = _fake_ffmpeg(tmp_path / "ffmpeg-new", "-vsync  ...  -fps_mode  set framerate mode")
+    old = _fake_ffmpeg(tmp_path / "ffmpeg-old", "-vsync  video sync method")
+    assert frame_sampler._vfr_args(new) == ["-fps_mode", "vfr"]
+    assert frame_sampler._vfr_args(old) == ["-vsync", "vfr"]
+    assert frame_sampler._vfr_args(str(tmp_path / "missing")) == ["-vsync", "vfr"]
@@ -0,0 +1,84 @@
+"""
+Tests for the barcode pipeline's retry handling (barcode generation/pipeline.py
+and retry.py).
+
+    python -m pytest -q tests
+"""
+import os
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "barcode generation"))
+from pipeline import Stage, run_pipeline  # noqa: E402
+from retry import PERMANENT, RETRYABLE, DownloadError, RetryPolicy  # noqa: E402
+
+
+def _download(job):
+    """Stand-in download stage: writes the job's input file."""
+    job["stages"].append("download")
+    with open(job["path"], "w") as f:
+        f.write(f"video {job['title']}")
+    return job
+
+
+def _decode(job):
+    """Stand-in decode stage: consumes (deletes) its input like decode_job, failing once with a timeout."""
+    try:
+        with open(job["path"]) as f:
+            data = f.read()
+    finally:
+        if os.path.exists(job["path"]):
+            os.remove(job["path"])
+    marker = job["path"] + ".failed"
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        raise TimeoutError("The read operation timed out")
+    job["decoded"] = data
+    return job
+
+
+def test_retry_delays_back_off_with_jitter_and_cap():
+    policy = RetryPolicy(max_attempts=10, base=2.0, cap=10.0, rng=random.Random(0))
+    for attempt, full in [(1, 2.0), (2, 4.0), (3, 8.0), (4, 10.0), (8, 10.0)]:
+        delay = policy.delay(attempt)
+        assert full / 2 <= delay <= full
+
+
+def test_retry_policy_stops_on_permanent_errors_and_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3, base=1.0, cap=1.0, rng=random.Random(0))
+    job = {}
+    assert policy("download", job, DownloadError("yt-dlp exited with status 1", "HTTP Error 429")) is not None
+    assert job["error_kind"] == RETRYABLE
+    assert policy("download", job, TimeoutError("timed out")) is not None
+    assert policy("download", job, TimeoutError("timed out")) is None  # third attempt: out of tries
+    assert job["attempts"] == 3
+
+    job = {}
+    assert policy("download", job, DownloadError("yt-dlp exited with status 1", "ERROR: Video unavailable")) is None
+    assert job["error_kind"] == PERMANENT
+
+
+def test_transient_decode_failure_restarts_at_download(tmp_path):
+    jobs = [{"title": f"movie {i}", "path": str(tmp_path / f"{i:05d}.mp4"), "stages": []} for i in range(3)]
+    done, failed, retries = [], [], []
+    stages = [
+        Stage("download", _download, 2),
+        Stage("decode", _decode, 2, processes=True, retry_from="download"),
+    ]
+    run_pipeline(
+        iter(jobs),
+        stages,
+        done.append,
+        lambda *err: failed.append(err),
+        retry=RetryPolicy(max_attempts=3, base=0.01, cap=0.05),
+        on_retry=lambda stage, job, exc, delay: retries.append((stage, job["title"])),
+    )
+
+    assert not failed
+    assert sorted(retries) == [("decode", job["title"]) for job in jobs]
+    assert sorted(job["title"] for job in done) == [job["title"] for job in jobs]
+    for job in done:
+        assert job["stages"] == ["download", "download"]  # downloaded again before the second decode
+        assert job["decoded"] == f"video {job['title']}"
+        assert job["attempts"] == 1
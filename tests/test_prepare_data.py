@@ -0,0 +1,196 @@
+"""
+Regression tests: the vectorized helpers in scripts/prepare_data.py give the
+same output as the row-wise versions they replaced.
+
+    python -m pytest -q tests
+"""
+import random
+import sys
+import warnings
+from ast import literal_eval
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import prepare_data  # noqa: E402
+
+
+# --- the original row-wise helpers, kept verbatim as the reference -----------
+
+def _first_from_list(raw: object, key: str) -> Optional[str]:
+    """Extract first value of a key from a JSON-encoded list of dicts."""
+    if raw is None or (isinstance(raw, float) and np.isnan(raw)):
+        return None
+    items = raw
+    try:
+        if isinstance(raw, str):
+            items = literal_eval(raw)
+    except Exception:
+        return None
+    if isinstance(items, list):
+        for item in items:
+            if isinstance(item, dict) and item.get(key):
+                return item.get(key)
+    return None
+
+
+def _to_region(country: Optional[str], country_code: Optional[str] = None) -> str:
+    """Map country name or code to a continent/region."""
+    def _lookup(val: Optional[str]) -> Optional[str]:
+        if not isinstance(val, str):
+            return None
+        key = val.upper()
+        return prepare_data.COUNTRY_REGION_MAP.get(key)
+
+    region = _lookup(country_code) or _lookup(country)
+    return region or "Other"
+
+
+def _split_genres(genres: pd.Series) -> pd.Series:
+    """Genre splitting as done inline in the original load_imdb."""
+    return genres.fillna("").apply(lambda g: [x for x in g.split(",") if x])
+
+
+def _load_cast_ratings(raw_dir: Path, valid_tconsts: Iterable[str]) -> pd.DataFrame:
+    """The original load_cast_ratings, reading the dumps from raw_dir."""
+    valid = set(valid_tconsts)
+    collected = []
+    for chunk in pd.read_csv(
+        raw_dir / "title.principals.tsv",
+        sep="\t",
+        na_values="\\N",
+        usecols=["tconst", "nconst", "category", "ordering"],
+        chunksize=200_000,
+    ):
+        chunk = chunk[chunk["tconst"].isin(valid)]
+        chunk = chunk[chunk["category"].isin(["actor", "actress"]) & (chunk["ordering"] <= 3)]
+        collected.append(chunk[["tconst", "nconst"]])
+    principals = pd.concat(collected, ignore_index=True)
+    if principals.empty:
+        return pd.DataFrame(columns=["tconst", "actor_name"])
+
+    needed_nconst = set(principals["nconst"].dropna().unique().tolist())
+    name_chunks = []
+    for chunk in pd.read_csv(
+        raw_dir / "name.basics.tsv",
+        sep="\t",
+        na_values="\\N",
+        usecols=["nconst", "primaryName"],
+        chunksize=200_000,
+    ):
+        name_chunks.append(chunk[chunk["nconst"].isin(needed_nconst)])
+    names = pd.concat(name_chunks, ignore_index=True)
+    names.rename(columns={"primaryName": "actor_name"}, inplace=True)
+    cast = principals.merge(names, on="nconst", how="left")
+    grouped = cast.groupby("tconst")["actor_name"].apply(lambda s: [n for n in s.dropna().tolist()])
+    return grouped.reset_index()
+
+
+# --- synthetic inputs ---------------------------------------------------------
+
+RAW_LISTS = [
+    "[{'iso_3166_1': 'US', 'name': 'United States of America'}]",
+    "[{'iso_3166_1': '', 'name': 'France'}, {'iso_3166_1': 'FR', 'name': ''}]",  # falsy values fall through
+    "[{'iso_3166_1': 'DE'}, {'iso_3166_1': 'AT', 'name': 'Austria'}]",
+    "[{'iso_3166_1': 0, 'name': None}, {'iso_3166_1': 7, 'name': 'Seven'}]",  # non-string codes
+    "[1, 'a', None, {'name': 'Mixed'}]",
+    "{'iso_3166_1': 'US'}",  # a dict, not a list
+    "[]",
+    "",
+    "not a literal",
+    "[{'name': 'unterminated'",
+    "42",
+    [{"iso_3166_1": "JP", "name": "Japan"}],  # already parsed
+    None,
+    np.nan,
+]
+COUNTRIES = ["US", "us", "Fr", "XX", "", "Germany", "united states of america", None, np.nan, 5, "GB", "BR", "IN"]
+GENRES = ["Drama,Comedy", "Action", "", None, np.nan, "Drama,,Comedy", ",Horror,", "Sci-Fi,Thriller,Drama"]
+
+
+def _sample(values: list, n: int, seed: int) -> pd.Series:
+    """n random picks from values, on a shuffled non-default index."""
+    rng = random.Random(seed)
+    index = rng.sample(range(10 * n), n)
+    return pd.Series([rng.choice(values) for _ in range(n)], index=index, dtype=object)
+
+
+def _plain(value: object) -> object:
+    """None for any missing marker, so None and NaN compare equal."""
+    return None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_first_from_lists_matches_row_wise(seed):
+    raw = _sample(RAW_LISTS, 300, seed)
+    keys = ["iso_3166_1", "name"]
+    got = prepare_data._first_from_lists(raw, keys)
+    assert list(got.index) == list(raw.index)
+    for key in keys:
+        expected = [_first_from_list(v, key) for v in raw]
+        assert [_plain(v) for v in got[key]] == expected
+
+
+def test_first_from_lists_all_missing():
+    raw = pd.Series([None, np.nan, "[]", "garbage"], index=[3, 1, 2, 0], dtype=object)
+    got = prepare_data._first_from_lists(raw, ["iso_639_1", "name"])
+    assert got.shape == (4, 2)
+    assert got.isna().all().all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_to_region_matches_row_wise(seed):
+    country = _sample(COUNTRIES, 300, seed)
+    code = _sample(COUNTRIES, 300, seed + 100)
+    code.index = country.index
+    got = prepare_data._to_region(country, code)
+    assert list(got.index) == list(country.index)
+    assert got.tolist() == [_to_region(c, cc) for c, cc in zip(country, code)]
+
+
+def test_to_region_unmatched_has_no_downcast_warning():
+    country = pd.Series([None, "Atlantis", np.nan], dtype=object)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        got = prepare_data._to_region(country, country.copy())
+    assert got.tolist() == ["Other"] * 3
+
+
+@pytest.mark.parametrize("dtype", [object, "string", "category"])
+def test_split_genres_matches_row_wise(dtype):
+    genres = _sample(GENRES, 200, 7)
+    expected = _split_genres(genres)
+    got = prepare_data._split_genres(genres.astype(dtype))
+    assert list(got.index) == list(genres.index)
+    assert got.tolist() == expected.tolist()
+
+
+def test_load_cast_ratings_matches_row_wise(tmp_path, monkeypatch):
+    rng = random.Random(0)
+    principals = ["tconst\tordering\tnconst\tcategory"]
+    for t in range(1, 60):
+        for ordering in range(1, 6):
+            category = rng.choice(["actor", "actress", "director", "writer"])
+            principals.append(f"tt{t:07d}\t{ordering}\tnm{rng.randint(1, 80):07d}\t{category}")
+    principals.append("tt0000099\t1\t\\N\tactor")  # missing nconst
+    names = ["nconst\tprimaryName"]
+    for n in range(1, 70):  # nm0000070+ have no name.basics row; every 9th name is missing
+        names.append(f"nm{n:07d}\t" + ("\\N" if n % 9 == 0 else f"Actor {n}"))
+    (tmp_path / "title.principals.tsv").write_text("\n".join(principals) + "\n")
+    (tmp_path / "name.basics.tsv").write_text("\n".join(names) + "\n")
+
+    monkeypatch.setattr(prepare_data, "RAW_DIR", tmp_path)
+    monkeypatch.setattr(prepare_data, "CACHE_DIR", None)
+    monkeypatch.setattr(prepare_data, "SCAN_WORKERS", 1)
+    valid = [f"tt{t:07d}" for t in range(1, 60, 2)] + ["tt0000099", "tt9999999"]
+
+    expected = _load_cast_ratings(tmp_path, valid)
+    for principals_arg in (None, prepare_data.scan_principals()):
+        got = prepare_data.load_cast_ratings(valid, principals=principals_arg)
+        cast = dict(zip(got["tconst"], got["actor_name"]))
+        assert cast == dict(zip(expected["tconst"], expected["actor_name"]))
+        assert cast["tt0000099"] == []  # a top-billed actor without nconst still yields an empty list